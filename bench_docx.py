@@ -0,0 +1,135 @@
+"""
+Benchmark: legacy cell-by-cell df_to_word_table vs one-pass XML table builder.
+
+Usage:
+    python bench_docx.py                  # 3 statements x 60 rows x 4 periods, 20 reports
+    python bench_docx.py --rows 150 --reports 50
+
+Builds the same 3-statement report (income, balance sheet, cash flow) with both paths,
+checks that every table has identical cell text, and prints time per report.
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pandas as pd
+from docx import Document
+from docx.shared import Pt
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.oxml import OxmlElement
+
+def legacy_set_table_border(table):
+    tblPr = table._tbl.tblPr
+    borders = OxmlElement('w:tblBorders')
+    for name, val, sz in (('w:top', 'thick', '12'), ('w:bottom', 'thick', '12'), ('w:insideH', 'single', '4')):
+        el = OxmlElement(name)
+        el.set(qn('w:val'), val)
+        el.set(qn('w:sz'), sz)
+        borders.append(el)
+    tblPr.append(borders)
+
+def legacy_df_to_word_table(doc, df, title):
+    """
+    The pre-optimization implementation (python-docx object model, per-cell shading).
+    """
+    if df is None or df.empty:
+        return
+    doc.add_heading(title, level=2)
+    table = doc.add_table(rows=df.shape[0]+1, cols=df.shape[1]+1)
+    table.style = 'Table Grid'
+    legacy_set_table_border(table)
+
+    hdr_cells = table.rows[0].cells
+    hdr_cells[0].text = "Account / Period"
+    hdr_cells[0].paragraphs[0].runs[0].bold = True
+    for i, col in enumerate(df.columns):
+        hdr_cells[i+1].text = str(col.date()) if hasattr(col, 'date') else str(col)
+        hdr_cells[i+1].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        hdr_cells[i+1].paragraphs[0].runs[0].bold = True
+    for cell in hdr_cells:
+        tcPr = cell._tc.get_or_add_tcPr()
+        shd = OxmlElement('w:shd')
+        shd.set(qn('w:val'), 'clear')
+        shd.set(qn('w:color'), 'auto')
+        shd.set(qn('w:fill'), 'E7E6E6')
+        tcPr.append(shd)
+
+    for idx, (index_name, row) in enumerate(df.iterrows()):
+        row_cells = table.rows[idx+1].cells
+        row_cells[0].text = str(index_name)
+        row_cells[0].paragraphs[0].runs[0].font.size = Pt(9)
+        for i, val in enumerate(row):
+            cell = row_cells[i+1]
+            try:
+                cell.text = f"{val:,.0f}" if isinstance(val, (int, float)) else str(val)
+            except:
+                cell.text = "-"
+            cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
+            cell.paragraphs[0].runs[0].font.size = Pt(9)
+    doc.add_paragraph("\n")
+
+def fast_df_to_word_table(doc, df, title):
+    from sec_module import core # Imported (and cached) before timing starts, see main()
+    core.df_to_word_table(doc, df, title)
+
+def make_statements(rows, periods):
+    rng = np.random.default_rng(0)
+    columns = pd.date_range(end="2024-09-30", periods=periods, freq="365D")[::-1]
+    statements = []
+    for name in ("Income", "Balance", "CashFlow"):
+        data = rng.normal(0, 5e9, size=(rows, periods))
+        data[rng.random(size=data.shape) < 0.05] = np.nan # yfinance leaves gaps
+        index = [f"{name} Line Item {i}" for i in range(rows)]
+        statements.append(pd.DataFrame(data, index=index, columns=columns))
+    return statements
+
+def build_report(func, statements):
+    doc = Document()
+    for df, title in zip(statements, ("2-1. Income Statement", "2-2. Balance Sheet", "2-3. Cash Flow Statement")):
+        func(doc, df, title)
+    return doc
+
+def table_text(doc):
+    return [[[cell.text for cell in row.cells] for row in table.rows] for table in doc.tables]
+
+def timed(func, statements, reports):
+    """
+    Seconds per report: (whole report incl. Document(), time inside the table function), last doc.
+    """
+    in_tables = [0.0]
+    def timed_func(doc, df, title):
+        start = time.perf_counter()
+        func(doc, df, title)
+        in_tables[0] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(reports):
+        doc = build_report(timed_func, statements)
+    return (time.perf_counter() - start) / reports, in_tables[0] / reports, doc
+
+def main():
+    parser = argparse.ArgumentParser(description='Word table builder benchmark')
+    parser.add_argument('--rows', type=int, default=60, help='Line items per statement')
+    parser.add_argument('--periods', type=int, default=4, help='Periods (columns) per statement')
+    parser.add_argument('--reports', type=int, default=20, help='Reports built per implementation')
+    args = parser.parse_args()
+
+    from sec_module import core # Keep the (slow) import out of the timed loop
+    statements = make_statements(args.rows, args.periods)
+    print(f"Input: 3 statements x {args.rows} rows x {args.periods} periods, {args.reports} reports")
+
+    legacy_sec, legacy_tables, legacy_doc = timed(legacy_df_to_word_table, statements, args.reports)
+    fast_sec, fast_tables, fast_doc = timed(fast_df_to_word_table, statements, args.reports)
+    print(f"    legacy: {legacy_sec * 1000:8.1f} ms/report | tables {legacy_tables * 1000:8.1f} ms")
+    print(f"      fast: {fast_sec * 1000:8.1f} ms/report | tables {fast_tables * 1000:8.1f} ms "
+          f"({legacy_sec / fast_sec:.1f}x report, {legacy_tables / fast_tables:.1f}x tables)")
+
+    if table_text(legacy_doc) != table_text(fast_doc):
+        print("[FAIL] Table contents differ from the legacy implementation.")
+        return 1
+    print("[OK] Identical table contents.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Benchmark: legacy BeautifulSoup extract_sections vs streaming html_text extractor.
+
+Usage:
+    python bench_extract.py                 # synthetic ~20MB inline-XBRL style filing
+    python bench_extract.py path/to/10k.htm # real filing
+    python bench_extract.py --size-mb 30
+
+Each implementation runs in its own process so peak RSS is measured independently
+(Python heap peak via tracemalloc on platforms without the resource module).
+Fails (exit 1) if outputs differ or the streaming extractor uses more memory.
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource # Unix only (peak RSS)
+except ImportError:
+    resource = None
+
+def legacy_extract(path):
+    from bs4 import BeautifulSoup
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        html_content = f.read()
+    soup = BeautifulSoup(html_content, 'html.parser')
+    text = soup.get_text(separator='\n')
+    return re.sub(r'\s+', ' ', text).strip()
+
+def streaming_extract(path):
+    from sec_module import html_text
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return html_text.extract_text(f)
+
+def make_synthetic_filing(path, size_mb):
+    row = ("<tr><td style='padding:0'><p><span>Net revenue</span></p></td><td>$</td>"
+           "<td><ix:nonFraction name='us-gaap:Revenues' contextRef='c-1'>391,035</ix:nonFraction></td>"
+           "<td>(</td><td>12&#160;%</td><td>)</td></tr>\n")
+    para = ("<div><p style='font-family:Times'>We design, manufacture and market smartphones, "
+            "personal computers &amp; tablets.   Our <b>risk</b> factors are described below.</p></div>\n")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("<html><head><style>p {margin:0}</style><script>var x = '<p>';</script></head><body>\n")
+        written = 0
+        while written < size_mb * 1024 * 1024:
+            block = para * 20 + "<table>" + row * 40 + "</table>\n"
+            f.write(block)
+            written += len(block)
+        f.write("</body></html>")
+
+def _run(name, path, queue):
+    func = legacy_extract if name == "legacy" else streaming_extract
+    if resource is None:
+        tracemalloc.start() # No RSS on Windows; trace Python allocations instead (slower)
+    start = time.perf_counter()
+    text = func(path)
+    elapsed = time.perf_counter() - start
+    if resource is None:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    else:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 # Linux reports KB
+    queue.put({"name": name, "seconds": elapsed, "peak": peak, "text": text})
+
+def run_isolated(name, path):
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_run, args=(name, path, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='extract_sections benchmark')
+    parser.add_argument('path', nargs='?', help='HTML filing to benchmark (default: synthetic)')
+    parser.add_argument('--size-mb', type=int, default=20, help='Synthetic filing size')
+    args = parser.parse_args()
+
+    path = args.path
+    if not path:
+        path = "bench_filing.htm"
+        make_synthetic_filing(path, args.size_mb)
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"Input: {path} ({size_mb:.1f} MB)")
+
+    results = [run_isolated("legacy", path), run_isolated("streaming", path)]
+    peak_label = "RSS peak" if resource else "Python heap peak"
+    for r in results:
+        print(f"{r['name']:>10}: {r['seconds']:6.2f}s ({size_mb / r['seconds']:6.1f} MB/s) | "
+              f"{peak_label} {r['peak'] / 1024 / 1024:8.1f} MB")
+
+    legacy, streaming = results
+    if not args.path:
+        os.remove(path)
+
+    ok = True
+    if legacy['text'] != streaming['text']:
+        print("[FAIL] Extracted text differs from the legacy implementation.")
+        ok = False
+    if streaming['peak'] >= legacy['peak']:
+        print("[FAIL] Streaming extractor did not reduce peak memory.")
+        ok = False
+    print("[OK] Output identical, lower peak memory." if ok else "")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
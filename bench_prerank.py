@@ -0,0 +1,87 @@
+"""
+Benchmark: preranker.select on a whole filing's text (prerank mode, before the map-reduce).
+
+Usage:
+    python bench_prerank.py                   # synthetic ~30MB 10-K style text, 30k token budget
+    python bench_prerank.py path/to/10k.txt   # real filing text (e.g. from html_text.extract_text)
+    python bench_prerank.py --size-mb 50 --max-tokens 60000
+
+Prints the best of --repeat runs. Fails (exit 1) if the selection is empty or its estimated
+tokens exceed the budget.
+"""
+import argparse
+import random
+import sys
+import time
+
+# Common words weighted like running text (short function words dominate), plus filing terms
+COMMON = ("the of and to in a is for that on by with as are or be our we from at this which an "
+          "not have has its may were was will been such these other any under also all would").split()
+FILING = ("company revenue net sales operating income margin products services segment customers "
+          "fiscal year quarter increase decrease compared primarily due higher lower million billion "
+          "cash flows financial statements tax rate share repurchase dividend guidance outlook risk "
+          "factors litigation acquisition impairment restructuring tariff expect forecast results "
+          "market competition supply chain manufacturing research development employees regulation").split()
+
+def make_synthetic_text(size_mb, seed=1):
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    # A long tail of rare words (names, places, technical terms) for a realistic vocabulary
+    rare = [''.join(rng.choice(letters) for _ in range(rng.randint(4, 13))) for _ in range(20000)]
+    vocab = COMMON + FILING + rare
+    weights = [40] * len(COMMON) + [8] * len(FILING) + [1] * len(rare)
+    words = rng.choices(vocab, weights=weights, k=size_mb * 1024 * 1024 // 5)
+
+    parts = []
+    size = 0
+    position = 0
+    while size < size_mb * 1024 * 1024 and position < len(words):
+        count = rng.randint(6, 35)
+        sentence = " ".join(words[position:position + count])
+        position += count
+        sentence = sentence[:1].upper() + sentence[1:] + rng.choice((".", " of $1,234 million.", ", or 12%."))
+        if rng.random() < 0.05: # Table rows: label and figures on their own line
+            sentence += "\nNet sales $ 391,035 $ 383,285 2 %\n"
+        parts.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description='preranker.select benchmark')
+    parser.add_argument('path', nargs='?', help='Plain-text filing to benchmark (default: synthetic)')
+    parser.add_argument('--size-mb', type=int, default=30, help='Synthetic text size')
+    parser.add_argument('--max-tokens', type=int, default=30000, help='Token budget')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs (the best is reported)')
+    args = parser.parse_args()
+
+    from sec_module import chunker, preranker
+    if args.path:
+        with open(args.path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    else:
+        text = make_synthetic_text(args.size_mb)
+    size_mb = len(text.encode('utf-8')) / 1024 / 1024
+    print(f"Input: {args.path or 'synthetic'} ({size_mb:.1f} MB, ~{chunker.estimate_tokens(text):,} tokens)")
+
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        selected, stats = preranker.select(text, args.max_tokens)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tokens = chunker.estimate_tokens(selected)
+    print(f"select: {best:6.3f}s ({size_mb / best:6.1f} MB/s) | kept {stats['kept']:,}/{stats['sentences']:,} "
+          f"sentences, ~{tokens:,}/{args.max_tokens:,} tokens")
+
+    ok = True
+    if not selected.strip():
+        print("[FAIL] Empty selection.")
+        ok = False
+    if tokens > args.max_tokens:
+        print("[FAIL] Selection exceeds the token budget.")
+        ok = False
+    print("[OK] Non-empty selection within the budget." if ok else "")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -54,6 +54,11 @@ with st.sidebar:
     st.metric("워드프레스 연결", "정상", delta_color="normal")
     if st.button("🔄 설정 새로고침"):
         st.rerun()
+
+    # Gemini 응답 캐시 (모든 봇 공용) - 캐시 적중 = 아낀 API 호출 수
+    from utils import gemini_cache
+    cache_stats = gemini_cache.stats()
+    st.metric("Gemini 캐시 적중", f"{cache_stats['hits']}회", help=f"미스 {cache_stats['misses']}회 | 저장 {cache_stats['entries']}건 ({cache_stats['bytes'] / 1024 / 1024:.1f} MB)")
     st.markdown("---")
     st.info("💡 설정을 변경하면 즉시 반영됩니다.")
 
@@ -225,6 +230,33 @@ with tab1:
             config['stock']['report_types'] = selected_types
             save_config(config)
 
+        st.subheader("SEC 티커 인덱스 (Ticker → CIK)")
+        from sec_module import ticker_index # 늦은 import (주식 봇/배치와 같은 인덱스 파일 공유)
+
+        idx_status = ticker_index.index_status()
+        if idx_status["exists"] and idx_status["built_at"]:
+            built_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(idx_status["built_at"]))
+            st.caption(f"📇 {idx_status['count']}개 종목 | 마지막 갱신: {built_at}")
+        else:
+            st.caption("📇 인덱스가 아직 없습니다. (첫 실행 시 자동 생성)")
+
+        current_ttl = config['stock'].get('cik_index_ttl_hours', 24)
+        new_ttl = st.number_input("인덱스 갱신 주기 (시간)", min_value=1, max_value=24 * 30, value=int(current_ttl), key="cik_ttl")
+
+        ic1, ic2 = st.columns(2)
+        with ic1:
+            if st.button("💾 갱신 주기 저장", key="save_cik_ttl"):
+                config['stock']['cik_index_ttl_hours'] = int(new_ttl)
+                save_config(config)
+        with ic2:
+            if st.button("🔄 지금 갱신", key="refresh_cik_index"):
+                from sec_module import core
+                with st.spinner("company_tickers.json 다운로드 중..."):
+                    if ticker_index.refresh_index(core.SEC_HEADERS):
+                        st.rerun()
+                    else:
+                        st.error("인덱스 갱신 실패")
+
     with col2:
         st.subheader("수동 실행")
         st.write("지금 바로 분석을 시작합니다.")
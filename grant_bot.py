@@ -7,6 +7,7 @@ import json
 import re
 from bs4 import BeautifulSoup
 from utils.grant_ai import analyze_grant_as_expert
+from utils import model_router
 # from bot_status import update_status # Removed invalid import
 # Since bot_status.json is shared, let's redefine update_status here locally to avoid circular imports or just import if available. 
 # Actually stock_bot.py had it locally. Let's make a shared util later. For now, local is fine.
@@ -282,6 +283,7 @@ def run_grant_job(dry_run=True, limit=None):
     update_status("running", "[START] 지원사업 공고 수집 시작...", 0.1)
     
     config = load_config()
+    model_router.reload()  # 모델 라우팅 설정(bot_config.json "models") 다시 읽기
     grant_config = config.get('grant', {})
     categories = grant_config.get('categories', {})
     sources = grant_config.get('sources', [])
@@ -549,8 +551,12 @@ if __name__ == "__main__":
     parser.add_argument('--limit', type=int, default=None, help='Limit number of posts')
     
     parser.add_argument('--loop', action='store_true', help='Run in infinite loop mode')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the Gemini response cache')
     
     args = parser.parse_args()
+    if args.no_cache:
+        from utils import gemini_cache
+        gemini_cache.set_bypass(True)
     
     if args.loop:
         print("[SYSTEM] Grant Bot Starting (Loop Mode)")
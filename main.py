@@ -2,7 +2,7 @@ import schedule
 import time
 import os
 from dotenv import load_dotenv
-from stock_bot import run_stock_job
+from stock_bot import run_stock_job, run_submissions_ingest
 from grant_bot import run_grant_job
 from marketing_bot import run_marketing_job
 
@@ -14,6 +14,7 @@ def run_schedule():
     print(f"Target WordPress: {os.getenv('WP_URL')}")
 
     # 스케줄 설정
+    schedule.every().day.at("03:00").do(run_submissions_ingest)  # 새벽 3시 (SEC 벌크 공시 목록 적재)
     schedule.every().day.at("07:00").do(run_stock_job)      # 아침 7시
     schedule.every().day.at("13:00").do(run_grant_job)      # 오후 1시
     schedule.every().day.at("18:00").do(run_marketing_job)  # 저녁 6시
@@ -3,6 +3,8 @@ import google.generativeai as genai
 import os
 import datetime
 import wp_utils
+from utils import gemini_limiter
+from utils import model_router
 from urllib.parse import quote
 from dotenv import load_dotenv
 
@@ -13,11 +15,9 @@ load_dotenv('credentials.env')
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
-    # sec_module과 동일한 모델명 사용
-    model = genai.GenerativeModel('gemini-flash-latest')
+    # 모델은 utils/model_router.py가 bot_config.json "models" 설정에 따라 선택
 else:
     print("⚠️ GEMINI_API_KEY가 없습니다.")
-    model = None
 
 def load_config():
     import json
@@ -44,8 +44,15 @@ def fetch_news(keyword):
         print(f"❌ RSS 파싱 에러 ({keyword}): {e}")
         return []
 
-def summarize_news(all_news):
-    if not model:
+# 프롬프트를 수정하면 버전을 올려서 캐시된 응답을 재사용하지 않도록 함
+PROMPT_VERSION = "news-1"
+
+def summarize_news(all_news, use_cache=True):
+    # summarize_news_async()의 동기 래퍼 (공용 Gemini 이벤트 루프에서 실행)
+    return gemini_limiter.run_sync(summarize_news_async(all_news, use_cache))
+
+async def summarize_news_async(all_news, use_cache=True):
+    if not GEMINI_API_KEY:
         return "<h3>AI 요약 실패 (API 키 없음)</h3><p>환경변수를 확인해주세요.</p>"
     
     print("🧠 Gemini가 뉴스를 분석하고 있습니다...")
@@ -72,8 +79,8 @@ def summarize_news(all_news):
     """
     
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        # 같은 뉴스 목록이면 Gemini 응답 캐시에서 바로 반환 (재실행 시 할당량 절약)
+        return await model_router.generate_async(prompt, "marketing", "news", prompt_version=PROMPT_VERSION, use_cache=use_cache)
     except Exception as e:
         print(f"❌ Gemini 에러: {e}")
         return f"<h3>AI 분석 중 오류가 발생했습니다.</h3><p>{str(e)}</p>"
@@ -100,6 +107,7 @@ def run_marketing_job():
     update_status("running", "[START] 뉴스 키워드 수집 시작...", 0.1)
     
     config = load_config()
+    model_router.reload()  # 모델 라우팅 설정(bot_config.json "models") 다시 읽기
     keywords = config.get('marketing', {}).get('keywords', [])
     
     all_news = {}
@@ -1,28 +1,219 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+import threading
+import queue
 import time
 import os
 import core
 import sp500_loader
 
-def process_batch(tickers, progress_callback=None, stop_event=None):
+# --- Pipeline Configuration ---
+# Network stages (SEC download, Gemini, yfinance) run in threads; CPU stages
+# (HTML extraction, docx rendering) run in processes. Each hand-off buffer holds
+# at most QUEUE_SIZE tickers, so a slow stage throttles the ones before it.
+NETWORK_WORKERS = int(os.getenv("BATCH_NETWORK_WORKERS", "4"))
+CPU_WORKERS = int(os.getenv("BATCH_CPU_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "4"))
+BATCH_READY_EVERY = 5
+FORM_TYPE = "10-K" # Form translated for every ticker
+# Boilerplate removed before analysis (comma-separated, see pruning.DEFAULT_RULES; "" = off)
+PRUNE_RULES = [r.strip() for r in os.getenv("BATCH_PRUNE_RULES", ",".join(core.pruning.DEFAULT_RULES)).split(",") if r.strip()]
+
+def process_batch(tickers, progress_callback=None, stop_event=None, parallel=True):
     """
-    Process a list of tickers sequentially.
-    
+    Process a list of tickers (download -> extract -> translate -> financials -> Word).
+
     Args:
         tickers: List of ticker strings.
         progress_callback: Function(current_index, total, message) to update UI.
         stop_event: Function() -> bool. If returns True, stop processing.
+        parallel: Run the staged pipeline (default). False: one ticker at a time.
+
+    progress_callback is always called from the calling thread. Every 5 reports it is
+    also called as (current, total, "BATCH_READY", results).
+    """
+    if parallel:
+        return _process_pipeline(tickers, progress_callback, stop_event)
+    return _process_sequential(tickers, progress_callback, stop_event)
+
+# --- Pipeline Stages (module-level so the process pool can pickle them) ---
+
+def _fetch_stage(ticker):
+    """
+    Network: resolve the latest 10-K and download it into the filing store.
+    Returns (filing_date, stored path or None, html or None, url), or None if nothing was found.
+    """
+    cik = core.get_cik_from_ticker(ticker)
+    if not cik:
+        return None
+    url, filing_date = core.get_latest_filing_url(cik, ticker, FORM_TYPE)
+    if not url:
+        return None
+    path = core.filing_store.get(url, core.SEC_HEADERS)
+    if path:
+        return filing_date, path, None, url
+    # Outside the Archives tree: fall back to an in-memory download
+    html = core.download_filing_html(url)
+    return (filing_date, None, html, url) if html else None
+
+def _extract_stage(path, html, prune_rules=None):
+    """
+    CPU (process pool): stored filing -> plain text (boilerplate pruned).
+    """
+    if path:
+        with core.filing_store.open_text(path) as stream:
+            return core.extract_sections(stream, prune_rules)
+    return core.extract_sections(html, prune_rules)
+
+def _analyze_stage(ticker, text, filing_date, notify, filing_url=None):
+    """
+    Network: full-mode Gemini translation, then financials (XBRL highlights of the filing at filing_url).
+    """
+    report = core.analyze_with_gemini(text, ticker, filing_date, progress_callback=notify, mode="full", form_type=FORM_TYPE)
+    if not report:
+        return None
+    income, balance, cashflow, info = core.get_financials(ticker, filed_after=filing_date)
+    cik = core.get_cik_from_ticker(ticker)
+    highlights = core.get_financial_highlights(cik, ticker, FORM_TYPE, filing_url) if cik else None
+    return report, income, balance, cashflow, info, highlights
+
+def _render_stage(ticker, filing_date, analysis):
+    """
+    CPU (process pool): build and save the Word report.
+    """
+    report, income, balance, cashflow, info, highlights = analysis
+    return core.save_to_word(ticker, report, filing_date, income, balance, cashflow, info, highlights)
+
+def _process_pipeline(tickers, progress_callback=None, stop_event=None):
+    total = len(tickers)
+    results = []
+    messages = queue.Queue() # (index, msg) from worker threads, replayed on this thread
+
+    def report(i, msg):
+        print(msg)
+        if progress_callback:
+            progress_callback(i + 1, total, msg)
+
+    stages = ["fetch", "extract", "analyze", "render"]
+    limits = {"fetch": NETWORK_WORKERS, "extract": CPU_WORKERS, "analyze": NETWORK_WORKERS, "render": CPU_WORKERS}
+    downstream = {"fetch": "extract", "extract": "analyze", "analyze": "render", "render": None}
+    waiting = {stage: deque() for stage in stages[1:]} # Bounded hand-off buffers (QUEUE_SIZE)
+    running = {} # future -> (stage, index, ticker, state)
+    pending = deque(enumerate(t.strip().upper() for t in tickers))
+    stopped = False
+
+    def busy(stage):
+        return sum(1 for s, _, _, _ in running.values() if s == stage)
+
+    def can_start(stage):
+        # Back-pressure: results of running jobs must still fit in the next buffer
+        if busy(stage) >= limits[stage]:
+            return False
+        nxt = downstream[stage]
+        return nxt is None or len(waiting[nxt]) + busy(stage) < QUEUE_SIZE
+
+    def submit(pool, stage, index, ticker, state):
+        if stage == "fetch":
+            future = pool.submit(_fetch_stage, ticker)
+        elif stage == "extract":
+            future = pool.submit(_extract_stage, state[1], state[2], PRUNE_RULES)
+        elif stage == "analyze":
+            notify = lambda current, chunks, msg, i=index, t=ticker: messages.put((i, f"[{t}] {msg}"))
+            future = pool.submit(_analyze_stage, ticker, state[1], state[0], notify, state[2])
+        else:
+            future = pool.submit(_render_stage, ticker, state[0], state[1])
+        running[future] = (stage, index, ticker, state)
+
+    with ThreadPoolExecutor(max_workers=NETWORK_WORKERS * 2) as threads, \
+         ProcessPoolExecutor(max_workers=CPU_WORKERS) as processes:
+        pools = {"fetch": threads, "extract": processes, "analyze": threads, "render": processes}
+        # Yahoo data for the whole list is fetched concurrently while SEC/Gemini stages run
+        prefetch = threading.Thread(target=core.prefetch_financials, args=([t for _, t in pending],), daemon=True)
+        prefetch.start()
+
+        while pending or running or any(waiting.values()):
+            if not stopped and stop_event and stop_event():
+                stopped = True
+                # Tickers not yet translated are dropped; translations in flight are finished and saved
+                print("Stopped by user.")
+                if progress_callback:
+                    progress_callback(total - len(pending), total, "Stopped by user.")
+                pending.clear()
+                waiting["extract"].clear()
+                waiting["analyze"].clear()
+                for future, (stage, _, _, _) in list(running.items()):
+                    if stage in ("fetch", "extract") and future.cancel():
+                        del running[future]
+
+            # Start work downstream first so finished items leave the buffers before new ones arrive
+            for stage in reversed(stages[1:]):
+                while waiting[stage] and can_start(stage):
+                    index, ticker, state = waiting[stage].popleft()
+                    submit(pools[stage], stage, index, ticker, state)
+
+            while pending and can_start("fetch"):
+                index, ticker = pending.popleft()
+                if os.path.exists(f"reports/{ticker}.docx"):
+                    report(index, f"Skipping {ticker} (Report already exists)")
+                    continue
+                report(index, f"Processing {ticker}...")
+                submit(threads, "fetch", index, ticker, None)
+
+            if not running:
+                continue
+            finished, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+            while not messages.empty():
+                report(*messages.get())
+
+            for future in finished:
+                stage, index, ticker, state = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"Error processing {ticker} ({stage}): {e}")
+                    continue
+
+                if stopped and stage in ("fetch", "extract"):
+                    continue # Finished after the stop request: not translated, drop it
+                if stage == "fetch":
+                    if not result:
+                        print(f"[{ticker}] No data found.")
+                        continue
+                    waiting["extract"].append((index, ticker, result))
+                elif stage == "extract":
+                    if not result:
+                        print(f"[{ticker}] Extraction failed.")
+                        continue
+                    waiting["analyze"].append((index, ticker, (state[0], result, state[3])))
+                elif stage == "analyze":
+                    if not result:
+                        continue
+                    waiting["render"].append((index, ticker, (state[0], result)))
+                else:
+                    results.append(result)
+                    if len(results) % BATCH_READY_EVERY == 0 and progress_callback:
+                        progress_callback(index + 1, total, "BATCH_READY", results)
+
+        while not messages.empty():
+            report(*messages.get())
+
+    return results
+
+def _process_sequential(tickers, progress_callback=None, stop_event=None):
+    """
+    Process a list of tickers sequentially.
     """
     total = len(tickers)
     results = []
-    
+
     for i, ticker in enumerate(tickers):
         if stop_event and stop_event():
             if progress_callback:
                 progress_callback(i, total, "Stopped by user.")
             break
-            
+
         ticker = ticker.strip().upper()
-        
+
         # Check if report already exists
         report_path = f"reports/{ticker}.docx"
         if os.path.exists(report_path):
@@ -31,51 +222,54 @@ def process_batch(tickers, progress_callback=None, stop_event=None):
             if progress_callback:
                 progress_callback(i + 1, total, msg)
             continue
-            
+
         try:
             msg = f"Processing {ticker}..."
             if progress_callback:
                 progress_callback(i + 1, total, msg)
-                
-            # 1. Get Data
-            html, filing_date = core.get_sec_data(ticker)
+
+            # 1. Get Data (read through the local filing store, so re-runs don't re-download)
+            cik = core.get_cik_from_ticker(ticker)
+            url, filing_date = core.get_latest_filing_url(cik, ticker, FORM_TYPE) if cik else (None, None)
+            html = core.download_filing_html(url) if url else None
             if not html:
                 print(f"[{ticker}] No data found.")
                 continue
-                
+
             # 2. Extract
-            text = core.extract_sections(html)
+            text = core.extract_sections(html, PRUNE_RULES)
             if not text:
                 print(f"[{ticker}] Extraction failed.")
                 continue
-                
+
             # Wrapper to bubble up chunk progress
             def chunk_callback(current_chunk, total_chunks, msg):
                 if progress_callback:
                     progress_callback(i + 1, total, f"[{ticker}] {msg}")
 
             # 3. Analyze (Full mode for better quality as requested)
-            report = core.analyze_with_gemini(text, ticker, filing_date, progress_callback=chunk_callback, mode="full")
-            
+            report = core.analyze_with_gemini(text, ticker, filing_date, progress_callback=chunk_callback, mode="full", form_type=FORM_TYPE)
+
             if report:
                 # 4. Financials
-                income, balance, cashflow, info = core.get_financials(ticker)
-                
+                income, balance, cashflow, info = core.get_financials(ticker, filed_after=filing_date)
+                highlights = core.get_financial_highlights(cik, ticker, FORM_TYPE, url)
+
                 # 5. Save
-                filename = core.save_to_word(ticker, report, filing_date, income, balance, cashflow, info)
+                filename = core.save_to_word(ticker, report, filing_date, income, balance, cashflow, info, highlights)
                 results.append(filename)
-                
+
                 # Rate limit sleep (important for free tier/API limits)
-                time.sleep(2) 
-                
+                time.sleep(2)
+
                 # Intermediate Callback (e.g., for batch downloads)
                 if (i + 1) % 5 == 0:
                     if progress_callback:
                         progress_callback(i + 1, total, "BATCH_READY", results)
-            
+
         except Exception as e:
             print(f"Error processing {ticker}: {e}")
             # Continue to next ticker even if one fails
             continue
-            
+
     return results
@@ -0,0 +1,103 @@
+import re
+
+# --- Configuration ---
+CHARS_PER_TOKEN = 4.0 # Gemini averages ~4 characters per token on English filings
+# Per-mode input budgets. 'full' is bounded by the OUTPUT limit: a translation is
+# about as long as its input, so chunks must stay well under the max output tokens.
+MODE_MAX_TOKENS = {
+    "summary": 200000,
+    "full": 8000,
+    "diff": 200000,
+}
+# Overlap gives summary chunks some context; a translation must not repeat text.
+MODE_OVERLAP_TOKENS = {
+    "summary": 200,
+    "full": 0,
+    "diff": 0, # Diff hunks carry their own context
+}
+
+# Preferred cut points, strongest first (searched only near the end of each window)
+_SECTION_RE = re.compile(r"\b(?:PART\s+I{1,3}V?\b|Item\s*\d{1,2}[A-C]?\s*[\.:])", re.IGNORECASE)
+_SENTENCE_RE = re.compile(r"[.!?][\"'”’)\]]?\s+(?=[A-Z0-9\"'“‘(])")
+SECTION_SEARCH = 0.2 # Look for a section heading in the last 20% of the window
+SENTENCE_SEARCH = 0.5 # ... else a sentence end in the last 50%
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (no API call).
+    """
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+def _find_boundary(text, start, end):
+    """
+    Best cut position in text[start:end]: a section heading, else a sentence end,
+    else whitespace, else the hard limit.
+    """
+    length = end - start
+
+    tail = start + int(length * (1 - SECTION_SEARCH))
+    last = None
+    for match in _SECTION_RE.finditer(text, tail, end):
+        last = match
+    if last and last.start() > start:
+        return last.start()
+
+    tail = start + int(length * (1 - SENTENCE_SEARCH))
+    last = None
+    for match in _SENTENCE_RE.finditer(text, tail, end):
+        last = match
+    if last:
+        return last.end()
+
+    space = text.rfind(' ', tail, end)
+    if space > start:
+        return space + 1
+    return end
+
+def _overlap_start(text, boundary, overlap_chars, floor):
+    """
+    Start the next chunk `overlap_chars` before the boundary, snapped forward to a sentence start.
+    """
+    pos = max(boundary - overlap_chars, floor)
+    match = _SENTENCE_RE.search(text, pos, boundary)
+    return match.end() if match else pos
+
+def chunk_text(text, max_tokens=MODE_MAX_TOKENS["summary"], overlap_tokens=0, count_tokens=None):
+    """
+    Split text into chunks of at most ~max_tokens, cutting at section or sentence boundaries.
+    overlap_tokens: context repeated at the start of the next chunk.
+    count_tokens: optional exact counter (text -> int, e.g. the model's count_tokens);
+                  chunks over budget are shrunk until they fit.
+    Runs in linear time; only the tail of each window is scanned for boundaries.
+    """
+    text = text or ""
+    max_chars = max(int(max_tokens * CHARS_PER_TOKEN), 1)
+    overlap_chars = int(overlap_tokens * CHARS_PER_TOKEN)
+
+    chunks = []
+    start = 0
+    n = len(text)
+    while start < n:
+        end = min(start + max_chars, n)
+        if end < n:
+            end = _find_boundary(text, start, end)
+
+        if count_tokens:
+            actual = count_tokens(text[start:end])
+            while actual > max_tokens and end - start > 1:
+                shrink_to = start + int((end - start) * max_tokens / actual * 0.95)
+                end = _find_boundary(text, start, max(shrink_to, start + 1))
+                actual = count_tokens(text[start:end])
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= n:
+            break
+
+        if overlap_chars:
+            # Never let the overlap swallow the whole chunk (guarantees progress)
+            start = _overlap_start(text, end, min(overlap_chars, (end - start) // 2), start + 1)
+        else:
+            start = end
+    return chunks
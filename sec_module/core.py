@@ -1,17 +1,37 @@
-import requests
 import google.generativeai as genai
-from bs4 import BeautifulSoup
-import re
+from concurrent.futures import wait
+import asyncio
+import queue
+import numbers
 import time
+import re
 import os
 import json
 from dotenv import load_dotenv
-import yfinance as yf
 from docx import Document
 from docx.shared import Pt, RGBColor, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
+from sec_module import sec_client
+from sec_module import ticker_index
+from sec_module import submissions
+from sec_module import filing_store
+from sec_module import html_text
+from sec_module import sections
+from sec_module import chunker
+from sec_module import xbrl_facts
+from sec_module import daily_index
+from sec_module import filings_db
+from sec_module import docx_tables
+from sec_module import yf_cache
+from sec_module import filing_diff
+from sec_module import pruning
+from sec_module import preranker
+from sec_module import filing_index
+from sec_module import structured_report
+from utils import gemini_limiter
+from utils import model_router
+from utils import gemini_context
 
 # Load environment variables
 load_dotenv()
@@ -26,63 +46,126 @@ if not GEMINI_API_KEY:
 
 genai.configure(api_key=GEMINI_API_KEY)
 model = genai.GenerativeModel('gemini-flash-latest')
+# Bump when the analysis prompts change so cached Gemini answers are not reused
+PROMPT_VERSION = "sec-3"
+STRUCTURED_PROMPT_VERSION = "sec-json-1" # JSON analysis (structured_report.SCHEMA)
+MAX_CONCURRENT_CHUNKS = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")) # Chunks analyzed in parallel
 
 # --- Data Collection ---
 
-def get_cik_from_ticker(ticker):
+def get_cik_from_ticker(ticker, ttl_hours=None):
     """
-    Fetch company_tickers.json to map Ticker -> CIK.
+    Map Ticker -> CIK using the local ticker index (sec_cache/ticker_index.json).
+    The index is rebuilt from company_tickers.json when older than ttl_hours.
     Returns CIK as a string (padded with zeros if needed).
     """
+    if ttl_hours is None:
+        ttl_hours = ticker_index.DEFAULT_TTL_HOURS
     try:
-        url = "https://www.sec.gov/files/company_tickers.json"
-        response = requests.get(url, headers=SEC_HEADERS)
-        response.raise_for_status()
-        data = response.json()
-        
-        for key, value in data.items():
-            if value['ticker'] == ticker.upper():
-                return str(value['cik_str']).zfill(10) # CIK is 10 digits
+        cik = ticker_index.get_cik(ticker, SEC_HEADERS, ttl_hours=ttl_hours)
+        if cik:
+            return cik
         print(f"[{ticker}] Ticker not found in SEC database.")
         return None
     except Exception as e:
         print(f"[{ticker}] Error fetching CIK: {e}")
         return None
 
+def ingest_bulk_submissions(tickers):
+    """
+    Load the filings of `tickers` from SEC's bulk submissions.zip into the local filings DB.
+    Returns (companies, rows) loaded, or None on failure.
+    """
+    ciks = set()
+    for ticker in tickers:
+        cik = ticker_index.get_cik(ticker, SEC_HEADERS)
+        if cik:
+            ciks.add(cik)
+    print(f"[FilingsDB] Ingesting {len(ciks)} companies from submissions.zip...")
+    try:
+        return filings_db.ingest(SEC_HEADERS, ciks)
+    except Exception as e:
+        print(f"[FilingsDB] Ingest failed: {e}")
+        return None
+
+def get_latest_filings(cik, ticker, form_types=("10-K",)):
+    """
+    Find the latest filing for every requested form type from ONE submissions fetch.
+    The submissions response is cached on disk and revalidated with ETag/If-Modified-Since.
+    Returns: {form_type: (url, filing_date)} (missing forms are omitted)
+    """
+    try:
+        found = submissions.find_latest_filings(cik, form_types, SEC_HEADERS)
+    except Exception as e:
+        print(f"[{ticker}] Error fetching submissions: {e}")
+        return {}
+
+    results = {}
+    for form_type in form_types:
+        if form_type in found:
+            file_url = found[form_type]['url']
+            filing_date = found[form_type]['filing_date']
+            print(f"[{ticker}] Found {form_type} URL: {file_url} (Date: {filing_date})")
+            results[form_type] = (file_url, filing_date)
+        else:
+            print(f"[{ticker}] No {form_type} found in recent submissions.")
+    return results
+
 def get_latest_filing_url(cik, ticker, form_type="10-K"):
     """
-    Fetch company submissions to find the latest URL for a specific form type.
+    Find the latest URL for a specific form type.
+    Answered from the local filings database (nightly submissions.zip ingest) when it is
+    fresh and knows the company; otherwise from the company's submissions.
     Returns: (url, filing_date)
     """
     try:
-        # SEC Submissions API: https://data.sec.gov/submissions/CIK{cik}.json
-        url = f"https://data.sec.gov/submissions/CIK{cik}.json"
-        response = requests.get(url, headers=SEC_HEADERS)
-        response.raise_for_status()
-        data = response.json()
-        
-        filings = data['filings']['recent']
-        
-        # Iterate to find the latest filing of the requested type
-        for i in range(len(filings['accessionNumber'])):
-            form = filings['form'][i]
-            if form == form_type:
-                accession_number = filings['accessionNumber'][i]
-                primary_document = filings['primaryDocument'][i]
-                filing_date = filings['filingDate'][i]
-                
-                # Construct URL
-                accession_number_no_dashes = accession_number.replace('-', '')
-                cik_int = int(cik)
-                
-                file_url = f"https://www.sec.gov/Archives/edgar/data/{cik_int}/{accession_number_no_dashes}/{primary_document}"
-                print(f"[{ticker}] Found {form_type} URL: {file_url} (Date: {filing_date})")
-                return file_url, filing_date
-                
-        print(f"[{ticker}] No {form_type} found in recent submissions.")
-        return None, None
+        if filings_db.is_fresh():
+            found = filings_db.latest_filing(cik, form_type)
+            if found:
+                file_url = submissions.filing_url(cik, found['accession_number'], found['primary_document'])
+                print(f"[{ticker}] Found {form_type} URL in filings DB: {file_url} (Date: {found['filing_date']})")
+                return file_url, found['filing_date']
+    except Exception as e:
+        print(f"[{ticker}] Filings DB lookup failed: {e}")
+    return get_latest_filings(cik, ticker, [form_type]).get(form_type, (None, None))
+
+def get_previous_filing_url(cik, ticker, form_type, before_date):
+    """
+    The filing of form_type before the one filed on before_date (for year-over-year diffs).
+    Uses the local filings DB when fresh, else the cached submissions index.
+    Returns: (url, filing_date), or (None, None)
+    """
+    try:
+        if filings_db.is_fresh():
+            found = filings_db.previous_filing(cik, form_type, before_date)
+            if found:
+                file_url = submissions.filing_url(cik, found['accession_number'], found['primary_document'])
+                return file_url, found['filing_date']
+        found = submissions.find_previous_filing(cik, form_type, SEC_HEADERS)
+        if found and found['filing_date'] < str(before_date):
+            return found['url'], found['filing_date']
+    except Exception as e:
+        print(f"[{ticker}] Error looking up previous {form_type}: {e}")
+    print(f"[{ticker}] No {form_type} before {before_date} found.")
+    return None, None
+
+def detect_new_filings(form_types):
+    """
+    Companies that filed any of form_types since the last processed EDGAR daily index.
+    Returns ({cik (int): set of forms}, newest_index_date). The dict is None when there is
+    no watermark yet (first run: scan everything) or the daily index could not be read.
+    Save newest_index_date with daily_index.save_watermark() once those companies are processed.
+    """
+    since = daily_index.load_watermark()
+    try:
+        if since is None:
+            print("[DailyIndex] No watermark yet. Full scan this cycle.")
+            return None, daily_index.latest_index_date(SEC_HEADERS)
+        filers, newest = daily_index.find_new_filers(form_types, SEC_HEADERS, since)
+        print(f"[DailyIndex] {len(filers)} companies filed {list(form_types)} after {since} (index up to {newest}).")
+        return filers, newest
     except Exception as e:
-        print(f"[{ticker}] Error fetching {form_type} URL: {e}")
+        print(f"[DailyIndex] Error reading EDGAR daily index: {e}")
         return None, None
 
 def get_sec_data(ticker, form_type="10-K"):
@@ -98,197 +181,693 @@ def get_sec_data(ticker, form_type="10-K"):
     url, filing_date = get_latest_filing_url(cik, ticker, form_type)
     if not url:
         return None, None
-        
+
+    html = download_filing_html(url)
+    if html is None:
+        print(f"[{ticker}] Error downloading HTML")
+        return None, None
+    return html, filing_date
+
+def get_financial_highlights(cik, ticker, form_type="10-K", filing_url=None):
+    """
+    Current vs prior-year Revenue / Operating Income / Net Income / EPS from SEC XBRL companyfacts.
+    Values are taken from the filing at filing_url when given (else the latest filing of form_type).
+    Returns a DataFrame (see xbrl_facts.build_highlights) or None.
+    """
     try:
-        response = requests.get(url, headers=SEC_HEADERS)
-        response.raise_for_status()
-        time.sleep(0.1) 
-        return response.text, filing_date
+        facts = xbrl_facts.load_company_facts(cik, SEC_HEADERS)
+        accession = filing_store.parse_filing_url(filing_url)[0] if filing_url else None
+        table = xbrl_facts.build_highlights(facts, form_type, accession)
+        if table is None:
+            print(f"[{ticker}] No XBRL facts found for {form_type}.")
+        return table
     except Exception as e:
-        print(f"[{ticker}] Error downloading HTML: {e}")
-        return None, None
+        print(f"[{ticker}] Error fetching XBRL facts: {e}")
+        return None
 
 def download_filing_html(url):
     """
     Download the HTML content from the given SEC URL.
+    Archives documents are read through the local filing store (sec_cache/filings),
+    so regenerating a report does not download the filing again.
     """
     try:
-        response = requests.get(url, headers=SEC_HEADERS)
+        path = filing_store.get(url, SEC_HEADERS)
+        if path:
+            return filing_store.read_text(path)
+
+        response = sec_client.get(url, headers=SEC_HEADERS)
         response.raise_for_status()
-        time.sleep(0.1)
         return response.text
     except Exception as e:
         print(f"[ERROR] Failed to download SEC filing: {e}")
         return None
 
-def extract_sections(html_content):
+def open_filing_text(url):
+    """
+    Open an SEC filing as a streaming text reader (downloaded once into the filing store).
+    Returns None if the URL is not an EDGAR Archives document or the download fails.
+    """
+    try:
+        path = filing_store.get(url, SEC_HEADERS)
+        return filing_store.open_text(path) if path else None
+    except Exception as e:
+        print(f"[ERROR] Failed to download SEC filing: {e}")
+        return None
+
+def extract_filing_documents(filing_url, form_type, parts, ticker, prune_rules=None):
+    """
+    Selective download: read the filing index (index.json / FilingSummary.xml) first and
+    fetch only the documents in `parts` (e.g. ['exhibit:99.1'] for an 8-K press release,
+    ['statements'] for the statement R pages; see filing_index.py) instead of the primary document.
+    Returns their extracted text (in order), or None if none of them exist.
+    """
+    try:
+        urls, selected_bytes, primary_bytes = filing_index.select_documents(filing_url, parts, SEC_HEADERS)
+    except Exception as e:
+        print(f"[{ticker}] Error reading filing index: {e}")
+        return None
+    if not urls:
+        print(f"[{ticker}] No {parts} documents in the {form_type} filing.")
+        return None
+    names = [u.rsplit('/', 1)[1] for u in urls]
+    print(f"[{ticker}] Selected {names}: {selected_bytes:,} bytes (primary document: {primary_bytes:,} bytes).")
+
+    texts = []
+    for url in urls:
+        stream = open_filing_text(url)
+        if not stream:
+            continue
+        with stream:
+            # Item-based pruning (TOC, exhibit index) only applies to the primary document
+            texts.append(extract_sections(stream, prune_rules, form_type if url == filing_url else None))
+    return "\n\n".join(t for t in texts if t) or None
+
+def extract_sections(html_content, prune_rules=None, form_type="10-K", compact_tables=True):
     """
     Extract full text from the 10-K HTML, stripping tags.
+    html_content: HTML string or a text stream (see open_filing_text).
+    The HTML is parsed incrementally, so peak memory does not grow with the filing size.
+    prune_rules: boilerplate to drop before analysis (see pruning.DEFAULT_RULES: hidden
+                 inline XBRL, page numbers, running headers/footers, TOC, exhibit index).
+    compact_tables: tables become "cell | cell" rows, one per line (spacer cells dropped,
+                    '$' / '(' fragments merged into their numbers, repeated headers removed).
     """
     print("Preprocessing HTML (Full Text)...")
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Get text and clean up whitespace
-    text = soup.get_text(separator='\n')
-    text = re.sub(r'\s+', ' ', text).strip() # Collapse multiple spaces/newlines
+    if prune_rules:
+        unknown = set(prune_rules) - set(pruning.DEFAULT_RULES)
+        if unknown:
+            print(f"[WARNING] Unknown prune rules ignored: {sorted(unknown)}")
+        text, stats = pruning.extract_text(html_content, form_type, prune_rules, compact_tables)
+        print(pruning.describe(stats))
+    else:
+        text = html_text.extract_text(html_content, compact_tables=compact_tables)
     
     print(f"Extracted {len(text)} characters.")
     return text
 
-def chunk_text(text, chunk_size=2000000):
+def _section_index(url, text, form_type):
+    # Section offsets are cached next to the filing in the filing store
+    cache_path = filing_store.sidecar_path(url, '.sections.json') if url else None
+    index = sections.load_cached_index(cache_path, len(text)) if cache_path else None
+    if index is None:
+        index = sections.index_sections(text, form_type)
+        if cache_path and index:
+            sections.save_cached_index(cache_path, len(text), index)
+    return index
+
+def select_filing_sections(url, text, form_type, items):
+    """
+    Keep only the requested Items (e.g. ['1', '1A', '7']) of a 10-K/10-Q text.
+    Section offsets are cached next to the filing in the filing store.
+    Falls back to the full text when the form has no Item layout (8-K) or nothing matched.
+    """
+    index = _section_index(url, text, form_type)
+    selected = sections.select_sections(text, index, items)
+    if not selected:
+        print(f"No {form_type} sections matched {items}. Using full text.")
+        return text
+
+    found = [s['item'] for s in index if s['item'] in items]
+    print(f"Selected Items {found}: {len(selected)}/{len(text)} characters ({len(selected) / len(text):.0%}).")
+    return selected
+
+def prerank_text(text, ticker, max_tokens, keywords=None):
+    """
+    Extractive pre-ranking for summary mode: keep the most salient sentences (TF-IDF, prompt
+    keywords such as repurchase/dividend/guidance/risk boosted) within max_tokens, in
+    document order (see preranker.py). Returns the text unchanged if it already fits.
+    """
+    try:
+        started = time.perf_counter()
+        selected, stats = preranker.select(text, max_tokens, keywords or preranker.PROMPT_KEYWORDS)
+    except Exception as e:
+        print(f"[{ticker}] Pre-ranking failed, sending the text as is: {e}")
+        return text
+    if stats['sentences']:
+        print(f"[{ticker}] Pre-ranked {stats['kept']}/{stats['sentences']} sentences: "
+              f"{stats['kept_chars']}/{stats['chars']} characters ({(time.perf_counter() - started) * 1000:.0f} ms).")
+    return selected
+
+def diff_against_previous(cik, ticker, form_type, filing_url, filing_date, text, items=None, prune_rules=None):
+    """
+    Year-over-year diff: compare the filing text with the previous filing of the same form,
+    Item by Item, and keep only new / removed / materially changed passages (see filing_diff.py).
+    items: Item keys to compare (e.g. summary_sections[form_type]); default all.
+    prune_rules: the rules `text` was extracted with (the previous filing gets the same).
+    Returns (diff_text, previous_date), or (None, None) if there is no previous filing.
+    diff_text is '' when nothing material changed.
+    """
+    prev_url, prev_date = get_previous_filing_url(cik, ticker, form_type, filing_date)
+    if not prev_url:
+        return None, None
+    stream = open_filing_text(prev_url)
+    if not stream:
+        return None, None
+    with stream:
+        prev_text = extract_sections(stream, prune_rules, form_type)
+
+    try:
+        result = filing_diff.diff_filings(
+            prev_text, _section_index(prev_url, prev_text, form_type),
+            text, _section_index(filing_url, text, form_type), items)
+    except Exception as e:
+        print(f"[{ticker}] Error diffing against {prev_date}: {e}")
+        return None, None
+
+    ratio = len(result['text']) / result['compared_chars'] if result['compared_chars'] else 0
+    print(f"[{ticker}] Diff vs {form_type} of {prev_date}: {len(result['text'])}/{result['compared_chars']} characters ({ratio:.0%}), "
+          f"{result['added']} added, {result['changed']} changed, {result['removed']} removed.")
+    if not result['text']:
+        return "", prev_date
+    header = f"Previous filing: {prev_date}\nCurrent filing: {filing_date}\n\n"
+    return header + result['text'], prev_date
+
+def chunk_text(text, mode="summary", max_tokens=None, overlap_tokens=None, exact=False):
+    """
+    Split text into token-budgeted chunks, cutting at section/sentence boundaries.
+    Budgets default per mode (see chunker.MODE_MAX_TOKENS): large for summaries,
+    small for full translations so each answer fits in the model's output limit.
+    exact=True verifies each chunk with the model's count_tokens (one API call per chunk).
+    """
+    if max_tokens is None:
+        max_tokens = chunker.MODE_MAX_TOKENS.get(mode, chunker.MODE_MAX_TOKENS["summary"])
+    if overlap_tokens is None:
+        overlap_tokens = chunker.MODE_OVERLAP_TOKENS.get(mode, 0)
+    count_tokens = (lambda t: model.count_tokens(t).total_tokens) if exact else None
+    return chunker.chunk_text(text, max_tokens, overlap_tokens, count_tokens)
+
+def build_chunk_prompt(mode, part, total, ticker, filing_date, highlights=None):
+    """
+    Map-step prompt for one chunk.
+    highlights: Markdown table of verified XBRL numbers; the model then only comments on it.
+    """
+    if highlights:
+        financial_instructions = (
+            "**📊 Financial Highlights (Commentary only):**\n"
+            "           - The verified table below (SEC XBRL data) is already inserted into the post. **Do NOT create a financial table.**\n"
+            "           - Write 2-3 sentences on what these numbers mean (growth, margins, notable changes).\n\n"
+            f"{highlights}\n")
+    else:
+        financial_instructions = (
+            "**📊 Financial Highlights (Must be a Table):**\n"
+            "           - Create a simple Markdown table comparing **Current Q/Y** vs **Previous Q/Y**.\n"
+            "           - Columns: [Metric, Current, Previous, YoY Change].\n"
+            "           - Metrics to include: Revenue, Operating Income, Net Income, EPS.\n"
+            "           - If exact numbers aren't found, use \"N/A\".")
+    if mode == "summary":
+        prompt = f"""
+        You are a potential power blogger who specializes in US stock analysis.
+        Your task is to summarize this part of the SEC 10-K report into an easy-to-read blog post in Korean.
+
+        **Context:** Part {part} of {total}.
+        **Company:** {ticker}
+        **Filing Date:** {filing_date}
+
+        **Style Guidelines:**
+        - **Tone:** Professional yet accessible (Use polite Korean, "~해요" style).
+        - **Formatting:** Clean and professional. **Do NOT use emojis.** Use bolding and bullet points for structure.
+        - **Level:** Explain as if talking to a beginner investor. Avoid jargon (or explain it simply).
+
+        **Content Structure:**
+        1. **🌟 3-Line Summary:** Start with 3 bullet points summarizing the most important info in this chunk.
+        2. **🏢 What does this company do?:** (Only if 'Business' section matches) Briefly explain how they make money.
+        3. {financial_instructions}
+        4. **💰 Shareholder Returns (Dividends & Buybacks):**
+           - **Dividends:** Mention current dividend per share and yield if available.
+           - **Buybacks (Stock Repurchase):** Detailed amount repurchased and remaining authorization. 
+           - **Keyword Check:** Look specifically for "Repurchase Program", "Dividend Declaration".
+        5. **🔮 Guidance Check (Important):** If the company provides **Guidance** or **Full Year Outlook**:
+           - Create a dedicated section titled "**🔮 가이던스 변경 (Before vs After)**".
+           - Explicitly compare the Previous Estimate vs New Estimate.
+           - Format: "Old: $X.XX → New: $Y.YY" or similar clearly visible comparison.
+           - If no guidance is mentioned, skip this section.
+        6. **⚠️ Risk Check:** Highlight any significant risks mentioned.
+
+        **Goal:** Make the user feel smart after reading this. Keep it simple!
+        
+        **Input Text:**
+        """
+    elif mode == "diff":
+        commentary = ""
+        if highlights:
+            commentary = ("\n        5. **📊 Financial Highlights (Commentary only):** The verified table below (SEC XBRL data) is already "
+                          "inserted into the post. **Do NOT create a financial table.** Write 2-3 sentences on what changed.\n\n"
+                          f"{highlights}\n")
+        prompt = f"""
+        You are a potential power blogger who specializes in US stock analysis.
+        Below is a year-over-year DIFF of an SEC filing: only the passages that are new, removed or
+        materially changed compared with the company's previous filing of the same form.
+        Write an easy-to-read "What changed this year" blog post in Korean.
+
+        **Context:** Part {part} of {total}.
+        **Company:** {ticker}
+        **Filing Date:** {filing_date}
+
+        **Input Format:**
+        - "=== Item X ===" starts a section of the filing (e.g. Item 1A = Risk Factors, Item 7 = MD&A).
+        - [ADDED] new text, [REMOVED] deleted text (preview), [CHANGED] "Before:" / "After:" versions.
+        - "(Context: ...)" is unchanged text shown only to locate the change. Do not report it as news.
+
+        **Style Guidelines:**
+        - **Tone:** Professional yet accessible (Use polite Korean, "~해요" style).
+        - **Formatting:** Clean and professional. **Do NOT use emojis.** Use bolding and bullet points for structure.
+
+        **Content Structure:**
+        1. **🌟 3-Line Summary:** The 3 most important changes versus last year.
+        2. **🆕 New:** New businesses, risks, products or disclosures.
+        3. **🔄 Changed:** What changed and why it matters to investors (quote numbers Before → After).
+        4. **🗑️ Removed:** Risks or statements that disappeared (only if meaningful).{commentary}
+
+        **Goal:** Only report what actually changed. Do not describe the parts of the business that stayed the same.
+
+        **Input Diff:**
+        """
+    else:
+        prompt = build_translation_instruction() + build_part_request(part, total, ticker, filing_date)
+    return prompt
+
+def build_translation_instruction():
+    """
+    Full-mode instructions, the same for every part. Cached once per filing as the system
+    instruction when GEMINI_CONTEXT_CACHE=1 (see gemini_context.FilingContext).
+    """
+    return """
+        You are a professional translator and investment analyst.
+        Your task is to translate each part of an SEC 10-K report into Korean.
+        
+        **Instructions:**
+        1. **Translate fully and detailedly.** Do not summarize.
+        2. **Shareholder Returns (Conditional):** Check this text for **Dividend** or **Buyback** information.
+           - **IF FOUND:** Create a dedicated section titled "## Shareholder Returns" and analyze it in detail.
+           - **IF NOT FOUND:** Do **NOT** create this section. Skip it to avoid redundancy.
+        3. **Maintain original structure.** If the text contains headers (Item 1, etc.), keep them.
+        4. **Tone:** Professional, financial.
+        5. **Output:** Markdown format.
+        """
+
+def build_part_request(part, total, ticker, filing_date):
+    """
+    Per-part header of a full-mode map call (followed by the chunk itself).
+    """
+    return f"""
+        **Context:** Part {part} of {total}.
+        **Company:** {ticker}
+        **Filing Date:** {filing_date}
+        
+        **Input Text (Part {part}):**
+        """
+
+def build_reduce_prompt(mode, ticker, filing_date, total, highlights=None):
+    """
+    Reduce-step prompt: merge the per-chunk outputs into ONE coherent result.
+    """
+    financial_section = "Financial Highlights commentary (no table; the verified table is inserted separately)" if highlights else "Financial Highlights table"
+    if mode == "diff":
+        return f"""
+        You are a potential power blogger who specializes in US stock analysis.
+        Below are {total} partial "What changed this year" posts (in Korean) written for different parts of the same year-over-year SEC filing diff.
+        Merge them into ONE coherent blog post in Korean.
+
+        **Company:** {ticker}
+        **Filing Date:** {filing_date}
+
+        **Instructions:**
+        1. Keep the same structure (3-Line Summary, New, Changed, Removed{", Financial Highlights commentary" if highlights else ""}). Each section appears exactly once.
+        2. The 3-Line Summary covers the most important changes of the whole filing.
+        3. Remove repetition. Keep every concrete number (Before → After).
+        4. Keep the same tone and formatting rules (polite "~해요" style, no emojis, Markdown, `##` headers).
+
+        **Partial Posts:**
+        """
+    if mode == "summary":
+        return f"""
+        You are a potential power blogger who specializes in US stock analysis.
+        Below are {total} partial summaries (in Korean) of different parts of the same SEC 10-K report.
+        Merge them into ONE coherent blog post in Korean.
+
+        **Company:** {ticker}
+        **Filing Date:** {filing_date}
+
+        **Instructions:**
+        1. Keep the same structure as the partial summaries (3-Line Summary, Business, {financial_section}, Shareholder Returns, Guidance, Risk Check). Each section appears exactly once.
+        2. Remove repetition. When parts disagree, prefer concrete numbers over "N/A".
+        3. Keep the same tone and formatting rules (polite "~해요" style, no emojis, Markdown, `##` headers).
+        4. Do not invent information that is not in the partial summaries.
+
+        **Partial Summaries:**
+        """
+    return f"""
+    You are a professional investment analyst.
+    Below are the "Shareholder Returns" notes written for different parts of the same SEC 10-K report of {ticker} (Filing Date: {filing_date}).
+    Merge them into ONE "## Shareholder Returns" section in Korean (Markdown).
+    Remove repetition, keep every concrete number (dividends per share, repurchase amounts, remaining authorization).
+
+    **Notes:**
+    """
+
+def build_structured_prompt(part, total, ticker, filing_date, form_type="10-K", highlights=None):
+    """
+    Map-step prompt of the structured analysis: fill structured_report.SCHEMA from one chunk.
+    """
+    if highlights:
+        financial_instructions = (
+            "The verified table below (SEC XBRL data) is inserted into the report separately: leave "
+            "financials.table empty and write 2-3 sentences on what these numbers mean in financials.commentary.\n\n"
+            f"{highlights}\n")
+    else:
+        financial_instructions = (
+            "financials.table: Current vs Previous period rows for Revenue, Operating Income, Net Income and EPS "
+            "(values as written in the filing, \"N/A\" if not found); financials.commentary: 2-3 sentences.")
+    return f"""
+        You are a potential power blogger who specializes in US stock analysis.
+        Analyze this part of the SEC {form_type} report and answer with JSON only, following the response schema.
+        Every text field is written in Korean for beginner investors (polite "~해요" style).
+        Use plain text in every field: no Markdown, no emojis. Leave a field empty ("" or []) when this part has nothing for it.
+
+        **Context:** Part {part} of {total}.
+        **Company:** {ticker}
+        **Filing Date:** {filing_date}
+
+        **Fields:**
+        - summary: the 3 most important points of this part.
+        - business: how the company makes money (only if this part describes the business).
+        - financials: {financial_instructions}
+        - shareholder_returns: dividends (per share, yield) and buybacks (amount repurchased, remaining authorization).
+        - guidance: outlook in guidance.summary; guidance.changes lists metrics whose estimate changed (before / after values).
+        - risks: significant risks, each with a short title and one or two sentences of detail.
+
+        **Input Text:**
+        """
+
+def build_structured_reduce_prompt(ticker, filing_date, total, form_type="10-K"):
+    """
+    Reduce-step prompt of the structured analysis: merge per-chunk JSON answers.
+    """
+    return f"""
+        You are a potential power blogger who specializes in US stock analysis.
+        Below are {total} partial JSON analyses of different parts of the same SEC {form_type} report.
+        Merge them into ONE JSON analysis with the same schema.
+
+        **Company:** {ticker}
+        **Filing Date:** {filing_date}
+
+        **Instructions:**
+        1. summary: the 3 most important points of the whole filing.
+        2. Remove repetition. When parts disagree, prefer concrete numbers over "N/A".
+        3. Keep Korean, plain text (no Markdown, no emojis). Do not invent information that is not in the parts.
+
+        **Partial Analyses:**
+        """
+
+async def _generate_with_retry_async(parts, label, notify, use_cache=True, task="map", form_type=None,
+                                     generation_config=None, prompt_version=PROMPT_VERSION, context=None):
+    """
+    Call Gemini on the model routed for (task, form_type, input size) (utils/model_router.py),
+    through its quota limiter (RPM/TPM budgets, retry-after hints on 429, fallback tiers).
+    generation_config: e.g. structured_report.GENERATION_CONFIG (JSON output), with its own prompt_version.
+    context: active gemini_context.FilingContext the parts are sent against (its system instruction is cached).
+    notify(msg) reports progress; returns (text, error) where error is None on success.
+    Answers are served from / stored in the Gemini response cache (utils/gemini_cache.py).
     """
-    Split text into chunks of approximately chunk_size characters.
-    (Default increased to 2M to allow single-pass processing for most 10-Ks)
+    try:
+        if context is not None:
+            text = await context.generate_async(parts, notify, prompt_version, use_cache)
+        else:
+            text = await model_router.generate_async(parts, "stock", task, form_type, prompt_version, use_cache, notify, generation_config)
+        return text, None
+    except Exception as e:
+        if gemini_limiter.is_rate_limit_error(e):
+            print(f"Rate limit retries exhausted ({label}): {e}")
+            return None, f"[Failed to translate {label} after retries]"
+        print(f"Gemini API Error ({label}): {e}")
+        return None, f"[Error translating {label}: {e}]"
+
+_SHAREHOLDER_SECTION = re.compile(r"^##\s*Shareholder Returns.*?(?=^#{1,2}\s|\Z)", re.MULTILINE | re.DOTALL)
+
+def _split_shareholder_sections(translation):
+    """
+    Pull the per-chunk '## Shareholder Returns' sections out of a translated chunk.
+    Returns (translation_without_sections, [sections]).
     """
-    return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+    found = _SHAREHOLDER_SECTION.findall(translation)
+    return _SHAREHOLDER_SECTION.sub("", translation), found
 
-def analyze_with_gemini(text, ticker, filing_date, progress_callback=None, mode="full"):
+async def analyze_with_gemini_async(text, ticker, filing_date, progress_callback=None, mode="full", max_concurrency=None, use_cache=True, highlights=None, form_type="10-K", context_cache=None, context_client=None):
     """
-    Send extracted text to Gemini for translation or summarization.
-    mode: 'full' (Detailed Translation) or 'summary' (Executive Summary)
+    Send extracted text to Gemini for translation or summarization (map-reduce).
+    text: extracted text, or a list of chunks already produced by chunk_text()
+    mode: 'full' (Detailed Translation), 'summary' (Executive Summary) or
+          'diff' (What changed; text from diff_against_previous())
+    max_concurrency: chunks in flight at once (default GEMINI_MAX_CONCURRENCY)
+    use_cache: False to skip the response cache (same inputs are otherwise answered locally)
+    highlights: Markdown table of XBRL numbers (see get_financial_highlights) given to the
+                summary prompt instead of asking the model to build the table from the text
+    form_type: form of the filing; picks the Gemini model together with the chunk size
+               (bot_config.json "models", see utils/model_router.py)
+    context_cache: full mode only; upload the translation instructions once as a Gemini cached
+                   context that every map call references, so each call sends only its part header
+                   and chunk (default GEMINI_CONTEXT_CACHE=1). Same calls and output as without it.
+                   context_client replaces the cached-content API (gemini_context.GenaiCacheClient)
+
+    Map: every chunk is analyzed concurrently. Reduce (multi-chunk only): summaries are
+    merged into one report; translations keep their order and their repeated
+    'Shareholder Returns' sections are merged into one.
+    Several filings can be awaited together (asyncio.gather); the limiter paces them all.
+    progress_callback(current, total, msg) is called from the event loop thread.
     """
     print(f"Analyzing with Gemini ({mode})...")
     
-    chunks = chunk_text(text)
-    report_title = "Full Translation" if mode == "full" else "Executive Summary"
-    full_report = f"# {ticker} 10-K Report Analysis ({report_title})\n**Filing Date:** {filing_date}\n\n---\n\n"
-    
-    for i, chunk in enumerate(chunks):
-        msg = f"Processing Chunk {i+1}/{len(chunks)} ({len(chunk)} chars)..."
+    chunks = text if isinstance(text, list) else chunk_text(text, mode=mode)
+    report_title = {"full": "Full Translation", "diff": "Year-over-Year Changes"}.get(mode, "Executive Summary")
+    full_report = f"# {ticker} {form_type} Report Analysis ({report_title})\n**Filing Date:** {filing_date}\n\n---\n\n"
+    total = len(chunks)
+    if total == 0:
+        return full_report
+
+    if context_cache is None:
+        context_cache = gemini_context.ENABLED
+    if mode != "full" or not context_cache or total < 2:
+        return full_report + await _map_reduce_async(
+            chunks, ticker, filing_date, progress_callback, mode, max_concurrency, use_cache, highlights, form_type)
+
+    # The instructions are the part every map call repeats: cache them for this filing (deleted when done)
+    model_name = gemini_context.CACHE_MODEL or model_router.candidates(
+        "stock", "map", form_type, max(chunker.estimate_tokens(c) for c in chunks))[0][1]
+    context = gemini_context.FilingContext(
+        model_name, build_translation_instruction(), display_name=f"{ticker} {form_type} {filing_date}",
+        client=context_client, task="map", form=form_type)
+    async with context:
+        body = await _map_reduce_async(chunks, ticker, filing_date, progress_callback, mode, max_concurrency,
+                                       use_cache, highlights, form_type, context if context.active else None)
+    return full_report + body
+
+async def _map_reduce_async(chunks, ticker, filing_date, progress_callback, mode, max_concurrency, use_cache, highlights, form_type, context=None):
+    """
+    Map and reduce steps of analyze_with_gemini_async(). Returns the report body.
+    context: active cached instructions (full mode); map calls then send only the part header and chunk.
+    """
+    total = len(chunks)
+    steps = total + (1 if total > 1 else 0) # +1 for the reduce call
+    limit = max_concurrency or MAX_CONCURRENT_CHUNKS
+    semaphore = asyncio.Semaphore(limit)
+    done = 0
+
+    def report(msg):
         print(msg)
         if progress_callback:
-            progress_callback(i + 1, len(chunks), msg)
-        
-        if mode == "summary":
-            prompt = f"""
-            You are a potential power blogger who specializes in US stock analysis.
-            Your task is to summarize this part of the SEC 10-K report into an easy-to-read blog post in Korean.
-
-            **Context:** Part {i+1} of {len(chunks)}.
-            **Company:** {ticker}
-            **Filing Date:** {filing_date}
-
-            **Style Guidelines:**
-            - **Tone:** Professional yet accessible (Use polite Korean, "~해요" style).
-            - **Formatting:** Clean and professional. **Do NOT use emojis.** Use bolding and bullet points for structure.
-            - **Level:** Explain as if talking to a beginner investor. Avoid jargon (or explain it simply).
-
-            **Content Structure:**
-            1. **🌟 3-Line Summary:** Start with 3 bullet points summarizing the most important info in this chunk.
-            2. **🏢 What does this company do?:** (Only if 'Business' section matches) Briefly explain how they make money.
-            3. **📊 Financial Highlights (Must be a Table):**
-               - Create a simple Markdown table comparing **Current Q/Y** vs **Previous Q/Y**.
-               - Columns: [Metric, Current, Previous, YoY Change].
-               - Metrics to include: Revenue, Operating Income, Net Income, EPS.
-               - If exact numbers aren't found, use "N/A".
-            4. **💰 Shareholder Returns (Dividends & Buybacks):**
-               - **Dividends:** Mention current dividend per share and yield if available.
-               - **Buybacks (Stock Repurchase):** Detailed amount repurchased and remaining authorization. 
-               - **Keyword Check:** Look specifically for "Repurchase Program", "Dividend Declaration".
-            5. **🔮 Guidance Check (Important):** If the company provides **Guidance** or **Full Year Outlook**:
-               - Create a dedicated section titled "**🔮 가이던스 변경 (Before vs After)**".
-               - Explicitly compare the Previous Estimate vs New Estimate.
-               - Format: "Old: $X.XX → New: $Y.YY" or similar clearly visible comparison.
-               - If no guidance is mentioned, skip this section.
-            6. **⚠️ Risk Check:** Highlight any significant risks mentioned.
-
-            **Goal:** Make the user feel smart after reading this. Keep it simple!
-            
-            **Input Text:**
-            """
-        else:
-            prompt = f"""
-            You are a professional translator and investment analyst.
-            Your task is to translate the following part of an SEC 10-K report into Korean.
-            
-            **Context:** Part {i+1} of {len(chunks)}.
-            **Company:** {ticker}
-            **Filing Date:** {filing_date}
-            
-            **Instructions:**
-            1. **Translate fully and detailedly.** Do not summarize.
-            2. **Shareholder Returns (Conditional):** Check this text for **Dividend** or **Buyback** information.
-               - **IF FOUND:** Create a dedicated section titled "## Shareholder Returns" and analyze it in detail.
-               - **IF NOT FOUND:** Do **NOT** create this section. Skip it to avoid redundancy.
-            3. **Maintain original structure.** If the text contains headers (Item 1, etc.), keep them.
-            4. **Tone:** Professional, financial.
-            5. **Output:** Markdown format.
-            
-            **Input Text (Part {i+1}):**
-            """
-        
-        retries = 0
-        max_retries = 5
-        
-        while retries < max_retries:
-            try:
-                response = model.generate_content([prompt, chunk])
-                translated_text = response.text
-                full_report += translated_text + "\n\n"
-                # Rate limit safety (Base sleep)
-                time.sleep(5) 
-                break
-            except Exception as e:
-                if "429" in str(e) or "Quota exceeded" in str(e):
-                    wait_time = (2 ** retries) * 10 # 10s, 20s, 40s, 80s...
-                    print(f"Rate limit hit (Chunk {i+1}). Waiting {wait_time}s...")
-                    if progress_callback:
-                        progress_callback(i + 1, len(chunks), f"Rate Limit Hit. Waiting {wait_time}s...")
-                    time.sleep(wait_time)
-                    retries += 1
-                else:
-                    print(f"Gemini API Error (Chunk {i+1}): {e}")
-                    full_report += f"\n\n[Error translating Chunk {i+1}: {e}]\n\n"
-                    break
+            progress_callback(min(done + 1, steps), steps, msg)
+
+    async def map_chunk(i, chunk):
+        label = f"Chunk {i+1}"
+        if context is not None:
+            prompt = build_part_request(i + 1, total, ticker, filing_date)
         else:
-             full_report += f"\n\n[Failed to translate Chunk {i+1} after retries]\n\n"
-            
-    return full_report
+            prompt = build_chunk_prompt(mode, i + 1, total, ticker, filing_date, highlights)
+        async with semaphore:
+            return i, await _generate_with_retry_async([prompt, chunk], label, report, use_cache, "map", form_type, context=context)
+
+    report(f"Processing {total} chunks (up to {limit} at a time)...")
+    results = [None] * total
+    for next_done in asyncio.as_completed([map_chunk(i, chunk) for i, chunk in enumerate(chunks)]):
+        i, results[i] = await next_done
+        done += 1
+        report(f"Processed Chunk {i+1}/{total} ({done}/{total} done, {len(chunks[i])} chars)")
+
+    outputs = []
+    for output, error in results:
+        outputs.append(output if output is not None else f"\n\n{error}\n\n")
+
+    if total == 1:
+        return outputs[0] + "\n\n"
+
+    # --- Reduce ---
+    if mode in ("summary", "diff"):
+        partials = [o for o, e in results if o is not None]
+        if not partials:
+            return "\n\n".join(outputs)
+        report(f"Merging {len(partials)} partial summaries...")
+        merged, error = await _generate_with_retry_async(
+            [build_reduce_prompt(mode, ticker, filing_date, len(partials), highlights), "\n\n---\n\n".join(partials)],
+            "Reduce", report, use_cache, "reduce", form_type)
+        if merged is None:
+            # Fall back to the concatenated partials rather than losing the work
+            return "\n\n".join(outputs)
+        return merged + "\n\n"
+
+    body_parts = []
+    shareholder_notes = []
+    for output in outputs:
+        body, notes = _split_shareholder_sections(output)
+        body_parts.append(body)
+        shareholder_notes.extend(notes)
+    body = "\n\n".join(body_parts)
+
+    if len(shareholder_notes) > 1:
+        report(f"Merging {len(shareholder_notes)} Shareholder Returns sections...")
+        merged, error = await _generate_with_retry_async(
+            [build_reduce_prompt(mode, ticker, filing_date, len(shareholder_notes)), "\n\n".join(shareholder_notes)],
+            "Reduce", report, use_cache, "reduce", form_type)
+        body += "\n\n" + (merged if merged is not None else "\n\n".join(shareholder_notes))
+    elif shareholder_notes:
+        body += "\n\n" + shareholder_notes[0]
+    return body + "\n\n"
+
+def analyze_with_gemini(text, ticker, filing_date, progress_callback=None, mode="full", max_workers=None, use_cache=True, highlights=None, form_type="10-K", context_cache=None, context_client=None):
+    """
+    Synchronous wrapper around analyze_with_gemini_async() (runs on the shared Gemini event loop).
+    max_workers: chunks in flight at once (default GEMINI_MAX_CONCURRENCY)
+    progress_callback(current, total, msg) is called from the calling thread (e.g. Streamlit is main-thread only).
+    """
+    return _run_with_progress(lambda callback: analyze_with_gemini_async(
+        text, ticker, filing_date, callback, mode, max_workers, use_cache, highlights, form_type, context_cache, context_client),
+        progress_callback)
+
+def _run_with_progress(make_coro, progress_callback):
+    """
+    Run make_coro(callback) on the Gemini event loop; progress callbacks are relayed to this thread.
+    """
+    messages = queue.Queue()
+    callback = (lambda *args: messages.put(args)) if progress_callback else None
+    future = gemini_limiter.submit(make_coro(callback))
+    while True:
+        wait([future], timeout=0.5)
+        while not messages.empty():
+            progress_callback(*messages.get())
+        if future.done():
+            return future.result()
 
-def get_financials(ticker):
+async def analyze_structured_async(text, ticker, filing_date, progress_callback=None, max_concurrency=None, use_cache=True, highlights=None, form_type="10-K"):
+    """
+    Summary analysis as a schema-constrained JSON object (structured_report.SCHEMA) instead
+    of Markdown: render it with structured_report.to_html_sections / to_markdown / add_to_docx.
+    Same map-reduce as analyze_with_gemini_async(mode="summary"); the reduce call merges the
+    partial objects (merged locally if it fails). Chunks with an unreadable answer are skipped.
+    Returns the normalized report dict, or None when no chunk produced one.
     """
-    Fetch financial data using yfinance.
+    print("Analyzing with Gemini (structured)...")
+    chunks = text if isinstance(text, list) else chunk_text(text, mode="summary")
+    total = len(chunks)
+    if total == 0:
+        return None
+
+    steps = total + (1 if total > 1 else 0)
+    semaphore = asyncio.Semaphore(max_concurrency or MAX_CONCURRENT_CHUNKS)
+    done = 0
+
+    def report(msg):
+        print(msg)
+        if progress_callback:
+            progress_callback(min(done + 1, steps), steps, msg)
+
+    async def call(parts, label, task):
+        answer, error = await _generate_with_retry_async(parts, label, report, use_cache, task, form_type,
+                                                         generation_config=structured_report.GENERATION_CONFIG,
+                                                         prompt_version=STRUCTURED_PROMPT_VERSION)
+        if answer is None:
+            return None
+        try:
+            return structured_report.parse(answer)
+        except ValueError as e:
+            print(f"[{ticker}] Unreadable JSON answer ({label}): {e}")
+            return None
+
+    async def map_chunk(i, chunk):
+        prompt = build_structured_prompt(i + 1, total, ticker, filing_date, form_type, highlights)
+        async with semaphore:
+            return i, await call([prompt, chunk], f"Chunk {i+1}", "map")
+
+    report(f"Processing {total} chunks (structured)...")
+    results = [None] * total
+    for next_done in asyncio.as_completed([map_chunk(i, chunk) for i, chunk in enumerate(chunks)]):
+        i, results[i] = await next_done
+        done += 1
+        report(f"Processed Chunk {i+1}/{total} ({done}/{total} done, {len(chunks[i])} chars)")
+
+    partials = [r for r in results if r is not None]
+    if len(partials) <= 1:
+        return partials[0] if partials else None
+
+    report(f"Merging {len(partials)} partial analyses...")
+    merged = await call([build_structured_reduce_prompt(ticker, filing_date, len(partials), form_type),
+                         "\n\n".join(json.dumps(p, ensure_ascii=False) for p in partials)], "Reduce", "reduce")
+    return merged if merged is not None else structured_report.merge(partials)
+
+def analyze_structured(text, ticker, filing_date, progress_callback=None, max_workers=None, use_cache=True, highlights=None, form_type="10-K"):
+    """
+    Synchronous wrapper around analyze_structured_async() (see analyze_with_gemini()).
+    """
+    return _run_with_progress(lambda callback: analyze_structured_async(
+        text, ticker, filing_date, callback, max_workers, use_cache, highlights, form_type), progress_callback)
+
+def get_financials(ticker, filed_after=None):
+    """
+    Fetch financial data using yfinance (through the local cache, see yf_cache.py).
+    filed_after: latest SEC filing date; cached statements older than it are refreshed.
     Returns: (income_stmt, balance_sheet, cash_flow, info)
     """
     print(f"[{ticker}] Fetching financial data from Yahoo Finance...")
     try:
-        stock = yf.Ticker(ticker)
+        income, balance, cashflow, info = yf_cache.get(ticker, filed_after)
         # Get last 3 years
-        income = stock.financials.iloc[:, :3]
-        balance = stock.balance_sheet.iloc[:, :3]
-        cashflow = stock.cashflow.iloc[:, :3]
-        info = stock.info
+        income = income.iloc[:, :3] if income is not None else None
+        balance = balance.iloc[:, :3] if balance is not None else None
+        cashflow = cashflow.iloc[:, :3] if cashflow is not None else None
         return income, balance, cashflow, info
     except Exception as e:
         print(f"[{ticker}] Error fetching financials: {e}")
         return None, None, None, None
 
-def set_table_border(table):
+def prefetch_financials(tickers):
     """
-    Apply professional borders to the table (Top/Bottom thick).
+    Warm the yfinance cache for a ticker list concurrently (before a batch run).
     """
-    tbl = table._tbl
-    tblPr = tbl.tblPr
-    
-    # Add borders
-    borders = OxmlElement('w:tblBorders')
-    
-    top = OxmlElement('w:top')
-    top.set(qn('w:val'), 'thick')
-    top.set(qn('w:sz'), '12')
-    borders.append(top)
-    
-    bottom = OxmlElement('w:bottom')
-    bottom.set(qn('w:val'), 'thick')
-    bottom.set(qn('w:sz'), '12')
-    borders.append(bottom)
-    
-    insideH = OxmlElement('w:insideH')
-    insideH.set(qn('w:val'), 'single')
-    insideH.set(qn('w:sz'), '4')
-    borders.append(insideH)
-    
-    tblPr.append(borders)
+    print(f"Prefetching financials for {len(tickers)} tickers...")
+    try:
+        cached = yf_cache.prefetch(tickers)
+        print(f"Prefetched financials for {cached}/{len(tickers)} tickers.")
+    except Exception as e:
+        print(f"[ERROR] Financials prefetch failed: {e}")
 
 def create_key_metrics_table(doc, info):
     """
@@ -311,40 +890,23 @@ def create_key_metrics_table(doc, info):
         "Target Price": info.get('targetMeanPrice', 'N/A')
     }
     
-    table = doc.add_table(rows=2, cols=4)
-    table.style = 'Table Grid'
-    
     # Row 1 Headers
     headers = ["Current Price", "Market Cap", "PER (Trailing)", "PBR"]
-    for i, h in enumerate(headers):
-        cell = table.cell(0, i)
-        cell.text = h
-        cell.paragraphs[0].runs[0].bold = True
-        cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Shading
-        tcPr = cell._tc.get_or_add_tcPr()
-        shd = OxmlElement('w:shd')
-        shd.set(qn('w:val'), 'clear')
-        shd.set(qn('w:color'), 'auto')
-        shd.set(qn('w:fill'), 'E7E6E6') # Light Gray
-        tcPr.append(shd)
 
     # Row 1 Values
     vals = [metrics["Current Price"], metrics["Market Cap"], metrics["Trailing PER"], metrics["PBR"]]
+    texts = []
     for i, v in enumerate(vals):
-        cell = table.cell(1, i)
         if isinstance(v, (int, float)):
              # Format large numbers
             if i == 1 and v > 1000000: # Market Cap
-                cell.text = f"${v/1000000000:,.2f} B"
+                texts.append(f"${v/1000000000:,.2f} B")
             else:
-                cell.text = f"{v:,.2f}" if isinstance(v, float) else f"{v:,}"
+                texts.append(f"{v:,.2f}" if isinstance(v, float) else f"{v:,}")
         else:
-            cell.text = str(v)
-        cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+            texts.append(str(v))
 
-    set_table_border(table)
+    docx_tables.add_table(doc, headers, [texts], header_align=["center"] * 4, body_align=["center"] * 4)
     doc.add_paragraph("\n")
 
 def filter_financial_rows(df, statement_type):
@@ -374,71 +936,77 @@ def filter_financial_rows(df, statement_type):
         # If no key rows found (different naming convention), return top 10 rows
         return df.head(10)
 
+def format_statement_value(val):
+    try:
+        if isinstance(val, numbers.Real): # Python and NumPy ints/floats
+            return f"{val:,.0f}"
+        return str(val)
+    except:
+        return "-"
+
 def df_to_word_table(doc, df, title):
     """
     Convert DataFrame to a styled Word table.
+    The table XML is generated in one pass (see docx_tables.add_table).
     """
     if df is None or df.empty:
         return
 
     doc.add_heading(title, level=2)
-    
-    # Create table
-    table = doc.add_table(rows=df.shape[0]+1, cols=df.shape[1]+1)
-    table.style = 'Table Grid'
-    set_table_border(table)
-    
-    # Header Row
-    hdr_cells = table.rows[0].cells
-    hdr_cells[0].text = "Account / Period"
-    hdr_cells[0].paragraphs[0].runs[0].bold = True
-    
-    # Header Shading
-    tcPr = hdr_cells[0]._tc.get_or_add_tcPr()
-    shd = OxmlElement('w:shd')
-    shd.set(qn('w:val'), 'clear')
-    shd.set(qn('w:color'), 'auto')
-    shd.set(qn('w:fill'), 'E7E6E6')
-    tcPr.append(shd)
-    
-    for i, col in enumerate(df.columns):
-        date_str = str(col.date()) if hasattr(col, 'date') else str(col)
-        hdr_cells[i+1].text = date_str
-        hdr_cells[i+1].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        hdr_cells[i+1].paragraphs[0].runs[0].bold = True
-        
-        # Header Shading
-        tcPr = hdr_cells[i+1]._tc.get_or_add_tcPr()
-        shd = OxmlElement('w:shd')
-        shd.set(qn('w:val'), 'clear')
-        shd.set(qn('w:color'), 'auto')
-        shd.set(qn('w:fill'), 'E7E6E6')
-        tcPr.append(shd)
-        
-    # Data Rows
-    for idx, (index_name, row) in enumerate(df.iterrows()):
-        row_cells = table.rows[idx+1].cells
-        row_cells[0].text = str(index_name)
-        row_cells[0].paragraphs[0].runs[0].font.size = Pt(9)
-        
-        for i, val in enumerate(row):
-            cell = row_cells[i+1]
-            try:
-                if isinstance(val, (int, float)):
-                    cell.text = f"{val:,.0f}"
-                else:
-                    cell.text = str(val)
-            except:
-                cell.text = "-"
-            
-            cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
-            cell.paragraphs[0].runs[0].font.size = Pt(9)
-            
+
+    header = ["Account / Period"] + [str(col.date()) if hasattr(col, 'date') else str(col) for col in df.columns]
+    rows = [
+        [str(index_name)] + [format_statement_value(val) for val in row]
+        for index_name, row in zip(df.index, df.itertuples(index=False, name=None))
+    ]
+    align = ["left"] + ["right"] * df.shape[1]
+    docx_tables.add_table(doc, header, rows, header_align=align, body_align=align, compact=True)
+
     doc.add_paragraph("\n")
 
-def save_to_word(ticker, markdown_content, filing_date, income, balance, cashflow, info=None):
+def create_highlights_table(doc, highlights):
+    """
+    Current vs Previous table computed from SEC XBRL facts (see get_financial_highlights).
+    """
+    doc.add_heading('Financial Highlights (SEC XBRL)', level=2)
+
+    align = ["left", "right", "right", "right"]
+    docx_tables.add_table(doc, xbrl_facts.header_row(highlights), xbrl_facts.formatted_rows(highlights),
+                          header_align=["center"] * 4, body_align=align)
+    doc.add_paragraph("\n")
+
+_MD_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_MD_BOLD = re.compile(r"\*\*(.+?)\*\*")
+
+def _add_runs(paragraph, text):
+    # '**bold**' spans become bold runs (the markers are not printed)
+    for i, part in enumerate(_MD_BOLD.split(text)):
+        if part:
+            paragraph.add_run(part).bold = i % 2 == 1
+
+def add_markdown_to_docx(doc, markdown_content):
+    """
+    Append a free-form Markdown analysis: '#' headings, '- ' / '* ' bullets, **bold** runs.
+    """
+    for line in markdown_content.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        heading = _MD_HEADING.match(line)
+        if heading:
+            doc.add_heading(_MD_BOLD.sub(r"\1", heading.group(2)), level=2 if len(heading.group(1)) <= 2 else 3)
+        elif line.startswith('Item') or line.startswith('Conclusion') or line.startswith('Risk') or line.startswith('Business'):
+            doc.add_heading(line, level=2)
+        elif line.startswith('- ') or line.startswith('* '):
+            _add_runs(doc.add_paragraph(style='List Bullet'), line[2:])
+        else:
+            _add_runs(doc.add_paragraph(), line)
+
+def save_to_word(ticker, markdown_content, filing_date, income, balance, cashflow, info=None, highlights=None):
     """
     Generate a professional Word report (Korean Brokerage Style).
+    markdown_content: the Markdown analysis, or a structured report (dict, see structured_report).
+    highlights: optional XBRL Financial Highlights table (DataFrame from get_financial_highlights).
     """
     doc = Document()
     
@@ -467,23 +1035,17 @@ def save_to_word(ticker, markdown_content, filing_date, income, balance, cashflo
     # --- Key Metrics ---
     if info:
         create_key_metrics_table(doc, info)
+    if highlights is not None:
+        create_highlights_table(doc, highlights)
     
     # --- 1. AI Analysis Section ---
     doc.add_heading('1. Comprehensive Analysis', level=1)
     
-    # Simple Markdown to Word conversion
-    clean_text = markdown_content.replace('**', '').replace('## ', '').replace('# ', '')
-    
-    for line in clean_text.split('\n'):
-        line = line.strip()
-        if not line:
-            continue
-        if line.startswith('Item') or line.startswith('Conclusion') or line.startswith('Risk') or line.startswith('Business'):
-            doc.add_heading(line, level=2)
-        elif line.startswith('- '):
-            p = doc.add_paragraph(line[2:], style='List Bullet')
-        else:
-            doc.add_paragraph(line)
+    if isinstance(markdown_content, dict):
+        # Structured analysis (analyze_structured / load_report_json): headings, bullets and tables as is
+        structured_report.add_to_docx(doc, markdown_content)
+    else:
+        add_markdown_to_docx(doc, markdown_content)
             
     doc.add_page_break()
     
@@ -530,6 +1092,52 @@ def save_to_file(ticker, content):
         f.write(content)
     print(f"[{ticker}] Report saved to {filename}")
 
+def save_report_json(ticker, report):
+    """
+    Save a structured analysis (analyze_structured()) to reports/<ticker>.json, to render it again later.
+    """
+    if not os.path.exists("reports"):
+        os.makedirs("reports")
+
+    filename = f"reports/{ticker}.json"
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[{ticker}] Structured report saved to {filename}")
+    return filename
+
+def load_report_json(ticker):
+    """
+    Structured analysis saved by save_report_json(), or None if there is none.
+    """
+    filename = f"reports/{ticker}.json"
+    if not os.path.exists(filename):
+        return None
+    with open(filename, "r", encoding="utf-8") as f:
+        return structured_report.normalize(json.load(f))
+
+def render_saved_report(ticker):
+    """
+    Render reports/<ticker>.json again without asking Gemini: reports/<ticker>.structured.md
+    and reports/<ticker>.structured.docx (not <ticker>.docx, which batch_processor treats as done).
+    Returns (markdown_path, docx_path), or None when no report was saved.
+    """
+    report = load_report_json(ticker)
+    if report is None:
+        print(f"[{ticker}] No structured report in reports/")
+        return None
+
+    md_path = f"reports/{ticker}.structured.md"
+    with open(md_path, "w", encoding="utf-8") as f:
+        f.write(f"# {ticker} Analysis Report\n\n" + structured_report.to_markdown(report))
+
+    doc = Document()
+    doc.add_heading(f"{ticker} Analysis Report", level=1)
+    structured_report.add_to_docx(doc, report)
+    docx_path = f"reports/{ticker}.structured.docx"
+    doc.save(docx_path)
+    print(f"[{ticker}] Saved report rendered to {md_path} and {docx_path}")
+    return md_path, docx_path
+
 # --- Main Execution Block (Test) ---
 if __name__ == "__main__":
     # Test with AAPL
@@ -0,0 +1,111 @@
+import datetime
+import os
+import json
+import re
+from sec_module import sec_client
+
+# --- Configuration ---
+# EDGAR publishes one master index per business day (after the day's dissemination ends).
+QUARTER_LISTING_URL = "https://www.sec.gov/Archives/edgar/daily-index/{year}/QTR{quarter}/index.json"
+MASTER_INDEX_URL = "https://www.sec.gov/Archives/edgar/daily-index/{year}/QTR{quarter}/master.{date}.idx"
+STATE_FILE = os.path.join("sec_cache", "daily_index_state.json")
+
+_MASTER_NAME = re.compile(r"^master\.(\d{8})\.idx$")
+
+def load_watermark(path=STATE_FILE):
+    """
+    Date (YYYYMMDD) of the newest daily index already processed, or None (never ran).
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('watermark')
+    except (OSError, ValueError):
+        return None
+
+def save_watermark(date, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"watermark": date}, f)
+    os.replace(tmp_path, path)
+
+def _quarters(since, today):
+    """
+    (year, quarter) from the quarter of `since` (YYYYMMDD) up to today's quarter.
+    """
+    year, quarter = int(since[:4]), (int(since[4:6]) - 1) // 3 + 1
+    last = (today.year, (today.month - 1) // 3 + 1)
+    while (year, quarter) <= last:
+        yield year, quarter
+        year, quarter = (year + 1, 1) if quarter == 4 else (year, quarter + 1)
+
+def list_index_dates(year, quarter, headers):
+    """
+    Dates (YYYYMMDD) that have a daily master index in this quarter. Missing quarter -> [].
+    """
+    response = sec_client.get(QUARTER_LISTING_URL.format(year=year, quarter=quarter), headers=headers)
+    if response.status_code == 404:
+        return []
+    response.raise_for_status()
+    dates = []
+    for item in response.json().get('directory', {}).get('item', []):
+        match = _MASTER_NAME.match(item.get('name', ''))
+        if match:
+            dates.append(match.group(1))
+    return sorted(dates)
+
+def parse_master_index(lines, form_types):
+    """
+    master.idx lines ('CIK|Company Name|Form Type|Date Filed|File Name' after a dashed rule)
+    -> {cik (int): set of matching form types}.
+    """
+    wanted = set(form_types)
+    filers = {}
+    in_body = False
+    for line in lines:
+        if not in_body:
+            in_body = line.startswith('---')
+            continue
+        fields = line.split('|')
+        if len(fields) < 5 or fields[2] not in wanted:
+            continue
+        try:
+            cik = int(fields[0])
+        except ValueError:
+            continue
+        filers.setdefault(cik, set()).add(fields[2])
+    return filers
+
+def find_new_filers(form_types, headers, since):
+    """
+    Companies that filed any of form_types in daily indexes published after `since` (YYYYMMDD).
+    Returns ({cik (int): set of forms}, newest index date seen) -- one listing request per
+    quarter spanned plus one request per new business day.
+    The newest date becomes the next watermark once those companies have been processed.
+    """
+    filers = {}
+    newest = since
+    for year, quarter in _quarters(since, datetime.date.today()):
+        for date in list_index_dates(year, quarter, headers):
+            if date <= since:
+                continue
+            response = sec_client.get(MASTER_INDEX_URL.format(year=year, quarter=quarter, date=date), headers=headers)
+            response.raise_for_status()
+            lines = response.content.decode('latin-1').splitlines()
+            for cik, forms in parse_master_index(lines, form_types).items():
+                filers.setdefault(cik, set()).update(forms)
+            newest = max(newest, date)
+    return filers, newest
+
+def latest_index_date(headers):
+    """
+    Newest published daily index (used to set the first watermark after a full scan).
+    """
+    today = datetime.date.today()
+    year, quarter = today.year, (today.month - 1) // 3 + 1
+    for _ in range(2): # Early in a quarter the current listing may still be empty
+        dates = list_index_dates(year, quarter, headers)
+        if dates:
+            return dates[-1]
+        year, quarter = (year - 1, 4) if quarter == 1 else (year, quarter - 1)
+    return None
@@ -0,0 +1,87 @@
+from xml.sax.saxutils import escape
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.table import Table
+
+# --- Shared Table Styles ---
+# Borders (thick top/bottom), header shading and fonts live in two table styles that are
+# added to the document once, instead of being written into every table and header cell.
+TABLE_STYLE = "FinancialTable"
+COMPACT_STYLE = "FinancialTableCompact" # 9pt body, for multi-year statements
+HEADER_FILL = "E7E6E6" # Light Gray
+
+_HEADER_ROW = (
+    '<w:tblStylePr w:type="firstRow"><w:rPr><w:b/>{size}</w:rPr>'
+    f'<w:tcPr><w:shd w:val="clear" w:color="auto" w:fill="{HEADER_FILL}"/></w:tcPr></w:tblStylePr>'
+)
+
+_STYLES_XML = [
+    (TABLE_STYLE,
+     f'<w:style {nsdecls("w")} w:type="table" w:customStyle="1" w:styleId="{TABLE_STYLE}">'
+     '<w:name w:val="Financial Table"/><w:basedOn w:val="TableGrid"/>'
+     '<w:pPr><w:spacing w:after="0" w:line="240" w:lineRule="auto"/></w:pPr>'
+     '<w:tblPr><w:tblBorders>'
+     '<w:top w:val="thick" w:sz="12" w:space="0" w:color="auto"/>'
+     '<w:left w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+     '<w:bottom w:val="thick" w:sz="12" w:space="0" w:color="auto"/>'
+     '<w:right w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+     '<w:insideH w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+     '<w:insideV w:val="single" w:sz="4" w:space="0" w:color="auto"/>'
+     '</w:tblBorders></w:tblPr>'
+     + _HEADER_ROW.format(size="") + '</w:style>'),
+    (COMPACT_STYLE,
+     f'<w:style {nsdecls("w")} w:type="table" w:customStyle="1" w:styleId="{COMPACT_STYLE}">'
+     f'<w:name w:val="Financial Table Compact"/><w:basedOn w:val="{TABLE_STYLE}"/>'
+     '<w:rPr><w:sz w:val="18"/><w:szCs w:val="18"/></w:rPr>'
+     + _HEADER_ROW.format(size='<w:sz w:val="22"/><w:szCs w:val="22"/>') + '</w:style>'),
+]
+
+_JC = {"center": '<w:pPr><w:jc w:val="center"/></w:pPr>', "right": '<w:pPr><w:jc w:val="right"/></w:pPr>'}
+
+def ensure_styles(doc):
+    """
+    Add the shared table styles to the document (once).
+    """
+    styles = doc.styles.element
+    existing = {s.get(qn('w:styleId')) for s in styles.findall(qn('w:style'))}
+    for style_id, xml in _STYLES_XML:
+        if style_id not in existing:
+            styles.append(parse_xml(xml))
+
+def _cell(text, align, width):
+    return (f'<w:tc><w:tcPr><w:tcW w:w="{width}" w:type="dxa"/></w:tcPr>'
+            f'<w:p>{_JC.get(align, "")}<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p></w:tc>')
+
+def add_table(doc, header, rows, header_align=None, body_align=None, compact=False):
+    """
+    Append a table built as one XML string (no per-cell python-docx calls).
+    header: column titles; rows: lists of cell strings.
+    header_align / body_align: per-column 'left' | 'center' | 'right' (default left).
+    compact: 9pt body text (statements). Returns the python-docx Table.
+    """
+    ensure_styles(doc)
+    cols = len(header)
+    width = doc._block_width // 635 // cols # EMU -> twips (dxa)
+    header_align = header_align or ["left"] * cols
+    body_align = body_align or ["left"] * cols
+
+    parts = [
+        f'<w:tbl {nsdecls("w")}><w:tblPr>'
+        f'<w:tblStyle w:val="{COMPACT_STYLE if compact else TABLE_STYLE}"/>'
+        '<w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:val="0020" w:firstRow="1" w:lastRow="0" w:firstColumn="0" w:lastColumn="0" w:noHBand="1" w:noVBand="1"/>'
+        '</w:tblPr><w:tblGrid>',
+        f'<w:gridCol w:w="{width}"/>' * cols,
+        '</w:tblGrid><w:tr><w:trPr><w:tblHeader/></w:trPr>',
+    ]
+    parts.extend(_cell(str(h), header_align[i], width) for i, h in enumerate(header))
+    parts.append('</w:tr>')
+    for row in rows:
+        parts.append('<w:tr>')
+        parts.extend(_cell(str(v), body_align[i], width) for i, v in enumerate(row))
+        parts.append('</w:tr>')
+    parts.append('</w:tbl>')
+
+    tbl = parse_xml("".join(parts))
+    doc.element.body._insert_tbl(tbl)
+    return Table(tbl, doc._body)
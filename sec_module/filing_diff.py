@@ -0,0 +1,104 @@
+from difflib import SequenceMatcher
+import re
+
+# --- Configuration ---
+# Extracted filing text has no paragraph breaks (whitespace is collapsed), so filings are
+# compared sentence by sentence inside each Item; runs of changed sentences form one hunk.
+MINOR_EDIT_RATIO = 0.9 # Word similarity at or above this is a wording touch-up, not a change
+CONTEXT_CHARS = 200 # Unchanged text shown before an added/changed hunk
+REMOVED_PREVIEW_CHARS = 300 # Removed text is only previewed (the model just needs to know it is gone)
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])[\"'”’)\]]?\s+(?=[A-Z0-9\"'“‘(])")
+_YEAR_RE = re.compile(r"\b(19|20)\d{2}\b")
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+def split_sentences(text):
+    return [s for s in _SENTENCE_RE.split(text) if s.strip()]
+
+def _key(sentence):
+    # Year roll-forward ("fiscal 2023" -> "fiscal 2024") and punctuation are not changes
+    return _NON_WORD_RE.sub(" ", _YEAR_RE.sub("YEAR", sentence.lower())).strip()
+
+def _clip(text, limit):
+    return text if len(text) <= limit else text[:limit].rstrip() + " ..."
+
+def _context(sentences, end):
+    # Tail of the unchanged text right before position `end`
+    return _clip(" ".join(sentences[max(0, end - 2):end])[-CONTEXT_CHARS:], CONTEXT_CHARS) if end else ""
+
+def _is_minor_edit(old, new):
+    return SequenceMatcher(None, old.split(), new.split(), autojunk=False).ratio() >= MINOR_EDIT_RATIO
+
+def diff_section(old_text, new_text):
+    """
+    Sentence-level diff of one section.
+    Returns [{'type': 'added'|'removed'|'changed', 'old', 'new', 'context'}] in document order.
+    """
+    old_sentences = split_sentences(old_text)
+    new_sentences = split_sentences(new_text)
+    matcher = SequenceMatcher(None, [_key(s) for s in old_sentences], [_key(s) for s in new_sentences], autojunk=False)
+
+    hunks = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        old = " ".join(old_sentences[i1:i2])
+        new = " ".join(new_sentences[j1:j2])
+        if tag == 'replace' and _is_minor_edit(old, new):
+            continue
+        kind = {"insert": "added", "delete": "removed", "replace": "changed"}[tag]
+        hunks.append({"type": kind, "old": old, "new": new, "context": _context(new_sentences, j1)})
+    return hunks
+
+def _by_item(text, index):
+    if not index:
+        return {"": text} # Form without an Item layout (8-K): one section
+    return {s['item']: text[s['start']:s['end']] for s in index}
+
+def _render_hunk(hunk):
+    lines = []
+    if hunk['context'] and hunk['type'] != "removed":
+        lines.append(f"(Context: ...{hunk['context']})")
+    if hunk['type'] == "added":
+        lines += ["[ADDED]", hunk['new']]
+    elif hunk['type'] == "removed":
+        lines += ["[REMOVED]", _clip(hunk['old'], REMOVED_PREVIEW_CHARS)]
+    else:
+        lines += ["[CHANGED]", f"Before: {hunk['old']}", f"After: {hunk['new']}"]
+    return "\n".join(lines)
+
+def diff_filings(old_text, old_index, new_text, new_index, items=None):
+    """
+    Compare two filings of the same form Item by Item (see sections.index_sections).
+    items: Item keys to compare (default: every Item found in the new filing).
+
+    Returns {'text', 'added', 'removed', 'changed', 'compared_chars'}: 'text' holds only the
+    new/removed/materially changed passages, grouped under their Item headings, plus a short
+    lead-in of unchanged text for each. It is '' when nothing material changed.
+    """
+    old_items = _by_item(old_text, old_index)
+    new_items = _by_item(new_text, new_index)
+    keys = [k for k in new_items if items is None or not k or k in items]
+    counts = {"added": 0, "removed": 0, "changed": 0}
+    parts = []
+
+    for key in keys:
+        heading = f"=== Item {key} ===" if key else "=== Filing ==="
+        if key not in old_items:
+            parts.append(f"{heading}\n[NEW SECTION]\n{new_items[key]}")
+            counts["added"] += 1
+            continue
+        hunks = diff_section(old_items[key], new_items[key])
+        if not hunks:
+            continue
+        for hunk in hunks:
+            counts[hunk['type']] += 1
+        parts.append(heading + "\n" + "\n\n".join(_render_hunk(h) for h in hunks))
+
+    for key in old_items:
+        if key not in new_items and (items is None or key in items):
+            parts.append(f"=== Item {key} ===\n[REMOVED SECTION] {_clip(old_items[key], REMOVED_PREVIEW_CHARS)}")
+            counts["removed"] += 1
+
+    compared = sum(len(new_items[k]) for k in keys)
+    return dict(counts, text="\n\n".join(parts), compared_chars=compared)
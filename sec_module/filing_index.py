@@ -0,0 +1,125 @@
+import xml.etree.ElementTree as ET
+import json
+import re
+from sec_module import filing_store
+
+# --- Configuration ---
+# Every EDGAR filing folder has index.json (all documents with sizes) and, for XBRL filings,
+# FilingSummary.xml (one small "R" HTML page per statement/note). Both are immutable once
+# filed, so they are kept in the filing store like the documents themselves.
+#
+# Document parts (bot_config.json "stock.documents", per form):
+#   primary        the primaryDocument (full inline-XBRL page for 10-K/10-Q)
+#   statements     R pages of the income statement, balance sheet and cash flow statement
+#   exhibit:99.1   an exhibit by number (8-K press release, ...)
+STATEMENT_PATTERNS = {
+    "income": re.compile(r"operations|income|earnings", re.IGNORECASE),
+    "balance": re.compile(r"balance\s+sheets?|financial\s+(position|condition)", re.IGNORECASE),
+    "cashflow": re.compile(r"cash\s+flows?", re.IGNORECASE),
+}
+_NOT_A_STATEMENT = re.compile(r"parenthetical|equity|details?\b", re.IGNORECASE)
+
+def folder_url(filing_url):
+    """
+    https://www.sec.gov/Archives/edgar/data/<cik>/<accession>/<doc> -> folder URL with trailing '/'.
+    """
+    return filing_url.rsplit('/', 1)[0] + '/'
+
+def _read(url, headers):
+    path = filing_store.get(url, headers)
+    return filing_store.read_text(path) if path else None
+
+def load_index(filing_url, headers):
+    """
+    Documents of the filing folder from index.json: [{'name', 'size'}] (size in bytes, 0 if unknown).
+    """
+    text = _read(folder_url(filing_url) + "index.json", headers)
+    if not text:
+        return []
+    items = json.loads(text).get('directory', {}).get('item', [])
+    documents = []
+    for item in items:
+        try:
+            size = int(item.get('size') or 0)
+        except ValueError:
+            size = 0
+        documents.append({"name": item.get('name', ''), "size": size})
+    return documents
+
+def load_filing_summary(filing_url, headers, documents=None):
+    """
+    Reports listed in FilingSummary.xml: [{'file', 'short_name', 'category'}] in filing order.
+    Returns [] for filings without XBRL (no FilingSummary.xml in index.json).
+    """
+    if documents is not None and not any(d['name'] == "FilingSummary.xml" for d in documents):
+        return []
+    text = _read(folder_url(filing_url) + "FilingSummary.xml", headers)
+    if not text:
+        return []
+    root = ET.fromstring(text.encode('utf-8'))
+    reports = []
+    for report in root.iter('Report'):
+        file_name = report.findtext('HtmlFileName') or report.findtext('XmlFileName')
+        if not file_name:
+            continue
+        reports.append({
+            "file": file_name,
+            "short_name": (report.findtext('ShortName') or "").strip(),
+            "category": (report.findtext('MenuCategory') or "").strip(),
+        })
+    return reports
+
+def statement_reports(reports, kinds=tuple(STATEMENT_PATTERNS)):
+    """
+    The first R page of each primary statement kind, from the 'Statements' menu category.
+    A combined "Operations and Comprehensive Income" page is used only when there is
+    no separate income statement. Returns [{'file', 'short_name', 'category', 'kind'}].
+    """
+    candidates = [r for r in reports if r['category'] == "Statements" and r['file'].endswith('.htm')
+                  and not _NOT_A_STATEMENT.search(r['short_name'])]
+    found = {}
+    for allow_comprehensive in (False, True):
+        for report in candidates:
+            if not allow_comprehensive and "comprehensive" in report['short_name'].lower():
+                continue
+            for kind in kinds:
+                if kind not in found and STATEMENT_PATTERNS[kind].search(report['short_name']):
+                    found[kind] = dict(report, kind=kind)
+                    break
+    order = {r['file']: i for i, r in enumerate(candidates)}
+    return sorted(found.values(), key=lambda r: order[r['file']])
+
+def find_exhibit(documents, number):
+    """
+    Name of exhibit `number` ('99.1') among the folder documents, or None.
+    EDGAR file names spell it 'ex99-1', 'ex991', 'ex-99_1', 'exhibit991', ...
+    """
+    major, _, minor = number.partition('.')
+    minor_pattern = r"[-_.]?0?" + minor if minor else ""
+    pattern = re.compile(r"ex(?:hibit)?[-_]?" + major + minor_pattern + r"(?!\d)", re.IGNORECASE)
+    candidates = [d for d in documents if d['name'].lower().endswith(('.htm', '.html', '.txt')) and pattern.search(d['name'])]
+    return candidates[0]['name'] if candidates else None
+
+def select_documents(filing_url, parts, headers):
+    """
+    Resolve document parts (see module comment) to URLs, reading only the filing index.
+    Returns (urls, selected_bytes, primary_bytes); parts that do not exist are skipped.
+    """
+    documents = load_index(filing_url, headers)
+    sizes = {d['name']: d['size'] for d in documents}
+    primary = filing_url.rsplit('/', 1)[1]
+    base = folder_url(filing_url)
+
+    names = []
+    for part in parts:
+        if part == "primary":
+            names.append(primary)
+        elif part == "statements":
+            reports = load_filing_summary(filing_url, headers, documents)
+            names.extend(r['file'] for r in statement_reports(reports))
+        elif part.startswith("exhibit:"):
+            name = find_exhibit(documents, part.split(':', 1)[1])
+            if name:
+                names.append(name)
+    names = list(dict.fromkeys(names))
+    return [base + n for n in names], sum(sizes.get(n, 0) for n in names), sizes.get(primary, 0)
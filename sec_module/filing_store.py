@@ -0,0 +1,165 @@
+import threading
+import gzip
+import io
+import os
+import re
+from sec_module import sec_client
+
+try:
+    import zstandard # Optional: smaller/faster than gzip when installed
+except ImportError:
+    zstandard = None
+
+# --- Configuration ---
+STORE_DIR = os.path.join("sec_cache", "filings")
+MAX_STORE_BYTES = int(os.getenv("SEC_FILING_STORE_MAX_MB", "2048")) * 1024 * 1024
+DOWNLOAD_CHUNK = 256 * 1024
+
+_URL_PATTERN = re.compile(r"/Archives/edgar/data/\d+/(\d{18})/([^/?#]+)")
+_lock = threading.Lock()
+
+def parse_filing_url(url):
+    """
+    EDGAR Archives URL -> (accession number without dashes, document name), or (None, None).
+    """
+    match = _URL_PATTERN.search(url)
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+def _safe_name(document):
+    return re.sub(r"[^A-Za-z0-9._-]", "_", document)
+
+def _path(accession, document, ext):
+    return os.path.join(STORE_DIR, accession.replace('-', ''), _safe_name(document) + ext)
+
+def find(accession, document):
+    """
+    Return the stored path for (accession, document), or None if not stored yet.
+    """
+    for ext in ('.zst', '.gz'):
+        path = _path(accession, document, ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+def sidecar_path(url, suffix):
+    """
+    Path for derived data cached next to a stored document (e.g. '.sections.json').
+    Returns None for URLs outside the Archives tree.
+    """
+    accession, document = parse_filing_url(url)
+    if not accession:
+        return None
+    return _path(accession, document, suffix)
+
+def _compressed_writer(raw):
+    if zstandard:
+        return zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False)
+    return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6)
+
+def store_from_url(url, accession, document, headers):
+    """
+    Stream a document from SEC straight into a compressed file (never held fully in memory).
+    Returns the stored path.
+    """
+    path = _path(accession, document, '.zst' if zstandard else '.gz')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    try:
+        with sec_client.get(url, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            with open(tmp_path, 'wb') as raw:
+                writer = _compressed_writer(raw)
+                for block in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                    writer.write(block)
+                writer.close()
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path) # Half-written download
+
+    evict()
+    return path
+
+def open_filing(path):
+    """
+    Open a stored document as a binary stream (decompressed on the fly).
+    Reading touches the file so eviction keeps recently used filings.
+    """
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    if path.endswith('.zst'):
+        if not zstandard:
+            raise RuntimeError("zstandard is required to read .zst filings")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return gzip.open(path, 'rb')
+
+def open_text(path):
+    """
+    Streaming text reader over a stored document.
+    """
+    return io.TextIOWrapper(open_filing(path), encoding='utf-8', errors='replace')
+
+def read_text(path):
+    """
+    Read a stored document fully as text (utf-8, falling back to cp1252 for legacy filings).
+    """
+    with open_filing(path) as f:
+        data = f.read()
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('cp1252', errors='replace')
+
+def get(url, headers):
+    """
+    Read-through access: return the stored path for an EDGAR document URL,
+    downloading it first if needed. Returns None for URLs outside the Archives tree.
+    """
+    accession, document = parse_filing_url(url)
+    if not accession:
+        return None
+    path = find(accession, document)
+    if path:
+        print(f"[FilingStore] Hit: {accession}/{document}")
+        return path
+    return store_from_url(url, accession, document, headers)
+
+def evict(max_bytes=MAX_STORE_BYTES):
+    """
+    Delete least-recently-used documents until the store fits in max_bytes.
+    """
+    with _lock:
+        entries = []
+        total = 0
+        for root, _, files in os.walk(STORE_DIR):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        if total <= max_bytes:
+            return 0
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        print(f"[FilingStore] Evicted {removed} documents")
+        return removed
@@ -0,0 +1,209 @@
+import sqlite3
+import zipfile
+import time
+import os
+import json
+from sec_module import sec_client
+
+# --- Configuration ---
+BULK_URL = "https://www.sec.gov/Archives/edgar/daily-index/bulkdata/submissions.zip"
+DB_FILE = os.path.join("sec_cache", "filings.db")
+DOWNLOAD_CHUNK = 1024 * 1024
+FRESH_HOURS = 36 # A nightly ingest older than this is not trusted for "latest filing" answers
+
+def _connect(path=DB_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("""CREATE TABLE IF NOT EXISTS filings (
+        cik INTEGER, form TEXT, filing_date TEXT, accession TEXT, primary_document TEXT,
+        PRIMARY KEY (cik, accession))""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cik_form_date ON filings (cik, form, filing_date)")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    return conn
+
+def _get_meta(conn, key):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+def _rows(cik, block):
+    """
+    Column arrays of a submissions block -> (cik, form, date, accession, document) rows.
+    """
+    forms = block.get('form', [])
+    dates = block.get('filingDate', [])
+    accessions = block.get('accessionNumber', [])
+    documents = block.get('primaryDocument', [])
+    for i in range(len(accessions)):
+        yield cik, forms[i], dates[i], accessions[i], documents[i]
+
+def _member_cik(name):
+    # 'CIK0000320193.json' / 'CIK0000320193-submissions-001.json' -> 320193
+    if not name.startswith("CIK") or not name.endswith(".json"):
+        return None
+    try:
+        return int(name[3:13])
+    except ValueError:
+        return None
+
+def ingest_zip(zip_path, ciks, path=DB_FILE):
+    """
+    Load the filings of `ciks` from a submissions.zip into the filings table.
+    Members are read straight from the archive (nothing is extracted); members of other
+    companies are skipped without being decompressed.
+    Returns (companies, rows) loaded.
+    """
+    wanted = {int(c) for c in ciks}
+    companies = set()
+    count = 0
+    conn = _connect(path)
+    try:
+        with zipfile.ZipFile(zip_path) as archive, conn:
+            for info in archive.infolist():
+                cik = _member_cik(info.filename)
+                if cik not in wanted:
+                    continue
+                with archive.open(info) as member:
+                    data = json.load(member)
+                # Main file: {'filings': {'recent': {...}}}; overflow pages hold the arrays directly
+                block = data.get('filings', {}).get('recent', data)
+                if cik not in companies:
+                    conn.execute("DELETE FROM filings WHERE cik = ?", (cik,))
+                    companies.add(cik)
+                rows = list(_rows(cik, block))
+                conn.executemany("INSERT OR REPLACE INTO filings VALUES (?, ?, ?, ?, ?)", rows)
+                count += len(rows)
+            _set_meta(conn, 'ingested_at', str(time.time()))
+    finally:
+        conn.close()
+    return len(companies), count
+
+def download_bulk(headers, dest, last_modified=None):
+    """
+    Stream submissions.zip to dest. Returns the Last-Modified header, or None if unchanged.
+    """
+    req_headers = dict(headers)
+    if last_modified:
+        req_headers['If-Modified-Since'] = last_modified
+    response = sec_client.get(BULK_URL, headers=req_headers, stream=True)
+    try:
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        tmp_path = f"{dest}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                    f.write(chunk)
+            os.replace(tmp_path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return response.headers.get('Last-Modified', '')
+    finally:
+        response.close()
+
+def ingest(headers, ciks, path=DB_FILE):
+    """
+    Nightly job: download submissions.zip (skipped when unchanged) and load `ciks`.
+    The archive is deleted afterwards. Returns (companies, rows), or (0, 0) if nothing changed.
+    """
+    conn = _connect(path)
+    try:
+        last_modified = _get_meta(conn, 'last_modified')
+    finally:
+        conn.close()
+
+    zip_path = os.path.join(os.path.dirname(path) or ".", "submissions.zip")
+    print(f"[FilingsDB] Downloading {BULK_URL}...")
+    new_last_modified = download_bulk(headers, zip_path, last_modified)
+    if new_last_modified is None:
+        print("[FilingsDB] submissions.zip unchanged since last ingest.")
+        conn = _connect(path)
+        try:
+            with conn:
+                _set_meta(conn, 'ingested_at', str(time.time()))
+        finally:
+            conn.close()
+        return 0, 0
+
+    try:
+        companies, rows = ingest_zip(zip_path, ciks, path)
+    finally:
+        os.remove(zip_path)
+
+    conn = _connect(path)
+    try:
+        with conn:
+            _set_meta(conn, 'last_modified', new_last_modified)
+    finally:
+        conn.close()
+    print(f"[FilingsDB] Loaded {rows} filings of {companies} companies.")
+    return companies, rows
+
+def is_fresh(path=DB_FILE, max_age_hours=FRESH_HOURS):
+    if not os.path.exists(path):
+        return False
+    conn = _connect(path)
+    try:
+        ingested_at = _get_meta(conn, 'ingested_at')
+    finally:
+        conn.close()
+    return bool(ingested_at) and time.time() - float(ingested_at) < max_age_hours * 3600
+
+def latest_filing(cik, form_type, path=DB_FILE):
+    """
+    Newest filing of form_type for cik from the local table (no network), or None.
+    Returns {'accession_number', 'primary_document', 'filing_date'} like submissions.load_latest_filings.
+    """
+    if not os.path.exists(path):
+        return None
+    conn = _connect(path)
+    try:
+        row = conn.execute(
+            "SELECT accession, primary_document, filing_date FROM filings "
+            "WHERE cik = ? AND form = ? ORDER BY filing_date DESC, accession DESC LIMIT 1",
+            (int(cik), form_type)).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    return {"accession_number": row[0], "primary_document": row[1], "filing_date": row[2]}
+
+def previous_filing(cik, form_type, before_date, path=DB_FILE):
+    """
+    Newest filing of form_type for cik filed before before_date ('YYYY-MM-DD'), or None.
+    Same shape as latest_filing().
+    """
+    if not os.path.exists(path):
+        return None
+    conn = _connect(path)
+    try:
+        row = conn.execute(
+            "SELECT accession, primary_document, filing_date FROM filings "
+            "WHERE cik = ? AND form = ? AND filing_date < ? ORDER BY filing_date DESC, accession DESC LIMIT 1",
+            (int(cik), form_type, str(before_date))).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    return {"accession_number": row[0], "primary_document": row[1], "filing_date": row[2]}
+
+def status(path=DB_FILE):
+    """
+    {'companies', 'filings', 'ingested_at'} for the dashboard / logs.
+    """
+    result = {"companies": 0, "filings": 0, "ingested_at": None}
+    if not os.path.exists(path):
+        return result
+    conn = _connect(path)
+    try:
+        result["companies"], result["filings"] = conn.execute(
+            "SELECT COUNT(DISTINCT cik), COUNT(*) FROM filings").fetchone()
+        ingested_at = _get_meta(conn, 'ingested_at')
+        result["ingested_at"] = float(ingested_at) if ingested_at else None
+    finally:
+        conn.close()
+    return result
@@ -0,0 +1,257 @@
+from html.parser import HTMLParser
+import io
+import re
+
+try:
+    from lxml import etree # C parser, ~5x faster than html.parser
+except ImportError:
+    etree = None
+
+# --- Configuration ---
+FEED_CHUNK = 1024 * 1024 # Characters fed to the parser per step
+SKIP_TAGS = {'script', 'style'} # BeautifulSoup.get_text() ignores these too
+
+class TextSink:
+    """
+    Receives parser events and emits whitespace-normalized text.
+    Produces the same text as BeautifulSoup(html).get_text('\\n') followed by
+    collapsing whitespace, but never builds a DOM: memory stays proportional to the
+    feed chunk instead of the document size.
+    Also usable directly as an lxml parser target.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._skip_depth = 0
+        self._pending_space = False # Whitespace (or a tag boundary) seen since the last word
+        self._emitted = False
+
+    def start(self, tag, attrib=None):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        self._pending_space = True
+
+    def end(self, tag):
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        self._pending_space = True
+
+    def data(self, data):
+        if self._skip_depth or not data:
+            return
+        words = data.split()
+        if not words:
+            self._pending_space = True
+            return
+        if self._emitted and (self._pending_space or data[0].isspace()):
+            self._parts.append(' ')
+        self._parts.append(' '.join(words))
+        self._emitted = True
+        self._pending_space = data[-1].isspace()
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return None
+
+    def drain(self):
+        """
+        Return (and forget) the normalized text produced so far.
+        """
+        text = ''.join(self._parts)
+        self._parts = []
+        return text
+
+# --- Compact Tables ---
+# get_text() flattens a financial table into "Net sales $ 391,035 $ 383,285 ..." with its
+# spacer cells; TableSink emits one "cell | cell | cell" line per row instead.
+CELL_SEP = " | "
+PREFIX_FRAGMENTS = {"$", "(", "$(", "($", "€", "£"} # Cells that belong to the next number
+SUFFIX_FRAGMENTS = {")", "%", ")%", "%)"} # Cells that belong to the previous number
+
+_PREFIX_SPACE_RE = re.compile(r"([$(€£])\s+(?=[\d.$(])")
+_SUFFIX_SPACE_RE = re.compile(r"(?<=[\d%])\s+(?=[)%])")
+_YEAR_RE = re.compile(r"\b(19|20)\d{2}\b")
+# Column dates of repeated header rows ("September 28, 2024", "Dec. 31, 2023", "March 31,", "12/31/2024")
+_DATE_RE = re.compile(
+    r"\b(?:January|February|March|April|May|June|July|August|September|October|November|December"
+    r"|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sept?|Oct|Nov|Dec)\.?\s+\d{1,2}\b(?:,?\s*(?:19|20)\d{2}\b)?"
+    r"|\b\d{1,2}/\d{1,2}/(?:19|20)?\d{2}\b", re.IGNORECASE)
+
+def _clean_cell(parts):
+    text = ' '.join(''.join(parts).split())
+    text = _PREFIX_SPACE_RE.sub(r"\1", text) # "$ 1,234" -> "$1,234"
+    return _SUFFIX_SPACE_RE.sub("", text) # "(456 )" -> "(456)"
+
+def _merge_fragments(cells):
+    """
+    Drop empty spacer cells and glue '$' / '(' / ')' / '%' cells onto their numbers.
+    """
+    merged = []
+    prefix = ""
+    for cell in cells:
+        if not cell:
+            continue
+        if cell in PREFIX_FRAGMENTS:
+            prefix += cell
+        elif cell in SUFFIX_FRAGMENTS and merged:
+            merged[-1] += cell
+        else:
+            merged.append(prefix + cell)
+            prefix = ""
+    if prefix and prefix.strip("$€£"):
+        merged.append(prefix)
+    return merged
+
+def serialize_table(rows):
+    """
+    Rows of cell text fragments -> compact lines ("cell | cell"), one per non-empty row.
+    Header rows repeated inside a table (page breaks) are kept once; rows with numbers
+    other than years and dates are never de-duplicated.
+    """
+    lines = []
+    seen = set()
+    for row in rows:
+        line = CELL_SEP.join(_merge_fragments(_clean_cell(cell) for cell in row))
+        if not line:
+            continue
+        if line in seen and not re.search(r"\d", _YEAR_RE.sub("", _DATE_RE.sub("", line))):
+            continue
+        seen.add(line)
+        lines.append(line)
+    return lines
+
+class TableSink(TextSink):
+    """
+    TextSink that serializes <table> elements as compact rows (see serialize_table)
+    on their own lines. Nested tables are flattened into the enclosing cell.
+    """
+    row_sep = '\n'
+
+    def __init__(self, serialize_tables=True):
+        super().__init__()
+        self.serialize_tables = serialize_tables
+        self._table_depth = 0
+        self._rows = None
+        self._cell = None
+        self._after_table = False
+
+    def start(self, tag, attrib=None):
+        if self.serialize_tables and not self._skip_depth:
+            if tag == 'table':
+                self._table_depth += 1
+                if self._table_depth == 1:
+                    self._rows = []
+                    self._cell = None
+            elif self._table_depth == 1 and tag == 'tr':
+                self._rows.append([])
+                self._cell = None
+            elif self._table_depth == 1 and tag in ('td', 'th'):
+                if not self._rows:
+                    self._rows.append([])
+                self._cell = []
+                self._rows[-1].append(self._cell)
+        super().start(tag, attrib)
+
+    def end(self, tag):
+        if tag == 'table' and self._table_depth:
+            self._table_depth -= 1
+            if self._table_depth == 0:
+                self._emit_table(serialize_table(self._rows))
+                self._rows = None
+                self._cell = None
+        elif tag in ('td', 'th') and self._table_depth == 1:
+            self._cell = None
+        super().end(tag)
+
+    def data(self, data):
+        if self._table_depth:
+            if self._skip_depth or not data:
+                return
+            if self._cell is None:
+                if not data.strip():
+                    return
+                # Text directly inside <table>/<tr>: give it its own cell
+                if not self._rows:
+                    self._rows.append([])
+                self._cell = []
+                self._rows[-1].append(self._cell)
+            self._cell.append(data)
+            return
+        if self._after_table and not self._skip_depth and data.strip():
+            self._parts.append('\n')
+            self._after_table = False
+            self._pending_space = False
+            data = data.lstrip()
+        super().data(data)
+
+    def _emit_table(self, lines):
+        if not lines:
+            return
+        if self._emitted:
+            self._parts.append('\n')
+        self._parts.append(self.row_sep.join(lines))
+        self._emitted = True
+        self._after_table = True
+
+class StreamingTextExtractor(HTMLParser):
+    """
+    Pure-Python fallback (html.parser) feeding a TextSink, used when lxml is unavailable.
+    """
+
+    def __init__(self, sink):
+        super().__init__(convert_charrefs=True)
+        self.sink = sink
+
+    def handle_starttag(self, tag, attrs):
+        self.sink.start(tag)
+
+    def handle_endtag(self, tag):
+        self.sink.end(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.sink.start(tag)
+
+    def handle_data(self, data):
+        self.sink.data(data)
+
+def _make_parser(sink):
+    if etree is not None:
+        return etree.HTMLParser(target=sink, huge_tree=True)
+    return StreamingTextExtractor(sink)
+
+def iter_text(source, chunk_size=FEED_CHUNK, sink=None):
+    """
+    Yield normalized text chunks from HTML.
+    source: a str, or a text file-like object (e.g. filing_store.open_text()).
+    sink: optional TextSink subclass instance (to hook extra processing into the parse).
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+
+    sink = sink or TextSink()
+    parser = _make_parser(sink)
+    while True:
+        block = source.read(chunk_size)
+        if not block:
+            break
+        parser.feed(block)
+        text = sink.drain()
+        if text:
+            yield text
+    try:
+        parser.close()
+    except Exception:
+        pass # lxml raises on empty/garbage documents; whatever was parsed is kept
+    text = sink.drain()
+    if text:
+        yield text
+
+def extract_text(source, chunk_size=FEED_CHUNK, compact_tables=False):
+    """
+    Full normalized text of an HTML document (str or text stream).
+    compact_tables: tables as "cell | cell" rows, one per line (see TableSink).
+    """
+    sink = TableSink() if compact_tables else None
+    return ''.join(iter_text(source, chunk_size, sink))
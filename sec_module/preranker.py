@@ -0,0 +1,225 @@
+import numpy as np
+import pandas as pd
+from sec_module import chunker
+
+# --- Configuration ---
+# Summary prompts ask for business model, financials, shareholder returns, guidance and risks:
+# sentences using these words (prefix match: 'repurchase' also matches 'repurchased') are boosted.
+PROMPT_KEYWORDS = (
+    "repurchase", "buyback", "dividend", "guidance", "outlook", "forecast", "expect",
+    "risk", "revenue", "net sales", "margin", "operating income", "net income", "earnings per share",
+    "segment", "acquisition", "impairment", "restructuring", "litigation", "tariff",
+)
+KEYWORD_BOOST = 3.0
+MIN_SENTENCE_WORDS = 5 # Shorter fragments (table rows, headings) are never picked on their own
+GAP_MARKER = "\n[...]\n"
+
+# Everything below works on the UTF-8 bytes as NumPy arrays: a 30 MB filing is ~4M words,
+# too many for per-word (or per-letter) Python objects. Words are runs of ASCII letters,
+# identified by a 64-bit hash of their length and first / last 8 letters (lowercased), read
+# as unaligned uint64 loads. Terms are the top TERM_BITS bits of that hash (hashing trick:
+# a fixed-size vocabulary, no dictionary to build; the rare bucket collision only blurs idf).
+TERM_BITS = 20
+_TERMS = 1 << TERM_BITS
+_HASH_FIRST = np.uint64(0x9E3779B97F4A7C15)
+_HASH_LAST = np.uint64(0xC2B2AE3D27D4EB4F)
+_HASH_LENGTH = np.uint64(0x165667B19E3779F9)
+# _KEEP_FIRST[m]: the first m bytes of a little-endian uint64; _DROP_FIRST[m]: shift keeping the last m
+_KEEP_FIRST = np.array([(1 << (8 * m)) - 1 for m in range(9)], dtype=np.uint64)
+_DROP_FIRST = np.array([8 * (8 - m) for m in range(9)], dtype=np.uint64)
+
+def _byte_table(chars):
+    table = np.zeros(256, dtype=bool)
+    table[list(chars)] = True
+    return table
+
+# 256-entry lookup tables, applied to the few bytes around sentence-end candidates only
+_CLOSER = _byte_table(b"\"')]")
+_SPACE = _byte_table(b" \t\n\r\x0b\x0c")
+_SENTENCE_START = _byte_table(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789\"'(")
+# bytes.translate() table for _fold(): letters lowercased, '.!?' -> '.', newline kept, the rest 0
+_FOLD = bytearray(256)
+_FOLD[ord('A'):ord('Z') + 1] = bytes(range(ord('a'), ord('z') + 1))
+_FOLD[ord('a'):ord('z') + 1] = bytes(range(ord('a'), ord('z') + 1))
+_FOLD[ord('!')] = _FOLD[ord('?')] = _FOLD[ord('.')] = ord('.')
+_FOLD[ord('\n')] = ord('\n')
+_FOLD = bytes(_FOLD)
+_PAD = 8
+
+def _fold(data):
+    """
+    data folded by _FOLD (one C pass instead of several NumPy ones), with _PAD zero bytes on
+    both sides: folded[i + _PAD] belongs to data[i].
+    """
+    pad = bytes(_PAD)
+    return np.frombuffer(b"".join((pad, data, pad)).translate(_FOLD), dtype=np.uint8)
+
+def sentence_bounds(data, folded=None):
+    """
+    Byte offsets where sentences start: after '. ' / '." ' (next char upper case, digit or
+    opening quote) and after every newline (table rows). Always starts with 0.
+    folded: _fold(data), when the caller already has it.
+    """
+    folded = _fold(data) if folded is None else folded
+    # One pass finds the '.!?' candidates; the context tests only read the bytes after them
+    ends = np.flatnonzero(folded == ord('.')) - _PAD
+    ends = ends[ends + 3 < len(data)]
+    plain = ends[_SPACE[data[ends + 1]] & _SENTENCE_START[data[ends + 2]]] + 2
+    closed = ends[_CLOSER[data[ends + 1]] & _SPACE[data[ends + 2]] & _SENTENCE_START[data[ends + 3]]] + 3
+    newlines = np.flatnonzero(folded == ord('\n')) - _PAD + 1
+    starts = np.sort(np.concatenate(([0], plain, closed, newlines)))
+    starts = starts[starts < len(data)]
+    return starts[np.concatenate(([True], starts[1:] != starts[:-1]))] # Sorted: dedupe without np.unique
+
+def _words(folded):
+    """
+    (start offsets, lengths, hashes) of the words (2+ ASCII letters); folded from _fold().
+    """
+    letter = folded >= ord('a')
+    edges = np.flatnonzero(letter[1:] != letter[:-1]) + 1 # Padding: runs start and stop inside
+    starts, stops = edges[::2], edges[1::2]
+    keep = stops - starts >= 2
+    starts, stops = starts[keep], stops[keep]
+    lengths = stops - starts
+
+    # loads[i] = the 8 bytes folded[i:i + 8] as one little-endian integer
+    loads = np.ndarray(shape=(len(folded) - 7,), dtype='<u8', buffer=folded, strides=(1,))
+    inside = np.minimum(lengths, 8)
+    first = loads[starts] & _KEEP_FIRST[inside]
+    last = loads[stops - 8] >> _DROP_FIRST[inside]
+    hashes = (first * _HASH_FIRST) ^ (last * _HASH_LAST) ^ (lengths.astype(np.uint64) * _HASH_LENGTH)
+    return starts - _PAD, lengths, hashes
+
+def _keyword_terms(data, starts, lengths, terms, keywords):
+    """
+    Boolean per term bucket: does the term start with one of the keywords (words of 3+ letters)?
+    Only one occurrence per used bucket is decoded (the vocabulary, not every word).
+    """
+    prefixes = tuple(sorted({w for k in keywords for w in k.lower().split() if len(w) > 2}))
+    flags = np.zeros(_TERMS, dtype=bool)
+    if not prefixes or not len(terms):
+        return flags
+    seen = np.full(_TERMS, -1, dtype=np.int64)
+    seen[terms] = np.arange(len(terms)) # Any occurrence will do (the last one wins)
+    used = np.flatnonzero(seen >= 0)
+    raw = data.tobytes()
+    flags[used] = np.fromiter(
+        (raw[starts[i]:starts[i] + lengths[i]].decode('ascii').lower().startswith(prefixes) for i in seen[used]),
+        dtype=bool, count=len(used))
+    return flags
+
+def score_sentences(data, bounds, keywords=PROMPT_KEYWORDS, boost=KEYWORD_BOOST, folded=None):
+    """
+    TF-IDF salience of each sentence (bounds from sentence_bounds()).
+    score = sum over distinct terms of log(1 + tf) * idf * (boost if keyword), divided by
+    sqrt(words), so long sentences are not favored just for their length.
+    """
+    starts, lengths, hashes = _words(_fold(data) if folded is None else folded)
+    scores = np.zeros(len(bounds))
+    if not len(starts):
+        return scores
+
+    # Words per sentence from the few sentence starts (not a search per word)
+    words_per_sentence = np.diff(np.append(np.searchsorted(starts, bounds), len(starts)))
+    sentence_of = np.repeat(np.arange(len(bounds)), words_per_sentence)
+    terms = (hashes >> np.uint64(64 - TERM_BITS)).astype(np.int64)
+
+    # (sentence, term) pairs with their counts: the sparse sentence x term matrix as flat arrays.
+    # Words come in sentence order, so the keys are nearly sorted already.
+    pairs = np.sort(sentence_of * _TERMS + terms)
+    first = np.flatnonzero(np.concatenate(([True], pairs[1:] != pairs[:-1])))
+    tf = np.diff(np.append(first, len(pairs)))
+    pair_sentence = pairs[first] >> TERM_BITS
+    pair_term = pairs[first] & (_TERMS - 1)
+
+    df = np.bincount(pair_term, minlength=_TERMS)
+    idf = np.log((1 + len(bounds)) / (1 + df)) + 1.0
+    weights = idf * np.where(_keyword_terms(data, starts, lengths, terms, keywords), boost, 1.0)
+
+    scores = np.bincount(pair_sentence, weights=np.log1p(tf) * weights[pair_term], minlength=len(bounds))
+    scores /= np.sqrt(np.maximum(words_per_sentence, 1))
+    scores[words_per_sentence < MIN_SENTENCE_WORDS] = 0.0
+    scores[_repeated_sentences(hashes, sentence_of, words_per_sentence)] = 0.0
+    return scores
+
+def _repeated_sentences(hashes, sentence_of, words_per_sentence):
+    """
+    Indices of sentences whose word sequence already appeared earlier (boilerplate
+    repeated across sections would otherwise fill the budget with copies).
+    """
+    sentences = np.flatnonzero(words_per_sentence)
+    counts = words_per_sentence[sentences]
+    first = np.cumsum(counts) - counts
+    position = (np.arange(len(hashes)) - np.repeat(first, counts)).astype(np.uint64)
+    signatures = np.add.reduceat(hashes * (2 * position + 1), first) ^ counts.astype(np.uint64)
+    return sentences[pd.Series(signatures).duplicated().to_numpy()]
+
+def _sentence_chars(data, bounds, ends):
+    """
+    Characters per sentence (bytes minus UTF-8 continuation bytes).
+    """
+    chars = ends - bounds
+    continuation = np.flatnonzero((data & np.uint8(0xC0)) == 0x80)
+    if len(continuation):
+        chars -= np.bincount(np.searchsorted(bounds, continuation, side='right') - 1, minlength=len(bounds))
+    return chars
+
+def _pick(order, charge, budget):
+    """
+    Walk the sentences best first and take each one that still fits (a sentence too long for
+    what is left is skipped, not the end of the selection). Returns the picked indices.
+    """
+    # The leading run that fits as a whole is taken at once; only the rest is walked
+    total = np.cumsum(charge[order])
+    head = int(np.searchsorted(total, budget, side='right'))
+    picked = list(order[:head])
+    remaining = budget - (total[head - 1] if head else 0)
+    rest = order[head:]
+    if len(rest):
+        cheapest = charge[rest].min()
+        for i, cost in zip(rest.tolist(), charge[rest].tolist()):
+            if remaining < cheapest:
+                break
+            if cost <= remaining:
+                picked.append(i)
+                remaining -= cost
+    return np.sort(np.array(picked, dtype=np.int64))
+
+def select(text, max_tokens, keywords=PROMPT_KEYWORDS):
+    """
+    Keep the highest-scoring sentences that fit in max_tokens, in document order.
+    Skipped stretches are marked with '[...]' (counted in the budget). Text already under the
+    budget is returned as is; when no sentence fits, its beginning, cut to the budget.
+    Returns (text, stats): stats = {'sentences', 'kept', 'chars', 'kept_chars'}.
+    """
+    stats = {"sentences": 0, "kept": 0, "chars": len(text), "kept_chars": len(text)}
+    if chunker.estimate_tokens(text) <= max_tokens:
+        return text, stats
+
+    # estimate_tokens(result) <= max_tokens  <=>  len(result) < max_tokens * CHARS_PER_TOKEN
+    budget = max(int(max_tokens * chunker.CHARS_PER_TOKEN) - 1, 0)
+    raw = text.encode('utf-8')
+    data = np.frombuffer(raw, dtype=np.uint8)
+    folded = _fold(data)
+    bounds = sentence_bounds(data, folded)
+    scores = score_sentences(data, bounds, keywords, folded=folded)
+    ends = np.append(bounds[1:], len(data))
+    # Every sentence is charged for the separator in front of it (at most a GAP_MARKER)
+    charge = _sentence_chars(data, bounds, ends) + len(GAP_MARKER)
+
+    order = np.argsort(-scores, kind="stable")
+    keep = _pick(order[scores[order] > 0], charge, budget)
+
+    parts = []
+    previous = -1
+    for i in keep:
+        sentence = raw[bounds[i]:ends[i]].decode('utf-8', errors='ignore').strip()
+        if parts:
+            parts.append(" " if i == previous + 1 else GAP_MARKER)
+        parts.append(sentence)
+        previous = i
+    selected = "".join(parts)
+    if not selected:
+        selected = text[:budget].rstrip()
+    stats.update(sentences=len(bounds), kept=len(keep), kept_chars=len(selected))
+    return selected, stats
@@ -0,0 +1,182 @@
+from collections import Counter
+import re
+from sec_module import html_text
+from sec_module import sections
+from sec_module import chunker
+
+# --- Configuration ---
+# Rules applied between download and analysis (bot_config.json "stock.prune_rules").
+#   ixbrl           hidden inline-XBRL header (<ix:header>: contexts, units, hidden facts)
+#   page_numbers    blocks that are only a page number ("23", "F-7", "Page 4 of 90", "iii")
+#   headers_footers short blocks repeated on every page ("Apple Inc. | 2024 Form 10-K | 23"): only
+#                   repeats that sit next to a page number or differ only in a leading/trailing one
+#   toc             the table of contents (run of Item headings before the first real Item)
+#   exhibit_index   Item 15 / Part II Item 6 (exhibit list, signatures)
+DEFAULT_RULES = ("ixbrl", "page_numbers", "headers_footers", "toc", "exhibit_index")
+HIDDEN_TAGS = {'ix:header'}
+BLOCK_TAGS = {'p', 'div', 'br', 'hr', 'tr', 'table', 'li', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+HEADER_MAX_CHARS = 120 # Longer blocks are body text, never page furniture
+HEADER_MIN_REPEATS = 5
+TOC_MIN_HEADINGS = 5
+EXHIBIT_SECTIONS = {"10-K": ["15"], "10-Q": ["II-6"]}
+
+_PAGE_NUMBER_RE = re.compile(r"^(?:[Pp]age\s+)?(?:[A-Z]-)?\d{1,3}(?:\s+of\s+\d{1,3})?$|^[ivx]{1,6}$|^[IVX]{1,6}$")
+_PAGE_NUMBER = r"(?:[Pp]age\s+)?(?:[A-Z]-)?\d{1,3}(?:\s+of\s+\d{1,3})?"
+# A page number at either end of a running header/footer, set off by spaces or a bar ("| 23", "23 · ")
+_EDGE_PAGE_NUMBER_RE = re.compile(rf"^({_PAGE_NUMBER})[\s|·•–—]+|[\s|·•–—]+({_PAGE_NUMBER})$")
+
+ROW_SEP = '\x1e' # Table rows inside one block; turned into '\n' after pruning
+TABLE_MARK = '\x1d' # Leads a table block: kept on its own lines when blocks are joined
+
+class BlockSink(html_text.TableSink):
+    """
+    TableSink that skips hidden inline-XBRL and separates block-level elements with '\\n'
+    (page furniture can only be recognized as whole blocks). A compact table is one block.
+    """
+    row_sep = ROW_SEP
+
+    def __init__(self, hidden_tags=HIDDEN_TAGS, serialize_tables=True):
+        super().__init__(serialize_tables)
+        self.hidden_tags = hidden_tags
+        self.hidden_chars = 0
+        self._hidden_depth = 0
+        self._break = False
+
+    def start(self, tag, attrib=None):
+        if tag in self.hidden_tags:
+            self._hidden_depth += 1
+        if tag in BLOCK_TAGS:
+            self._break = True
+        super().start(tag, attrib)
+
+    def end(self, tag):
+        if tag in self.hidden_tags and self._hidden_depth:
+            self._hidden_depth -= 1
+        if tag in BLOCK_TAGS:
+            self._break = True
+        super().end(tag)
+
+    def data(self, data):
+        if self._hidden_depth:
+            self.hidden_chars += len(' '.join(data.split()))
+            return
+        if self._break and not self._skip_depth and not self._table_depth and data.strip():
+            if self._emitted:
+                self._parts.append('\n')
+            self._break = False
+            self._after_table = False
+            self._pending_space = False
+            data = data.lstrip()
+        super().data(data)
+
+    def _emit_table(self, lines):
+        if lines:
+            lines = [TABLE_MARK + lines[0]] + lines[1:]
+        super()._emit_table(lines)
+
+def _plain(block):
+    return block.lstrip(TABLE_MARK)
+
+def _join(blocks):
+    # Blocks joined with single spaces (extract_sections() text shape); tables on their own lines
+    parts = []
+    previous_table = False
+    for block in blocks:
+        table = block.startswith(TABLE_MARK)
+        if parts:
+            parts.append('\n' if table or previous_table else ' ')
+        parts.append(_plain(block))
+        previous_table = table
+    return ''.join(parts)
+
+def _drop_page_numbers(blocks):
+    return [b for b in blocks if not _PAGE_NUMBER_RE.match(_plain(b))]
+
+def _split_page_number(block):
+    # "Apple Inc. | 2024 Form 10-K | 23" -> ("apple inc. | 2024 form 10-k", "23"); other digits are kept
+    text = _plain(block).strip()
+    match = _EDGE_PAGE_NUMBER_RE.search(text)
+    if not match:
+        return text.lower(), None
+    return (text[:match.start()] + text[match.end():]).strip().lower(), match.group(1) or match.group(2)
+
+def _drop_headers_footers(blocks):
+    # Runs before page_numbers: a running header/footer is recognized by the page number next to
+    # it (its own block or inside it, changing every page). Short text that merely repeats
+    # (a column label, "None.", "Not applicable.") is body text and is kept.
+    keys = [_split_page_number(b) if len(b) <= HEADER_MAX_CHARS else (None, None) for b in blocks]
+    beside_page = Counter()
+    page_numbers = {}
+    for i, (key, number) in enumerate(keys):
+        if not key or not re.search(r"[a-z]", key) or re.search(r"[$%]", key):
+            continue
+        if any(0 <= j < len(blocks) and _PAGE_NUMBER_RE.match(_plain(blocks[j])) for j in (i - 1, i + 1)):
+            beside_page[key] += 1
+        if number:
+            page_numbers.setdefault(key, set()).add(number)
+    furniture = {k for k, n in beside_page.items() if n >= HEADER_MIN_REPEATS}
+    furniture |= {k for k, numbers in page_numbers.items() if len(numbers) >= HEADER_MIN_REPEATS}
+    return [b for b, (key, _) in zip(blocks, keys) if key not in furniture]
+
+def _drop_toc(text, form_type):
+    index = sections.index_sections(text, form_type)
+    if not index:
+        return text
+    first = index[0]['start']
+    headings = sections.heading_positions(text, form_type, end=first)
+    if len(headings) < TOC_MIN_HEADINGS:
+        return text
+    return text[:headings[0]] + text[first:]
+
+def _drop_exhibit_index(text, form_type):
+    items = EXHIBIT_SECTIONS.get(form_type.split('/')[0])
+    if not items:
+        return text
+    index = sections.index_sections(text, form_type)
+    for section in reversed([s for s in index if s['item'] in items]):
+        text = text[:section['start']] + text[section['end']:]
+    return text
+
+def _has_items(form_type):
+    return bool(form_type) and form_type.split('/')[0] in sections.SECTION_SPECS
+
+def extract_text(source, form_type="10-K", rules=DEFAULT_RULES, compact_tables=True):
+    """
+    Normalized text of a filing (like html_text.extract_text) with boilerplate removed.
+    source: HTML string or text stream. rules: subset of DEFAULT_RULES.
+    compact_tables: tables as "cell | cell" rows (see html_text.TableSink).
+
+    Returns (text, stats): stats = {'original_chars', 'chars', 'removed': {rule: chars}}.
+    """
+    rules = set(rules)
+    sink = BlockSink(HIDDEN_TAGS if "ixbrl" in rules else set(), compact_tables)
+    blocks = ''.join(html_text.iter_text(source, sink=sink)).split('\n')
+    original = len(_join(blocks)) + sink.hidden_chars
+    removed = {"ixbrl": sink.hidden_chars} if "ixbrl" in rules else {}
+
+    for rule, func in (("headers_footers", _drop_headers_footers), ("page_numbers", _drop_page_numbers)):
+        if rule in rules:
+            before = sum(len(b) + 1 for b in blocks)
+            blocks = func(blocks)
+            removed[rule] = before - sum(len(b) + 1 for b in blocks)
+
+    text = _join(blocks)
+    if _has_items(form_type):
+        for rule, func in (("toc", _drop_toc), ("exhibit_index", _drop_exhibit_index)):
+            if rule in rules:
+                before = len(text)
+                text = func(text, form_type)
+                removed[rule] = before - len(text)
+
+    text = text.replace(ROW_SEP, '\n')
+    return text, {"original_chars": original, "chars": len(text), "removed": removed}
+
+def describe(stats):
+    """
+    One log line: characters / estimated tokens removed, per rule.
+    """
+    total = stats['original_chars'] - stats['chars']
+    share = total / stats['original_chars'] if stats['original_chars'] else 0
+    tokens = int(total / chunker.CHARS_PER_TOKEN)
+    detail = ", ".join(f"{rule} {chars:,}" for rule, chars in stats['removed'].items() if chars)
+    return f"Pruned {total:,}/{stats['original_chars']:,} characters ({share:.0%}, ~{tokens:,} tokens){': ' + detail if detail else ''}"
@@ -0,0 +1,106 @@
+import requests
+from requests.adapters import HTTPAdapter
+import sqlite3
+import threading
+import time
+import os
+
+# --- Configuration ---
+# SEC fair access: max 10 requests/second per client across ALL our processes
+# (stock worker, dashboard, batch runs). Refill 8/s with a burst of 2 so no
+# one-second window can exceed 10.
+RATE_PER_SEC = float(os.getenv("SEC_RATE_PER_SEC", "8"))
+BURST = float(os.getenv("SEC_RATE_BURST", "2"))
+LIMITER_DB = os.path.join("sec_cache", "ratelimit.db")
+MAX_RETRIES = 5
+REQUEST_TIMEOUT = 30
+RETRY_STATUS = (429, 503)
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """
+    Shared keep-alive session (connection pooling + gzip) for all SEC hosts.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+            _session = session
+        return _session
+
+def _connect(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("CREATE TABLE IF NOT EXISTS bucket (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+    return conn
+
+def acquire(name="sec", rate=RATE_PER_SEC, burst=BURST, path=LIMITER_DB):
+    """
+    Take one token from the cross-process token bucket, sleeping until one is available.
+    The bucket lives in SQLite so every process on the machine shares the same budget.
+    """
+    conn = _connect(path)
+    try:
+        while True:
+            conn.execute("BEGIN IMMEDIATE") # Serializes concurrent writers across processes
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated FROM bucket WHERE name = ?", (name,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+
+            if tokens >= 1:
+                conn.execute("INSERT OR REPLACE INTO bucket VALUES (?, ?, ?)", (name, tokens - 1, now))
+                conn.execute("COMMIT")
+                return
+            conn.execute("INSERT OR REPLACE INTO bucket VALUES (?, ?, ?)", (name, tokens, now))
+            conn.execute("COMMIT")
+            time.sleep((1 - tokens) / rate)
+    finally:
+        conn.close()
+
+def penalize(seconds, name="sec", rate=RATE_PER_SEC, path=LIMITER_DB):
+    """
+    Drain the shared bucket so EVERY process pauses for roughly `seconds` (after a 429/503).
+    """
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT OR REPLACE INTO bucket VALUES (?, ?, ?)", (name, -seconds * rate, time.time()))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+def _retry_after(response, attempt):
+    """
+    Seconds to wait: honour Retry-After when SEC sends it, else exponential backoff (1, 2, 4, ...).
+    """
+    value = response.headers.get('Retry-After')
+    if value:
+        try:
+            return max(float(value), 1.0)
+        except ValueError:
+            pass
+    return float(2 ** attempt)
+
+def get(url, headers=None, stream=False, **kwargs):
+    """
+    Rate-limited GET against SEC with automatic backoff on 429/503.
+    Returns the final Response (callers still call raise_for_status()).
+    """
+    session = get_session()
+    kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+
+    for attempt in range(MAX_RETRIES + 1):
+        acquire()
+        response = session.get(url, headers=headers, stream=stream, **kwargs)
+        if response.status_code not in RETRY_STATUS or attempt == MAX_RETRIES:
+            return response
+
+        wait_time = _retry_after(response, attempt)
+        print(f"[SEC] HTTP {response.status_code} for {url}. Backing off {wait_time:.0f}s...")
+        response.close()
+        penalize(wait_time)
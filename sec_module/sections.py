@@ -0,0 +1,140 @@
+import re
+import os
+import json
+
+# --- Section Specs ---
+# (key, item number, title pattern). Titles disambiguate items that repeat across
+# 10-Q Part I / Part II and separate real headings from cross references.
+# Every item is indexed (not only the ones we send) so each section ends where the next one starts.
+_APOS = r"[’'`]?"
+
+SECTION_SPECS = {
+    "10-K": [
+        ("1", "1", r"business"),
+        ("1A", "1A", r"risk\s+factors"),
+        ("1B", "1B", r"unresolved\s+staff\s+comments"),
+        ("1C", "1C", r"cybersecurity"),
+        ("2", "2", r"properties"),
+        ("3", "3", r"legal\s+proceedings"),
+        ("4", "4", r"mine\s+safety"),
+        ("5", "5", r"market\s+for\s+(the\s+)?registrant"),
+        ("6", "6", r"(\[?reserved\]?|selected\s+financial)"),
+        ("7", "7", r"management" + _APOS + r"s?\s+discussion"),
+        ("7A", "7A", r"quantitative\s+and\s+qualitative"),
+        ("8", "8", r"financial\s+statements"),
+        ("9", "9", r"changes\s+in\s+and\s+disagreements"),
+        ("9A", "9A", r"controls\s+and\s+procedures"),
+        ("9B", "9B", r"other\s+information"),
+        ("9C", "9C", r"disclosure\s+regarding\s+foreign"),
+        ("10", "10", r"directors"),
+        ("11", "11", r"executive\s+compensation"),
+        ("12", "12", r"security\s+ownership"),
+        ("13", "13", r"certain\s+relationships"),
+        ("14", "14", r"principal\s+account"),
+        ("15", "15", r"exhibit"),
+        ("16", "16", r"form\s+10-K\s+summary"),
+    ],
+    "10-Q": [
+        ("I-1", "1", r"financial\s+statements"),
+        ("I-2", "2", r"management" + _APOS + r"s?\s+discussion"),
+        ("I-3", "3", r"quantitative\s+and\s+qualitative"),
+        ("I-4", "4", r"controls\s+and\s+procedures"),
+        ("II-1", "1", r"legal\s+proceedings"),
+        ("II-1A", "1A", r"risk\s+factors"),
+        ("II-2", "2", r"unregistered\s+sales"),
+        ("II-3", "3", r"defaults\s+upon"),
+        ("II-4", "4", r"mine\s+safety"),
+        ("II-5", "5", r"other\s+information"),
+        ("II-6", "6", r"exhibits"),
+    ],
+}
+
+# Default sections sent to Gemini in summary mode (Business, Risks, Shareholder returns, MD&A)
+DEFAULT_SUMMARY_SECTIONS = {
+    "10-K": ["1", "1A", "5", "7", "7A"],
+    "10-Q": ["I-2", "I-3", "II-1A", "II-2"],
+}
+
+def _spec_for(form_type):
+    # Amendments (10-K/A) share the layout of the original form
+    return SECTION_SPECS.get(form_type.split('/')[0])
+
+def _compile(spec):
+    return [
+        # "\|" : headings laid out in a table ("Item 7. | Management's ...", see html_text.TableSink)
+        (key, re.compile(r"\bItem\s*" + num + r"\s*[\.:\-–—]?\s*(?:\|\s*)?\(?" + title, re.IGNORECASE))
+        for key, num, title in spec
+    ]
+
+_COMPILED = {form: _compile(spec) for form, spec in SECTION_SPECS.items()}
+
+def index_sections(text, form_type):
+    """
+    Locate the Item headings of a 10-K/10-Q in extracted text.
+    Returns [{'item', 'start', 'end'}] sorted by offset ([] for unsupported forms).
+
+    Every heading also appears in the table of contents (and in cross references),
+    so for each item we keep the candidate followed by the longest stretch of text
+    before the next heading; TOC entries are only a few characters apart.
+    """
+    if not _spec_for(form_type):
+        return []
+    patterns = _COMPILED[form_type.split('/')[0]]
+
+    candidates = []
+    for key, pattern in patterns:
+        for match in pattern.finditer(text):
+            candidates.append((match.start(), key))
+    if not candidates:
+        return []
+    candidates.sort()
+
+    best = {}
+    for i, (pos, key) in enumerate(candidates):
+        next_pos = candidates[i + 1][0] if i + 1 < len(candidates) else len(text)
+        length = next_pos - pos
+        if key not in best or length > best[key][1]:
+            best[key] = (pos, length)
+
+    starts = sorted((pos, key) for key, (pos, _) in best.items())
+    sections = []
+    for i, (pos, key) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(text)
+        sections.append({"item": key, "start": pos, "end": end})
+    return sections
+
+def heading_positions(text, form_type, end=None):
+    """
+    Offsets of every Item heading match (real headings, TOC entries and cross references).
+    """
+    if not _spec_for(form_type):
+        return []
+    patterns = _COMPILED[form_type.split('/')[0]]
+    end = len(text) if end is None else end
+    return sorted(m.start() for _, pattern in patterns for m in pattern.finditer(text, 0, end))
+
+def select_sections(text, sections, items):
+    """
+    Concatenate the requested items (in document order). Returns '' if none were found.
+    """
+    wanted = set(items)
+    parts = [text[s['start']:s['end']].strip() for s in sections if s['item'] in wanted]
+    return "\n\n".join(p for p in parts if p)
+
+def load_cached_index(path, text_length):
+    """
+    Read a cached section index; ignored if it was built from a different text.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('text_length') == text_length:
+            return cached['sections']
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+def save_cached_index(path, text_length, sections):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"text_length": text_length, "sections": sections}, f)
@@ -0,0 +1,290 @@
+from html import escape
+import json
+import re
+from sec_module import docx_tables
+
+# --- Configuration ---
+# Schema of a structured (JSON) filing analysis, given to Gemini as response_schema so the
+# answer is a parsed object instead of free-form Markdown. One analysis is rendered as
+# WordPress HTML, a docx section or Markdown without asking the model again.
+# Empty strings / lists mean "not in the filing"; renderers skip them.
+_STRING = {"type": "string"}
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "array", "items": _STRING},
+        "business": _STRING,
+        "financials": {
+            "type": "object",
+            "properties": {
+                "commentary": _STRING,
+                "table": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"metric": _STRING, "current": _STRING, "previous": _STRING, "change": _STRING},
+                        "required": ["metric", "current", "previous", "change"],
+                    },
+                },
+            },
+            "required": ["commentary", "table"],
+        },
+        "shareholder_returns": {
+            "type": "object",
+            "properties": {"dividends": _STRING, "buybacks": _STRING},
+            "required": ["dividends", "buybacks"],
+        },
+        "guidance": {
+            "type": "object",
+            "properties": {
+                "summary": _STRING,
+                "changes": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"metric": _STRING, "before": _STRING, "after": _STRING},
+                        "required": ["metric", "before", "after"],
+                    },
+                },
+            },
+            "required": ["summary", "changes"],
+        },
+        "risks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"title": _STRING, "detail": _STRING},
+                "required": ["title", "detail"],
+            },
+        },
+    },
+    "required": ["summary", "business", "financials", "shareholder_returns", "guidance", "risks"],
+}
+GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": SCHEMA}
+
+SECTION_TITLES = {
+    "summary": "3-Line Summary",
+    "business": "What does this company do?",
+    "financials": "Financial Highlights",
+    "shareholder_returns": "Shareholder Returns",
+    "guidance": "Guidance (Before vs After)",
+    "risks": "Risk Check",
+}
+SUMMARY_BULLETS = 3
+FINANCIAL_COLUMNS = ["Metric", "Current", "Previous", "YoY Change"]
+GUIDANCE_COLUMNS = ["Metric", "Before", "After"]
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else ""
+
+def _rows(value, keys):
+    rows = []
+    for item in value if isinstance(value, list) else []:
+        if isinstance(item, dict):
+            row = {k: _text(item.get(k)) for k in keys}
+            if any(row.values()):
+                rows.append(row)
+    return rows
+
+def normalize(data):
+    """
+    Coerce a decoded answer to the exact SCHEMA shape (missing or mistyped fields become '' / []).
+    """
+    data = data if isinstance(data, dict) else {}
+    financials = data.get('financials') if isinstance(data.get('financials'), dict) else {}
+    returns = data.get('shareholder_returns') if isinstance(data.get('shareholder_returns'), dict) else {}
+    guidance = data.get('guidance') if isinstance(data.get('guidance'), dict) else {}
+    summary = data.get('summary') if isinstance(data.get('summary'), list) else []
+    return {
+        "summary": [s for s in (_text(s) for s in summary) if s],
+        "business": _text(data.get('business')),
+        "financials": {
+            "commentary": _text(financials.get('commentary')),
+            "table": _rows(financials.get('table'), ("metric", "current", "previous", "change")),
+        },
+        "shareholder_returns": {"dividends": _text(returns.get('dividends')), "buybacks": _text(returns.get('buybacks'))},
+        "guidance": {"summary": _text(guidance.get('summary')), "changes": _rows(guidance.get('changes'), ("metric", "before", "after"))},
+        "risks": _rows(data.get('risks'), ("title", "detail")),
+    }
+
+def parse(text):
+    """
+    Model answer (JSON, possibly inside a ``` fence) -> normalized report. Raises ValueError.
+    """
+    return normalize(json.loads(_FENCE_RE.sub("", text.strip())))
+
+def _unique(values):
+    return list(dict.fromkeys(v for v in values if v))
+
+def merge(reports):
+    """
+    Local merge of per-chunk reports (used when the reduce call fails): lists are
+    concatenated without duplicates, texts joined, the first row of a metric wins.
+    """
+    def join(values):
+        return "\n\n".join(_unique(values))
+
+    def first_by(rows, key):
+        seen = {}
+        for row in rows:
+            seen.setdefault(row[key].lower(), row)
+        return list(seen.values())
+
+    return normalize({
+        "summary": _unique(s for r in reports for s in r['summary'])[:SUMMARY_BULLETS],
+        "business": join(r['business'] for r in reports),
+        "financials": {
+            "commentary": join(r['financials']['commentary'] for r in reports),
+            "table": first_by([row for r in reports for row in r['financials']['table']], "metric"),
+        },
+        "shareholder_returns": {
+            "dividends": join(r['shareholder_returns']['dividends'] for r in reports),
+            "buybacks": join(r['shareholder_returns']['buybacks'] for r in reports),
+        },
+        "guidance": {
+            "summary": join(r['guidance']['summary'] for r in reports),
+            "changes": first_by([row for r in reports for row in r['guidance']['changes']], "metric"),
+        },
+        "risks": first_by([row for r in reports for row in r['risks']], "title"),
+    })
+
+def sections(report):
+    """
+    Non-empty sections in display order: [(key, title)].
+    """
+    present = {
+        "summary": bool(report['summary']),
+        "business": bool(report['business']),
+        "financials": bool(report['financials']['commentary'] or report['financials']['table']),
+        "shareholder_returns": any(report['shareholder_returns'].values()),
+        "guidance": bool(report['guidance']['summary'] or report['guidance']['changes']),
+        "risks": bool(report['risks']),
+    }
+    return [(key, SECTION_TITLES[key]) for key in SECTION_TITLES if present[key]]
+
+def _financial_rows(report):
+    return [[r['metric'], r['current'], r['previous'], r['change']] for r in report['financials']['table']]
+
+def _guidance_rows(report):
+    return [[r['metric'], r['before'], r['after']] for r in report['guidance']['changes']]
+
+# --- Markdown ---
+
+def _md_table(header, rows):
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    lines += ["| " + " | ".join(cell.replace("|", "\\|") for cell in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+def to_markdown(report):
+    """
+    Markdown (the shape of the free-form analysis: '## ' per section).
+    """
+    parts = []
+    for key, title in sections(report):
+        lines = [f"## {title}"]
+        if key == "summary":
+            lines += [f"- {s}" for s in report['summary']]
+        elif key == "business":
+            lines.append(report['business'])
+        elif key == "financials":
+            if report['financials']['table']:
+                lines.append(_md_table(FINANCIAL_COLUMNS, _financial_rows(report)))
+            if report['financials']['commentary']:
+                lines.append(report['financials']['commentary'])
+        elif key == "shareholder_returns":
+            returns = report['shareholder_returns']
+            lines += [f"- **{label}:** {returns[k]}" for k, label in (("dividends", "Dividends"), ("buybacks", "Buybacks")) if returns[k]]
+        elif key == "guidance":
+            if report['guidance']['summary']:
+                lines.append(report['guidance']['summary'])
+            if report['guidance']['changes']:
+                lines.append(_md_table(GUIDANCE_COLUMNS, _guidance_rows(report)))
+        elif key == "risks":
+            lines += [f"- **{r['title']}:** {r['detail']}" if r['title'] else f"- {r['detail']}" for r in report['risks']]
+        parts.append("\n\n".join(lines))
+    return "\n\n".join(parts) + "\n"
+
+# --- WordPress HTML ---
+
+def _paragraphs(text):
+    return "".join(f"<p>{escape(p.strip())}</p>" for p in text.split("\n\n") if p.strip())
+
+def _html_table(header, rows):
+    # Same look as xbrl_facts.to_html()
+    head = "".join(f"<th style='padding:8px; border-bottom:2px solid #333; text-align:left;'>{escape(h)}</th>" for h in header)
+    body = ""
+    for row in rows:
+        cells = f"<td style='padding:8px; border-bottom:1px solid #eee;'>{escape(row[0])}</td>"
+        cells += "".join(f"<td style='padding:8px; border-bottom:1px solid #eee; text-align:right;'>{escape(v)}</td>" for v in row[1:])
+        body += f"<tr>{cells}</tr>"
+    return f"<table style='width:100%; border-collapse:collapse; font-size:15px;'><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
+
+def to_html_sections(report):
+    """
+    One HTML string per section, each starting with its <h2> (images can go in between).
+    """
+    result = []
+    for key, title in sections(report):
+        html = f"<h2>{escape(title)}</h2>"
+        if key == "summary":
+            html += "<ul>" + "".join(f"<li>{escape(s)}</li>" for s in report['summary']) + "</ul>"
+        elif key == "business":
+            html += _paragraphs(report['business'])
+        elif key == "financials":
+            if report['financials']['table']:
+                html += _html_table(FINANCIAL_COLUMNS, _financial_rows(report))
+            html += _paragraphs(report['financials']['commentary'])
+        elif key == "shareholder_returns":
+            returns = report['shareholder_returns']
+            html += "<ul>" + "".join(f"<li><strong>{label}:</strong> {escape(returns[k])}</li>"
+                                     for k, label in (("dividends", "Dividends"), ("buybacks", "Buybacks")) if returns[k]) + "</ul>"
+        elif key == "guidance":
+            html += _paragraphs(report['guidance']['summary'])
+            if report['guidance']['changes']:
+                html += _html_table(GUIDANCE_COLUMNS, _guidance_rows(report))
+        elif key == "risks":
+            html += "<ul>" + "".join(
+                f"<li><strong>{escape(r['title'])}:</strong> {escape(r['detail'])}</li>" if r['title'] else f"<li>{escape(r['detail'])}</li>"
+                for r in report['risks']) + "</ul>"
+        result.append(html)
+    return result
+
+# --- Word ---
+
+def add_to_docx(doc, report, heading_level=2):
+    """
+    Append the analysis to a python-docx Document (headings, bullets, tables; no Markdown stripping).
+    """
+    for key, title in sections(report):
+        doc.add_heading(title, level=heading_level)
+        if key == "summary":
+            for s in report['summary']:
+                doc.add_paragraph(s, style='List Bullet')
+        elif key == "business":
+            doc.add_paragraph(report['business'])
+        elif key == "financials":
+            if report['financials']['table']:
+                docx_tables.add_table(doc, FINANCIAL_COLUMNS, _financial_rows(report),
+                                      header_align=["center"] * 4, body_align=["left", "right", "right", "right"])
+            if report['financials']['commentary']:
+                doc.add_paragraph(report['financials']['commentary'])
+        elif key == "shareholder_returns":
+            for k, label in (("dividends", "Dividends"), ("buybacks", "Buybacks")):
+                if report['shareholder_returns'][k]:
+                    p = doc.add_paragraph(style='List Bullet')
+                    p.add_run(f"{label}: ").bold = True
+                    p.add_run(report['shareholder_returns'][k])
+        elif key == "guidance":
+            if report['guidance']['summary']:
+                doc.add_paragraph(report['guidance']['summary'])
+            if report['guidance']['changes']:
+                docx_tables.add_table(doc, GUIDANCE_COLUMNS, _guidance_rows(report),
+                                      header_align=["center"] * 3, body_align=["left", "right", "right"])
+        elif key == "risks":
+            for r in report['risks']:
+                p = doc.add_paragraph(style='List Bullet')
+                if r['title']:
+                    p.add_run(f"{r['title']}: ").bold = True
+                p.add_run(r['detail'])
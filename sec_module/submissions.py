@@ -0,0 +1,123 @@
+import time
+import os
+import json
+from sec_module import sec_client
+
+# --- Configuration ---
+SUBMISSIONS_URL = "https://data.sec.gov/submissions/CIK{cik}.json"
+CACHE_DIR = os.path.join("sec_cache", "submissions")
+FRESH_SECONDS = 300 # Within this window a cached answer is reused without revalidating
+
+def _meta_path(cik):
+    return os.path.join(CACHE_DIR, f"CIK{cik}.meta.json")
+
+def _load_meta(cik):
+    try:
+        with open(_meta_path(cik), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_meta(cik, meta):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _meta_path(cik)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, path)
+
+def index_latest_by_form(recent, skip=0):
+    """
+    One pass over the 'recent' arrays (newest first) -> {form: latest filing}.
+    skip=1 returns the filing before the latest one of each form (for year-over-year diffs).
+    """
+    latest = {}
+    seen = {}
+    forms = recent['form']
+    for i in range(len(recent['accessionNumber'])):
+        form = forms[i]
+        if form in latest:
+            continue
+        seen[form] = seen.get(form, 0) + 1
+        if seen[form] <= skip:
+            continue
+        latest[form] = {
+            "accession_number": recent['accessionNumber'][i],
+            "primary_document": recent['primaryDocument'][i],
+            "filing_date": recent['filingDate'][i]
+        }
+    return latest
+
+def filing_url(cik, accession_number, document):
+    """
+    Construct the EDGAR Archives URL of a document inside a filing.
+    """
+    accession_number_no_dashes = accession_number.replace('-', '')
+    return f"https://www.sec.gov/Archives/edgar/data/{int(cik)}/{accession_number_no_dashes}/{document}"
+
+def _load_index(cik, headers):
+    """
+    Cached {'latest', 'previous'} filing index of a company, revalidated with a conditional GET.
+    """
+    meta = _load_meta(cik)
+    if meta and 'previous' not in meta:
+        meta = None # Written before 'previous' was indexed: fetch in full once
+    if meta and time.time() - meta.get('checked_at', 0) < FRESH_SECONDS:
+        return meta
+
+    req_headers = dict(headers)
+    if meta:
+        if meta.get('etag'):
+            req_headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            req_headers['If-Modified-Since'] = meta['last_modified']
+
+    response = sec_client.get(SUBMISSIONS_URL.format(cik=cik), headers=req_headers)
+    if response.status_code == 304 and meta:
+        meta['checked_at'] = time.time()
+        _save_meta(cik, meta)
+        return meta
+    response.raise_for_status()
+
+    data = response.json()
+    meta = {
+        "etag": response.headers.get('ETag'),
+        "last_modified": response.headers.get('Last-Modified'),
+        "checked_at": time.time(),
+        "latest": index_latest_by_form(data['filings']['recent']),
+        "previous": index_latest_by_form(data['filings']['recent'], skip=1)
+    }
+    _save_meta(cik, meta)
+    return meta
+
+def load_latest_filings(cik, headers):
+    """
+    Return {form: {'accession_number', 'primary_document', 'filing_date'}} for every form
+    in the company's recent submissions, using a conditional GET against the on-disk cache.
+    An unchanged company costs one 304 and no JSON parse of the submissions file.
+    """
+    return _load_index(cik, headers)['latest']
+
+def find_latest_filings(cik, form_types, headers):
+    """
+    Locate the latest filing for each requested form from a single submissions fetch.
+    Returns {form_type: {'url', 'filing_date', 'accession_number', 'primary_document'}};
+    forms with no recent filing are omitted.
+    """
+    latest = load_latest_filings(cik, headers)
+    found = {}
+    for form_type in form_types:
+        entry = latest.get(form_type)
+        if entry:
+            found[form_type] = dict(entry, url=filing_url(cik, entry['accession_number'], entry['primary_document']))
+    return found
+
+def find_previous_filing(cik, form_type, headers):
+    """
+    The filing of form_type before the latest one (same cached submissions fetch), or None.
+    Returns {'url', 'filing_date', 'accession_number', 'primary_document'}.
+    """
+    entry = _load_index(cik, headers)['previous'].get(form_type)
+    if not entry:
+        return None
+    return dict(entry, url=filing_url(cik, entry['accession_number'], entry['primary_document']))
@@ -0,0 +1,143 @@
+import threading
+import time
+import os
+import json
+from sec_module import sec_client
+
+# --- Configuration ---
+TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+INDEX_FILE = os.path.join("sec_cache", "ticker_index.json")
+DEFAULT_TTL_HOURS = 24
+RETRY_COOLDOWN_SEC = 60 # Don't hammer sec.gov when a cold-start download keeps failing
+
+# In-memory copy of the on-disk index: {normalized ticker: 10-digit CIK}
+_index = {}
+_index_mtime = None
+_lock = threading.Lock()
+_refresh_thread = None
+_last_failure = 0.0
+
+def normalize_ticker(ticker):
+    """
+    Normalize a ticker to SEC's spelling (upper case, share class joined with '-').
+    e.g. 'brk.b' / 'BRK/B' / 'BRK B' -> 'BRK-B'
+    """
+    t = str(ticker).strip().upper()
+    for sep in ('.', '/', ' '):
+        t = t.replace(sep, '-')
+    return t
+
+def build_index(data):
+    """
+    Build {ticker: CIK} in one pass over company_tickers.json.
+    The SEC file is ordered by market cap, so the first entry for a ticker wins.
+    """
+    index = {}
+    for value in data.values():
+        key = normalize_ticker(value['ticker'])
+        if key not in index:
+            index[key] = str(value['cik_str']).zfill(10) # CIK is 10 digits
+    return index
+
+def refresh_index(headers, path=INDEX_FILE):
+    """
+    Download company_tickers.json and rewrite the on-disk index atomically.
+    Returns the new index, or None on failure.
+    """
+    global _index, _index_mtime, _last_failure
+    try:
+        response = sec_client.get(TICKERS_URL, headers=headers)
+        response.raise_for_status()
+        index = build_index(response.json())
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"built_at": time.time(), "index": index}, f)
+        os.replace(tmp_path, path) # Other processes never see a half-written file
+
+        with _lock:
+            _index = index
+            _index_mtime = os.path.getmtime(path)
+        print(f"[TickerIndex] Refreshed ({len(index)} tickers)")
+        return index
+    except Exception as e:
+        print(f"[TickerIndex] Refresh failed: {e}")
+        _last_failure = time.time()
+        return None
+
+def _load_from_disk(path):
+    """
+    (Re)load the index file if another process rewrote it since our last read.
+    """
+    global _index, _index_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return False
+
+    if mtime == _index_mtime:
+        return True
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        with _lock:
+            _index = payload.get('index', {})
+            _index_mtime = mtime
+        return True
+    except Exception as e:
+        print(f"[TickerIndex] Failed to read {path}: {e}")
+        return False
+
+def _refresh_in_background(headers, path):
+    """
+    Start a refresh thread unless one is already running.
+    """
+    global _refresh_thread
+    with _lock:
+        if _refresh_thread and _refresh_thread.is_alive():
+            return
+        _refresh_thread = threading.Thread(target=refresh_index, args=(headers, path), daemon=True)
+        _refresh_thread.start()
+
+def is_stale(path=INDEX_FILE, ttl_hours=DEFAULT_TTL_HOURS):
+    try:
+        return (time.time() - os.path.getmtime(path)) > ttl_hours * 3600
+    except OSError:
+        return True
+
+def ensure_index(headers, path=INDEX_FILE, ttl_hours=DEFAULT_TTL_HOURS):
+    """
+    Make sure an index is loaded. Only blocks on the network when no index exists yet;
+    a stale index keeps serving lookups while a background thread refreshes it.
+    """
+    if not _load_from_disk(path):
+        if time.time() - _last_failure > RETRY_COOLDOWN_SEC:
+            refresh_index(headers, path)
+    elif is_stale(path, ttl_hours):
+        _refresh_in_background(headers, path)
+    return _index
+
+def get_cik(ticker, headers, path=INDEX_FILE, ttl_hours=DEFAULT_TTL_HOURS):
+    """
+    O(1) Ticker -> CIK lookup against the local index. Returns None if unknown.
+    """
+    index = ensure_index(headers, path, ttl_hours)
+    return index.get(normalize_ticker(ticker))
+
+def index_status(path=INDEX_FILE):
+    """
+    Summary for the dashboard: {'exists', 'built_at', 'count'}.
+    """
+    if not os.path.exists(path):
+        return {"exists": False, "built_at": None, "count": 0}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        return {
+            "exists": True,
+            "built_at": payload.get('built_at'),
+            "count": len(payload.get('index', {}))
+        }
+    except Exception:
+        return {"exists": True, "built_at": None, "count": 0}
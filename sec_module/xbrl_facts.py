@@ -0,0 +1,241 @@
+import time
+import os
+import json
+import pandas as pd
+from sec_module import sec_client
+
+# --- Configuration ---
+COMPANYFACTS_URL = "https://data.sec.gov/api/xbrl/companyfacts/CIK{cik}.json"
+CACHE_DIR = os.path.join("sec_cache", "companyfacts")
+FRESH_SECONDS = 6 * 3600 # Facts only change when the company files; revalidate a few times a day
+
+# (metric, us-gaap concepts in order of preference, unit)
+METRICS = [
+    ("Revenue", ["Revenues", "RevenueFromContractWithCustomerExcludingAssessedTax",
+                 "RevenueFromContractWithCustomerIncludingAssessedTax", "SalesRevenueNet"], "USD"),
+    ("Operating Income", ["OperatingIncomeLoss"], "USD"),
+    ("Net Income", ["NetIncomeLoss", "ProfitLoss"], "USD"),
+    ("EPS (Diluted)", ["EarningsPerShareDiluted", "EarningsPerShareBasic"], "USD/shares"),
+]
+_CONCEPTS = {concept for _, concepts, _ in METRICS for concept in concepts}
+
+# Expected period length per form: annual figures for 10-K, the quarter itself for 10-Q
+PERIOD_DAYS = {
+    "10-K": (340, 390),
+    "10-Q": (80, 100),
+}
+
+def _cache_path(cik):
+    return os.path.join(CACHE_DIR, f"CIK{cik}.json")
+
+def _load_cache(cik):
+    try:
+        with open(_cache_path(cik), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_cache(cik, cached):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(cik)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cached, f)
+    os.replace(tmp_path, path)
+
+def _slim(data):
+    """
+    Keep only the concepts we tabulate (companyfacts is often 5-20 MB; this is a few KB).
+    """
+    gaap = data.get('facts', {}).get('us-gaap', {})
+    return {concept: gaap[concept].get('units', {}) for concept in _CONCEPTS if concept in gaap}
+
+def load_company_facts(cik, headers):
+    """
+    Return {concept: {unit: [fact, ...]}} for the tabulated us-gaap concepts.
+    companyfacts is fetched at most once per FRESH_SECONDS per company and revalidated
+    with ETag/If-Modified-Since; only the slimmed facts are kept on disk.
+    """
+    cached = _load_cache(cik)
+    if cached and time.time() - cached.get('checked_at', 0) < FRESH_SECONDS:
+        return cached['facts']
+
+    req_headers = dict(headers)
+    if cached:
+        if cached.get('etag'):
+            req_headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            req_headers['If-Modified-Since'] = cached['last_modified']
+
+    response = sec_client.get(COMPANYFACTS_URL.format(cik=cik), headers=req_headers)
+    if response.status_code == 304 and cached:
+        cached['checked_at'] = time.time()
+        _save_cache(cik, cached)
+        return cached['facts']
+    response.raise_for_status()
+
+    cached = {
+        "etag": response.headers.get('ETag'),
+        "last_modified": response.headers.get('Last-Modified'),
+        "checked_at": time.time(),
+        "facts": _slim(response.json()),
+    }
+    _save_cache(cik, cached)
+    return cached['facts']
+
+def _frame(facts, concept, unit):
+    """
+    Facts of one concept -> DataFrame (start/end as dates, days = period length), or None.
+    """
+    rows = facts.get(concept, {}).get(unit)
+    if not rows:
+        return None
+    df = pd.DataFrame(rows)
+    if 'start' not in df or 'end' not in df:
+        return None
+    df = df.dropna(subset=['start', 'end', 'val'])
+    df['start'] = pd.to_datetime(df['start'])
+    df['end'] = pd.to_datetime(df['end'])
+    df['days'] = (df['end'] - df['start']).dt.days
+    return df
+
+def _pick_pair(df, form_type, accession=None):
+    """
+    (current, prior) fact rows for one metric, or None.
+    current: the latest period reported in this filing (or the latest filing of form_type);
+    prior: the same-length period ending about one year earlier.
+    """
+    low, high = PERIOD_DAYS.get(form_type.split('/')[0], PERIOD_DAYS["10-K"])
+    df = df[(df['days'] >= low) & (df['days'] <= high)]
+    if df.empty:
+        return None
+
+    filing = df[df['form'].astype(str).str.startswith(form_type.split('/')[0])]
+    if accession:
+        accn = df['accn'].astype(str).str.replace('-', '')
+        filing = df[accn == accession.replace('-', '')]
+    if filing.empty:
+        return None
+    if not accession:
+        filing = filing[filing['filed'] == filing['filed'].max()]
+
+    current = filing.sort_values('end').iloc[-1]
+    gap = (current['end'] - df['end']).dt.days
+    prior = df[(gap >= 350) & (gap <= 380)]
+    if prior.empty:
+        return current, None
+    # Prefer the value as re-reported in the same filing (restated), else the latest filed
+    same = prior[prior['accn'] == current['accn']]
+    prior = (same if not same.empty else prior).sort_values('filed').iloc[-1]
+    return current, prior
+
+def build_highlights(facts, form_type="10-K", accession=None):
+    """
+    Current vs prior-year table for Revenue, Operating Income, Net Income and EPS.
+    Returns a DataFrame indexed by metric with columns
+    [Current, Previous, YoY Change] (numbers; YoY as a fraction), or None if nothing matched.
+    df.attrs holds 'current_period' / 'previous_period' labels and the 'unit' of each row.
+
+    Companies switch concepts over the years (Revenues -> RevenueFromContractWith...), so every
+    concept of a metric is tried. The table's period is the latest one any metric reports; each
+    metric takes its first concept with a value for that period, and is left out without one.
+    """
+    # {metric: [(current, prior), ...]} in concept order
+    candidates = {}
+    for metric, concepts, unit in METRICS:
+        for concept in concepts:
+            df = _frame(facts, concept, unit)
+            pair = _pick_pair(df, form_type, accession) if df is not None else None
+            if pair:
+                candidates.setdefault(metric, []).append(pair)
+    if not candidates:
+        return None
+    current_end = max(current['end'] for pairs in candidates.values() for current, _ in pairs)
+
+    rows = {}
+    units = {}
+    previous_end = None
+    for metric, concepts, unit in METRICS:
+        pair = next((p for p in candidates.get(metric, []) if p[0]['end'] == current_end), None)
+        if not pair:
+            if metric in candidates:
+                print(f"[XBRL] {metric}: no value for the period ending {current_end.date()}, row skipped")
+            continue
+        current, prior = pair
+        cur_val = float(current['val'])
+        prev_val = float(prior['val']) if prior is not None else None
+        yoy = (cur_val - prev_val) / abs(prev_val) if prev_val else None
+        rows[metric] = [cur_val, prev_val, yoy]
+        units[metric] = unit
+        if prior is not None:
+            previous_end = previous_end or prior['end']
+
+    if not rows:
+        return None
+    table = pd.DataFrame.from_dict(rows, orient='index', columns=["Current", "Previous", "YoY Change"])
+    table.index.name = "Metric"
+    table.attrs['current_period'] = _period_label(current_end, form_type)
+    table.attrs['previous_period'] = _period_label(previous_end, form_type)
+    table.attrs['unit'] = units
+    return table
+
+def _period_label(end, form_type):
+    if end is None:
+        return "-"
+    end = end.date() if hasattr(end, 'date') else end
+    if form_type.startswith("10-Q"):
+        return f"Q ended {end.isoformat()}"
+    return f"FY ended {end.isoformat()}"
+
+def format_value(value, unit):
+    if value is None or pd.isna(value):
+        return "N/A"
+    sign = "-" if value < 0 else ""
+    value = abs(value)
+    if unit == "USD/shares":
+        return f"{sign}${value:,.2f}"
+    if value >= 1e9:
+        return f"{sign}${value / 1e9:,.2f}B"
+    if value >= 1e6:
+        return f"{sign}${value / 1e6:,.1f}M"
+    return f"{sign}${value:,.0f}"
+
+def format_change(change):
+    if change is None or pd.isna(change):
+        return "N/A"
+    return f"{change:+.1%}"
+
+def formatted_rows(table):
+    """
+    Display rows: [[metric, current, previous, yoy], ...] as strings.
+    """
+    units = table.attrs.get('unit', {})
+    return [
+        [metric, format_value(row['Current'], units.get(metric)),
+         format_value(row['Previous'], units.get(metric)), format_change(row['YoY Change'])]
+        for metric, row in table.iterrows()
+    ]
+
+def header_row(table):
+    return ["Metric", f"Current ({table.attrs.get('current_period', '-')})",
+            f"Previous ({table.attrs.get('previous_period', '-')})", "YoY Change"]
+
+def to_markdown(table):
+    """
+    Markdown table (used as verified context in the Gemini prompt).
+    """
+    lines = ["| " + " | ".join(header_row(table)) + " |", "|---|---|---|---|"]
+    lines += ["| " + " | ".join(row) + " |" for row in formatted_rows(table)]
+    return "\n".join(lines)
+
+def to_html(table):
+    """
+    HTML table for the WordPress post.
+    """
+    head = "".join(f"<th style='padding:8px; border-bottom:2px solid #333; text-align:left;'>{h}</th>" for h in header_row(table))
+    body = ""
+    for row in formatted_rows(table):
+        cells = f"<td style='padding:8px; border-bottom:1px solid #eee;'>{row[0]}</td>"
+        cells += "".join(f"<td style='padding:8px; border-bottom:1px solid #eee; text-align:right;'>{v}</td>" for v in row[1:])
+        body += f"<tr>{cells}</tr>"
+    return f"<table style='width:100%; border-collapse:collapse; font-size:15px;'><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
@@ -0,0 +1,168 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import datetime
+import time
+import os
+import json
+import pandas as pd
+import yfinance as yf
+
+try:
+    import pyarrow # Parquet engine (optional: falls back to pickle)
+except ImportError:
+    pyarrow = None
+
+# --- Configuration ---
+CACHE_DIR = os.path.join("sec_cache", "yfinance")
+INFO_TTL_SEC = int(os.getenv("YF_INFO_TTL_MIN", "15")) * 60 # Quote fields (price, market cap, PER)
+NEXT_PERIOD_DAYS = 380 # Annual statements: a new fiscal year is expected ~1 year after the last one
+STATEMENTS_MAX_AGE_DAYS = 90 # Refresh anyway now and then (restatements)
+PREFETCH_WORKERS = int(os.getenv("YF_PREFETCH_WORKERS", "8"))
+
+STATEMENTS = {
+    "income": "financials",
+    "balance": "balance_sheet",
+    "cashflow": "cashflow",
+}
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+def _lock_for(ticker):
+    with _locks_guard:
+        return _locks.setdefault(ticker, threading.Lock())
+
+def _dir(ticker):
+    return os.path.join(CACHE_DIR, ticker.upper())
+
+def _meta_path(ticker):
+    return os.path.join(_dir(ticker), "meta.json")
+
+def _load_meta(ticker):
+    try:
+        with open(_meta_path(ticker), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_meta(ticker, meta):
+    path = _meta_path(ticker)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, default=str)
+    os.replace(tmp_path, path)
+
+def _frame_path(ticker, period_end, name):
+    ext = ".parquet" if pyarrow else ".pkl"
+    return os.path.join(_dir(ticker), f"{period_end}.{name}{ext}")
+
+def _write_frame(df, path):
+    # Parquet needs string column names: period-end Timestamps are stored as ISO dates
+    df = df.copy()
+    df.columns = [str(c.date()) if hasattr(c, 'date') else str(c) for c in df.columns]
+    df.index = df.index.map(str)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if pyarrow:
+        df.to_parquet(tmp_path)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+def _read_frame(path):
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_pickle(path)
+    try:
+        df.columns = pd.to_datetime(df.columns)
+    except (ValueError, TypeError):
+        pass # Non-date columns: keep as stored
+    return df
+
+def _latest_period_end(frames):
+    ends = [c for df in frames.values() if df is not None for c in df.columns if hasattr(c, 'date')]
+    return str(max(ends).date()) if ends else "unknown"
+
+def _statements_fresh(meta, filed_after):
+    """
+    Cached statements are reused until a newer period can exist: a filing after the
+    fetch, about a year past the cached period end, or STATEMENTS_MAX_AGE_DAYS.
+    """
+    period_end = meta.get('period_end')
+    fetched_at = meta.get('statements_at')
+    if not period_end or not fetched_at:
+        return False
+    now = time.time()
+    if now - fetched_at > STATEMENTS_MAX_AGE_DAYS * 86400:
+        return False
+    if filed_after and datetime.date.fromtimestamp(fetched_at).isoformat() < str(filed_after):
+        return False
+    if period_end != "unknown":
+        next_period = datetime.date.fromisoformat(period_end) + datetime.timedelta(days=NEXT_PERIOD_DAYS)
+        if datetime.date.today() > next_period:
+            return False
+    return True
+
+def _load_statements(ticker, meta):
+    frames = {}
+    for name in STATEMENTS:
+        path = meta.get('files', {}).get(name)
+        frames[name] = _read_frame(path) if path and os.path.exists(path) else None
+    return frames
+
+def _fetch_statements(ticker, stock, meta):
+    frames = {name: getattr(stock, attr) for name, attr in STATEMENTS.items()}
+    # Empty statements are not stored: return None for them on every path
+    frames = {name: None if df is None or df.empty else df for name, df in frames.items()}
+    period_end = _latest_period_end(frames)
+    files = {}
+    for name, df in frames.items():
+        if df is None:
+            continue
+        path = _frame_path(ticker, period_end, name)
+        _write_frame(df, path)
+        files[name] = path
+    # Drop files of older periods
+    for old in meta.get('files', {}).values():
+        if old not in files.values() and os.path.exists(old):
+            os.remove(old)
+    meta.update({"period_end": period_end, "statements_at": time.time(), "files": files})
+    return frames
+
+def get(ticker, filed_after=None, refresh=False):
+    """
+    (income, balance, cashflow, info) for ticker, each as yfinance returns it (full history).
+    Statements are cached per latest fiscal period end; info is cached for INFO_TTL_SEC.
+    filed_after: date of the newest SEC filing we know of; statements fetched before it are refreshed.
+    """
+    with _lock_for(ticker):
+        meta = _load_meta(ticker)
+        stock = yf.Ticker(ticker)
+
+        if not refresh and _statements_fresh(meta, filed_after):
+            frames = _load_statements(ticker, meta)
+        else:
+            frames = _fetch_statements(ticker, stock, meta)
+
+        if refresh or time.time() - meta.get('info_at', 0) > INFO_TTL_SEC:
+            meta['info'] = stock.info
+            meta['info_at'] = time.time()
+        _save_meta(ticker, meta)
+        return frames['income'], frames['balance'], frames['cashflow'], meta['info']
+
+def prefetch(tickers, max_workers=PREFETCH_WORKERS):
+    """
+    Warm the cache for a whole ticker list concurrently (a sector batch otherwise makes
+    4 sequential Yahoo calls per ticker). Failures are logged and skipped.
+    Returns the number of tickers cached.
+    """
+    def warm(ticker):
+        try:
+            get(ticker)
+            return True
+        except Exception as e:
+            print(f"[{ticker}] yfinance prefetch failed: {e}")
+            return False
+
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return sum(executor.map(warm, tickers))
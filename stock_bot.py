@@ -2,6 +2,7 @@ import os
 import wp_utils
 import image_factory
 from sec_module import core
+from utils import model_router
 import yfinance as yf
 import datetime
 import matplotlib.pyplot as plt
@@ -48,24 +49,13 @@ def load_config():
     with open('bot_config.json', 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def run_stock_job(limit=None):
+def expand_tickers(tickers):
     """
-    주식 리포트 발행 메인 잡
+    설정의 티커 목록을 확장 (@그룹 -> stock_data/그룹.json의 종목들)
+    반환: [{'symbol': 'AAPL', 'group': '@SP500_TECH'}, ...] (심볼 기준 중복 제거)
     """
-    print(f"[INFO] Loading config & tickers... (Limit: {limit})")
-    update_status("running", "[START] 봇 초기화 및 종목 리스트 로드 중...", 0.0)
-    
-    config = load_config()
-    tickers = config.get('stock', {}).get('tickers', [])
-    report_types = config.get('stock', {}).get('report_types', ["10-K"]) # 기본값 10-K
-    
-    if not tickers:
-        print("[WARNING] 설정된 종목이 없습니다 (bot_config.json 확인 필요).")
-        return
-
-    # --- 1. 티커 확장 로직 (그룹 정보를 포함하도록 개선) ---
     expanded_items = [] # [{'symbol': 'AAPL', 'group': '@SP500_TECH'}, ...]
-    
+
     for t in tickers:
         group_name = t # 기본값 (개별 티커인 경우)
         if t.startswith("@"):
@@ -85,16 +75,68 @@ def run_stock_job(limit=None):
                 print(f"[WARNING] 그룹 파일을 찾을 수 없습니다: {filepath}")
         else:
             expanded_items.append({'symbol': t, 'group': 'Individual'})
-            
+        
     # 중복 제거 (심볼 기준, 먼저 나온 그룹 우선)
     unique_items = {}
     for item in expanded_items:
         if item['symbol'] not in unique_items:
             unique_items[item['symbol']] = item
-            
-    final_items = list(unique_items.values())
+        
+    return list(unique_items.values())
+
+def run_stock_job(limit=None, changed_only=False):
+    """
+    주식 리포트 발행 메인 잡
+    changed_only: EDGAR 일일 인덱스에서 지난 워터마크 이후 공시한 종목만 처리 (--loop 모드)
+    """
+    print(f"[INFO] Loading config & tickers... (Limit: {limit})")
+    update_status("running", "[START] 봇 초기화 및 종목 리스트 로드 중...", 0.0)
+    
+    config = load_config()
+    model_router.reload()  # 대시보드에서 바꾼 모델 라우팅(bot_config.json "models")을 재시작 없이 반영
+    tickers = config.get('stock', {}).get('tickers', [])
+    report_types = config.get('stock', {}).get('report_types', ["10-K"]) # 기본값 10-K
+    cik_ttl_hours = config.get('stock', {}).get('cik_index_ttl_hours', 24)
+    # 요약 모드에서 Gemini에 보낼 Item 목록 (예: 10-K -> Item 1, 1A, 5, 7, 7A)
+    summary_sections = config.get('stock', {}).get('summary_sections', core.sections.DEFAULT_SUMMARY_SECTIONS)
+    # 전년 대비 변경점 모드를 쓸 보고서 종류 (예: ["10-K"]) -> 직전 같은 양식 공시와 비교해 바뀐 부분만 분석
+    diff_forms = config.get('stock', {}).get('diff_forms', [])
+    # 분석 전 제거할 보일러플레이트 (숨김 iXBRL, 쪽번호, 머리말/꼬리말, 목차, 첨부목록). 빈 리스트면 끔
+    prune_rules = config.get('stock', {}).get('prune_rules', list(core.pruning.DEFAULT_RULES))
+    # 요약 모드 사전 추출 (보고서 종류별): {"10-K": {"max_tokens": 30000, "keywords": [...]}} -> 핵심 문장만 전송
+    prerank = config.get('stock', {}).get('prerank', {})
+    # 선택적 다운로드 (보고서 종류별): 공시 폴더 인덱스를 먼저 읽고 필요한 문서만 받음
+    # 예: {"8-K": ["exhibit:99.1"]} -> 8-K 본문 대신 보도자료(Exhibit 99.1)만, "statements" -> 재무제표 R 페이지
+    documents = config.get('stock', {}).get('documents', {})
+    # 요약 결과 형식: "json"이면 스키마 고정 JSON으로 받아 HTML로 렌더링 (마크다운 후처리 없음), "markdown"이면 기존 방식
+    output_format = config.get('stock', {}).get('output', "markdown")
+    
+    if not tickers:
+        print("[WARNING] 설정된 종목이 없습니다 (bot_config.json 확인 필요).")
+        return
+
+    # --- 1. 티커 확장 로직 (그룹 정보를 포함하도록 개선) ---
+    final_items = expand_tickers(tickers)
     total_tickers = len(final_items)
     print(f"[INFO] 총 분석 대상: {total_tickers}개 종목")
+
+    # 티커 -> CIK 인덱스 준비 (로컬 파일, TTL 지나면 백그라운드 갱신)
+    # 종목마다 company_tickers.json(~1MB)을 다시 받지 않도록 한 번만 확인
+    core.ticker_index.ensure_index(core.SEC_HEADERS, ttl_hours=cik_ttl_hours)
+
+    # 변경 감지: 종목마다 submissions를 조회하는 대신 일일 인덱스(하루 1파일)로 새 공시가 있는 종목만 추림
+    new_watermark = None
+    if changed_only:
+        filers, new_watermark = core.detect_new_filings(report_types)
+        if filers is not None:
+            changed_items = []
+            for item in final_items:
+                cik = core.get_cik_from_ticker(item['symbol'], ttl_hours=cik_ttl_hours)
+                if cik and int(cik) in filers:
+                    changed_items.append(item)
+            final_items = changed_items
+            total_tickers = len(final_items)
+            print(f"[INFO] 새 공시가 있는 종목: {total_tickers}개")
     # --- 2. 히스토리 초기화 (User Request) ---
     # 매 실행마다 기억을 지워서, 워드프레스에서 삭제된 글을 다시 발행할 수 있게 함.
     # 단, 이번 실행 중에 중복 발행되는 것을 막기 위해 빈 딕셔너리로 시작.
@@ -109,11 +151,15 @@ def run_stock_job(limit=None):
     print(f"[INFO] 최근 {len(recent_posts)}개 리포트 정보 로드 완료.")
 
     success_count = 0
+    # 실패한 종목 (CIK/다운로드/추출/분석/발행) -> 있으면 워터마크를 올리지 않아 다음 사이클에 재시도
+    failed_tickers = []
 
     for i, item in enumerate(final_items):
         # Limit Check
         if limit and success_count >= limit:
             print(f"[INFO] Limit reached ({limit}). Stopping.")
+            # 남은 종목은 다음 사이클에서 다시 잡히도록 워터마크를 올리지 않음
+            new_watermark = None
             break
             
         target_ticker = item['symbol']
@@ -144,17 +190,21 @@ def run_stock_job(limit=None):
             print(f"[ERROR] 차트 생성 중 에러 ({target_ticker}): {e}")
             chart_url = None
 
+        # 3. SEC 데이터 수집 (최적화 적용)
+        # 1단계: 메타데이터만 먼저 확인 (CIK -> URL & Date)
+        # 보고서 종류(10-K/10-Q/8-K)가 여러 개여도 submissions 조회는 종목당 1회
+        cik = core.get_cik_from_ticker(target_ticker, ttl_hours=cik_ttl_hours)
+        if not cik:
+            print(f"[ERROR] CIK 찾기 실패: {target_ticker}")
+            failed_tickers.append(target_ticker)
+            continue
+
+        latest_filings = core.get_latest_filings(cik, target_ticker, report_types)
+
         for r_type in report_types:
             print(f"[TARGET] 분석 대상: {target_ticker} ({r_type})")
 
-            # 3. SEC 데이터 수집 (최적화 적용)
-            # 1단계: 메타데이터만 먼저 확인 (CIK -> URL & Date)
-            cik = core.get_cik_from_ticker(target_ticker)
-            if not cik:
-                print(f"[ERROR] CIK 찾기 실패: {target_ticker}")
-                continue
-                
-            filing_url, filing_date = core.get_latest_filing_url(cik, target_ticker, form_type=r_type)
+            filing_url, filing_date = latest_filings.get(r_type, (None, None))
             
             if not filing_url:
                 print(f"[WARNING] {target_ticker}의 {r_type} 데이터를 찾을 수 없습니다.")
@@ -185,38 +235,93 @@ def run_stock_job(limit=None):
             
             # 3단계: 실제 다운로드 (중복이 아닐 때만)
             print(f"[NEW] 새로운 리포트 발견! ({filing_date}) -> 다운로드 시작...")
-            html_content = core.download_filing_html(filing_url)
-            
-            if not html_content:
-                print(f"[WARNING] {target_ticker} 다운로드 실패")
-                continue 
-            
-            print(f"[INFO] {r_type} 데이터 확보 완료 ({filing_date})")
+            text_to_analyze = None
+            if documents.get(r_type):
+                text_to_analyze = core.extract_filing_documents(filing_url, r_type, documents[r_type], target_ticker, prune_rules)
 
-            # 4. 데이터 전처리
-            text_to_analyze = core.extract_sections(html_content)
+            if text_to_analyze is None:
+                # (필링 스토어에 압축 저장 후 스트리밍으로 읽음 -> 30MB 10-K도 메모리 일정)
+                filing_stream = core.open_filing_text(filing_url)
+                
+                if not filing_stream:
+                    print(f"[WARNING] {target_ticker} 다운로드 실패")
+                    failed_tickers.append(target_ticker)
+                    continue 
+                
+                print(f"[INFO] {r_type} 데이터 확보 완료 ({filing_date})")
+
+                # 4. 데이터 전처리
+                with filing_stream:
+                    text_to_analyze = core.extract_sections(filing_stream, prune_rules, r_type)
 
             if not text_to_analyze:
                 print("[WARNING] 텍스트 추출 실패")
+                failed_tickers.append(target_ticker)
                 continue
 
+            # 전년 대비 변경점 모드: 직전 공시와 Item별로 비교해 추가/삭제/변경된 문장만 전송 (매년 반복되는 본문 제외)
+            analysis_mode = "summary"
+            prev_date = None
+            if r_type in diff_forms:
+                diff_text, prev_date = core.diff_against_previous(
+                    cik, target_ticker, r_type, filing_url, filing_date, text_to_analyze, summary_sections.get(r_type), prune_rules)
+                if diff_text:
+                    text_to_analyze = diff_text
+                    analysis_mode = "diff"
+                elif diff_text == "":
+                    print("[INFO] 직전 공시 대비 중요한 변경 없음 -> 요약 모드로 진행")
+
+            # 필요한 Item만 추려서 전송 (전문/서명/부록 제외 -> 토큰 & 지연 감소)
+            if analysis_mode == "summary" and summary_sections.get(r_type):
+                text_to_analyze = core.select_filing_sections(filing_url, text_to_analyze, r_type, summary_sections[r_type])
+
+            # TF-IDF 사전 추출: 자사주/배당/가이던스/리스크 관련 문장 우선, 토큰 예산 안에서 원문 순서 유지
+            if analysis_mode == "summary" and prerank.get(r_type):
+                text_to_analyze = core.prerank_text(
+                    text_to_analyze, target_ticker, prerank[r_type].get('max_tokens', 30000), prerank[r_type].get('keywords'))
+
+            # 재무 하이라이트는 SEC XBRL 숫자로 직접 계산 (Gemini는 표 대신 해설만 작성 -> 프롬프트 축소, N/A 방지)
+            highlights = None
+            if r_type in ("10-K", "10-Q"):
+                highlights = core.get_financial_highlights(cik, target_ticker, r_type, filing_url)
+
             # 5. Gemini 분석
             print("[INFO] Gemini 분석 시작...")
-            report_markdown = core.analyze_with_gemini(
-                text_to_analyze, 
-                target_ticker, 
-                filing_date, 
-                mode="summary"
-            )
-
-            if not report_markdown:
-                print("[WARNING] 분석 보고서 생성 실패")
-                continue
+            highlights_md = core.xbrl_facts.to_markdown(highlights) if highlights is not None else None
+            structured = None
+            if analysis_mode == "summary" and output_format == "json":
+                structured = core.analyze_structured(text_to_analyze, target_ticker, filing_date, highlights=highlights_md, form_type=r_type)
+                if structured is None:
+                    print("[WARNING] JSON 분석 실패 -> 마크다운 모드로 재시도")
+
+            if structured is not None:
+                # 분석 원본(JSON) 보관 -> 재프롬프트 없이 다른 형식으로 다시 렌더링 가능 (core.render_saved_report)
+                core.save_report_json(target_ticker, structured)
+                # 섹션별 HTML (각 섹션이 <h2>로 시작) -> 아래에서 섹션 사이에 이미지 삽입
+                body_sections = [""] + core.structured_report.to_html_sections(structured)
+            else:
+                report_markdown = core.analyze_with_gemini(
+                    text_to_analyze, 
+                    target_ticker, 
+                    filing_date, 
+                    mode=analysis_mode,
+                    highlights=highlights_md,
+                    form_type=r_type  # 공시 종류/분량에 따라 모델 선택 (bot_config.json "models")
+                )
+
+                if not report_markdown:
+                    print("[WARNING] 분석 보고서 생성 실패")
+                    failed_tickers.append(target_ticker)
+                    continue
 
-            try:
-                html_body = markdown.markdown(report_markdown)
-            except ImportError:
-                html_body = f"<pre>{report_markdown}</pre>"
+                try:
+                    html_body = markdown.markdown(report_markdown)
+                except ImportError:
+                    html_body = f"<pre>{report_markdown}</pre>"
+
+                # HTML을 <h2>(섹션) 기준으로 쪼갬 (첫 덩어리는 보통 개요)
+                parts = html_body.split("<h2>")
+                body_sections = [parts[0]] + [f"<h2>{part}" for part in parts[1:]]
             
             # --- [FEATURED IMAGE] 대표 이미지 생성 ---
             # 태그 정보(tag_str)를 활용 (예: [S&P500])
@@ -281,13 +386,12 @@ def run_stock_job(limit=None):
             print(f"[INFO] 총 {len(additional_images)}개의 추가 이미지가 준비되었습니다.")
 
             # (C) 본문에 이미지 골고루 섞기
-            # HTML을 <h2>(섹션) 기준으로 쪼개서 그 사이에 이미지를 하나씩 집어넣음
+            # 섹션(<h2>) 사이에 이미지를 하나씩 집어넣음
             
-            sections = html_body.split("<h2>")
-            new_html_body = sections[0] # 첫 번째 덩어리 (보통 개요)
+            new_html_body = body_sections[0] # 첫 번째 덩어리 (보통 개요)
             
             img_idx = 0
-            for i, section in enumerate(sections[1:]):
+            for i, section in enumerate(body_sections[1:]):
                 # 이미지 태그 준비
                 img_tag = ""
                 if img_idx < len(additional_images):
@@ -299,8 +403,7 @@ def run_stock_job(limit=None):
                     """
                     img_idx += 1
                 
-                # 섹션 다시 붙이기 (<h2> 복구)
-                new_html_body += f"{img_tag}<h2>{section}"
+                new_html_body += f"{img_tag}{section}"
             
             # 남은 이미지가 있다면 맨 아래에 갤러리처럼 추가
             if img_idx < len(additional_images):
@@ -381,25 +484,42 @@ def run_stock_job(limit=None):
             </style>
             """
 
+            # (D) 재무 하이라이트 표 (SEC XBRL)
+            highlights_html = ""
+            if highlights is not None:
+                highlights_html = f"""
+                <h2>Financial Highlights</h2>
+                {core.xbrl_facts.to_html(highlights)}
+                <div style='font-size:0.8em; color:#999; margin-top:10px;'>출처: SEC XBRL 재무 데이터 (companyfacts)</div>
+                """
+
             # --- [광고 주입: Native Ad] ---
             # utils/ads.py 에서 가져옴
             from utils.ads import get_course_ad_html
             ad_block = get_course_ad_html(target_ticker)
 
+            if analysis_mode == "diff":
+                intro_text = f"직전 {r_type}({prev_date}) 대비 달라진 내용을 AI(Gemini)가 정리했습니다."
+            else:
+                intro_text = "AI(Gemini)가 분석한 공시 요약입니다."
+
             final_content = f"""
             {font_style}
             <div class="sec-report-content">
                 <h3>{target_ticker} {r_type} 분석 보고서 ({filing_date})</h3>
                 {chart_html}
-                <p>AI(Gemini)가 분석한 공시 요약입니다.</p>
+                <p>{intro_text}</p>
                 <p><strong>{tag_str}</strong>에 해당하는 기업입니다.</p>
                 <hr>
+                {highlights_html}
                 {new_html_body}
                 {ad_block}
             </div>
             """ 
 
             title = f"{tag_str} [SEC] {target_ticker} {r_type} 리포트 ({filing_date})"
+            if analysis_mode == "diff":
+                title += " - 직전 공시 대비 변경점" # 중복 검사 문자열(check_title_part)은 그대로 포함
             
             # 카테고리 설정 (stock)
             cat_id = wp_utils.ensure_category("stock")
@@ -416,15 +536,36 @@ def run_stock_job(limit=None):
                     json.dump(history, f, indent=4, ensure_ascii=False)
             else:
                 print(f"[FAILURE] [{target_ticker} {r_type}] 발행 실패.")
+                failed_tickers.append(target_ticker)
                 # 히스토리 업데이트 (실패 시에도 기록)
                 history[unique_key] = False # 또는 다른 실패 상태를 나타내는 값
                 with open(history_file, 'w', encoding='utf-8') as f:
                     json.dump(history, f, indent=4, ensure_ascii=False)
 
+    # 이번 사이클에서 대상 종목을 모두 처리했으면 워터마크 전진 (중간에 크래시하면 다음 사이클에 재시도)
+    # 실패한 종목이 있으면 유지 -> 다음 사이클에 같은 공시를 다시 감지 (이미 발행된 글은 WP 중복 검사로 스킵)
+    if new_watermark and failed_tickers:
+        print(f"[WARNING] 실패 종목 {len(failed_tickers)}개 ({', '.join(dict.fromkeys(failed_tickers))}) -> 워터마크 유지, 다음 사이클에 재시도")
+        new_watermark = None
+    if new_watermark:
+        core.daily_index.save_watermark(new_watermark)
+        print(f"[INFO] 일일 인덱스 워터마크 갱신: {new_watermark}")
+
 
 
 
 
+def run_submissions_ingest():
+    """
+    야간 잡: SEC 벌크 submissions.zip에서 유니버스 종목의 공시 목록을 로컬 DB로 적재
+    (batch_processor 등 대량 조회 시 종목별 submissions 요청 없이 로컬에서 답함)
+    """
+    config = load_config()
+    tickers = config.get('stock', {}).get('tickers', [])
+    items = expand_tickers(tickers)
+    core.ticker_index.ensure_index(core.SEC_HEADERS, ttl_hours=config.get('stock', {}).get('cik_index_ttl_hours', 24))
+    return core.ingest_bulk_submissions([item['symbol'] for item in items])
+
 import argparse
 import time
 
@@ -432,8 +573,16 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Stock Bot')
     parser.add_argument('--loop', action='store_true', help='Run in infinite loop')
     parser.add_argument('--limit', type=int, default=None, help='Limit number of tickers to process')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the Gemini response cache')
+    parser.add_argument('--ingest-submissions', action='store_true', help='Load bulk submissions.zip into the local filings DB and exit')
     
     args = parser.parse_args()
+    if args.no_cache:
+        from utils import gemini_cache
+        gemini_cache.set_bypass(True)
+    if args.ingest_submissions:
+        run_submissions_ingest()
+        raise SystemExit(0)
     
     mode = "loop" if args.loop else "once"
     print(f"[SYSTEM] Stock Bot Starting (Mode: {mode}, Limit: {args.limit})")
@@ -441,7 +590,7 @@ if __name__ == "__main__":
     if mode == "loop":
         while True:
             try:
-                run_stock_job(limit=args.limit)
+                run_stock_job(limit=args.limit, changed_only=True)
                 print("[SYSTEM] Cycle finished. Sleeping for 1 hour...")
                 update_status("idle", "[WAIT] 다음 사이클 대기 중 (1시간)", 1.0)
                 time.sleep(3600) 
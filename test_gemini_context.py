@@ -0,0 +1,194 @@
+import unittest
+import tempfile
+import asyncio
+import os
+from utils import gemini_cache
+from utils import gemini_context
+from utils import gemini_limiter
+from utils import model_router
+from sec_module import core
+
+# Offline tests of the Gemini cached-context lifecycle: the cached-content API, the cached
+# model and the uncached fallback are local stand-ins (no API key, no network).
+MODEL = "test-context-model"
+LONG_TEXT = "Revenue increased due to higher sales of services. " * 2000 # ~25k tokens
+SHORT_TEXT = "Item 1. Business."
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+class FakeCachedModel:
+    model_name = f"models/{MODEL}"
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    async def generate_content_async(self, contents):
+        self.calls.append(contents)
+        if self.fail:
+            raise RuntimeError("404 CachedContent not found")
+        return FakeResponse("cached answer")
+
+class FakeClient:
+    def __init__(self, fail_create=False, fail_calls=False):
+        self.fail_create = fail_create
+        self.model_instance = FakeCachedModel(fail_calls)
+        self.created = []
+        self.deleted = []
+
+    def create(self, model_name, system_instruction, contents, ttl_sec, display_name=None):
+        if self.fail_create:
+            raise RuntimeError("400 model does not support caching")
+        cache = {"model": model_name, "system_instruction": system_instruction, "contents": contents}
+        self.created.append(cache)
+        return cache
+
+    def model(self, cache):
+        return self.model_instance
+
+    def delete(self, cache):
+        self.deleted.append(cache)
+
+class FakeFallback:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, contents, notify, prompt_version, use_cache):
+        self.calls.append(contents)
+        return "uncached answer"
+
+class FilingContextTest(unittest.TestCase):
+
+    def setUp(self):
+        self._db = gemini_cache.CACHE_DB
+        self._tmp = tempfile.TemporaryDirectory()
+        gemini_cache.CACHE_DB = os.path.join(self._tmp.name, "gemini_cache.db")
+        self.limiter = gemini_limiter.configure_model(MODEL, rpm=1000, tpm=10 ** 7)
+        self.fallback = FakeFallback()
+
+    def tearDown(self):
+        gemini_cache.CACHE_DB = self._db
+        self._tmp.cleanup()
+
+    def ask(self, client, text):
+        context = gemini_context.FilingContext(MODEL, "Answer about the report.", text, display_name="TEST",
+                                               client=client, fallback=self.fallback)
+
+        async def run():
+            async with context:
+                active = context.active
+                answer = await context.generate_async(["List the key takeaways."], use_cache=False)
+            return active, answer
+
+        return (context,) + asyncio.run(run())
+
+    def test_create_then_delete(self):
+        client = FakeClient()
+        context, active, answer = self.ask(client, LONG_TEXT)
+        self.assertTrue(active)
+        self.assertEqual(answer, "cached answer")
+        self.assertEqual(len(client.created), 1)
+        self.assertEqual(client.created[0]["contents"], [LONG_TEXT])
+        self.assertEqual(client.deleted, client.created)
+        self.assertEqual(client.model_instance.calls, [["List the key takeaways."]]) # Only the request is sent
+        self.assertEqual(self.fallback.calls, [])
+        # The whole context is billed on every call: the limiter reserved it, not just the request
+        self.assertGreaterEqual(sum(tokens for _, tokens in self.limiter._events), context.tokens)
+        self.assertFalse(context.active)
+
+    def test_below_min_tokens_is_not_cached(self):
+        client = FakeClient()
+        context, active, answer = self.ask(client, SHORT_TEXT)
+        self.assertFalse(active)
+        self.assertEqual(answer, "uncached answer")
+        self.assertEqual(client.created, [])
+        self.assertEqual(client.deleted, [])
+        self.assertEqual(self.fallback.calls, [["List the key takeaways."]])
+
+    def test_create_failure_falls_back(self):
+        client = FakeClient(fail_create=True)
+        context, active, answer = self.ask(client, LONG_TEXT)
+        self.assertFalse(active)
+        self.assertEqual(answer, "uncached answer")
+        self.assertEqual(client.deleted, [])
+        self.assertEqual(len(self.fallback.calls), 1)
+
+    def test_cached_call_failure_falls_back(self):
+        client = FakeClient(fail_calls=True)
+        context, active, answer = self.ask(client, LONG_TEXT)
+        self.assertTrue(active)
+        self.assertEqual(answer, "uncached answer")
+        self.assertEqual(len(client.model_instance.calls), 1)
+        self.assertEqual(self.fallback.calls, [["List the key takeaways."]])
+        self.assertEqual(client.deleted, client.created) # Still deleted on exit
+
+class FakeRoutedModel:
+    model_name = f"models/{MODEL}"
+
+    def __init__(self):
+        self.calls = []
+
+    async def generate_content_async(self, contents):
+        self.calls.append(contents)
+        return FakeResponse(f"translated {len(self.calls)}")
+
+class FullModeMapTest(unittest.TestCase):
+    """
+    Full-mode translation with GEMINI_CONTEXT_CACHE: the instructions are cached, the map calls
+    send only their part header and chunk, and the number of calls does not change.
+    """
+    CHUNKS = ["Item 1. Business. " * 50, "Item 7. Results of operations. " * 50, "Item 8. Dividends. " * 50]
+
+    def setUp(self):
+        self._db = gemini_cache.CACHE_DB
+        self._min_tokens = gemini_context.MIN_TOKENS
+        self._cache_model = gemini_context.CACHE_MODEL
+        self._get_model = model_router.get_model
+        self._tmp = tempfile.TemporaryDirectory()
+        gemini_cache.CACHE_DB = os.path.join(self._tmp.name, "gemini_cache.db")
+        gemini_context.CACHE_MODEL = MODEL
+        gemini_limiter.configure_model(MODEL, rpm=1000, tpm=10 ** 7)
+        self.routed = FakeRoutedModel()
+        model_router.get_model = lambda name, generation_config=None: self.routed
+
+    def tearDown(self):
+        gemini_cache.CACHE_DB = self._db
+        gemini_context.MIN_TOKENS = self._min_tokens
+        gemini_context.CACHE_MODEL = self._cache_model
+        model_router.get_model = self._get_model
+        self._tmp.cleanup()
+
+    def translate(self, client):
+        return asyncio.run(core.analyze_with_gemini_async(
+            list(self.CHUNKS), "TEST", "2024-11-01", mode="full", use_cache=False, context_cache=True, context_client=client))
+
+    def test_map_calls_reference_cached_instructions(self):
+        gemini_context.MIN_TOKENS = 1
+        client = FakeClient()
+        report = self.translate(client)
+        self.assertEqual(len(client.created), 1)
+        self.assertEqual(client.created[0]["system_instruction"], core.build_translation_instruction())
+        self.assertIsNone(client.created[0]["contents"]) # Only the instructions, never the filing
+        self.assertEqual(client.deleted, client.created)
+        calls = client.model_instance.calls
+        self.assertEqual(len(calls), len(self.CHUNKS)) # One call per chunk, nothing added
+        for header, chunk in calls:
+            self.assertNotIn("Instructions", header)
+            self.assertIn(chunk, self.CHUNKS)
+        self.assertEqual(self.routed.calls, [])
+        self.assertEqual(report.count("cached answer"), len(self.CHUNKS))
+
+    def test_below_min_tokens_sends_usual_prompts(self):
+        client = FakeClient()
+        self.translate(client)
+        self.assertEqual(client.created, [])
+        self.assertEqual(len(self.routed.calls), len(self.CHUNKS))
+        for prompt, chunk in self.routed.calls: # Chunks run concurrently, in any order
+            part = self.CHUNKS.index(chunk) + 1
+            self.assertEqual(prompt, core.build_chunk_prompt("full", part, len(self.CHUNKS), "TEST", "2024-11-01"))
+
+if __name__ == "__main__":
+    unittest.main()
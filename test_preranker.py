@@ -0,0 +1,52 @@
+import unittest
+from sec_module import chunker
+from sec_module import preranker
+import bench_prerank
+
+# Offline tests of the prerank selection: never empty, never over the token budget
+LONG_SENTENCE = "Revenue dividend repurchase guidance outlook margin " * 200 + "all in one sentence. "
+SENTENCES = [
+    "The company expects revenue growth in the services segment next year.",
+    "Net income margin improved due to lower component costs this year.",
+    "Litigation risk remains a factor for our operating income in Europe.",
+]
+
+class SelectTest(unittest.TestCase):
+
+    def check_budget(self, text, max_tokens):
+        selected, stats = preranker.select(text, max_tokens)
+        self.assertTrue(selected.strip())
+        self.assertLessEqual(chunker.estimate_tokens(selected), max_tokens)
+        return selected, stats
+
+    def test_under_budget_is_unchanged(self):
+        text = " ".join(SENTENCES)
+        self.assertEqual(preranker.select(text, 1000)[0], text)
+
+    def test_nothing_fits_returns_truncated_text(self):
+        selected, stats = self.check_budget("Short. " * 10, 1)
+        self.assertEqual(selected, "Sho")
+        self.assertEqual(stats['kept'], 0)
+
+    def test_oversized_best_sentence_is_skipped(self):
+        # The top-scoring sentence alone is over the budget: the next ones are still picked
+        selected, stats = self.check_budget(LONG_SENTENCE + " ".join(SENTENCES), 60)
+        self.assertNotIn("all in one sentence", selected)
+        for sentence in SENTENCES:
+            self.assertIn(sentence, selected)
+
+    def test_gap_markers_count_in_budget(self):
+        text = bench_prerank.make_synthetic_text(1)
+        for max_tokens in (50, 500, 5000):
+            selected, stats = self.check_budget(text, max_tokens)
+            self.assertGreater(stats['kept'], 0)
+        self.assertIn(preranker.GAP_MARKER, selected)
+
+    def test_repeated_boilerplate_kept_once(self):
+        boilerplate = "Forward-looking statements involve risks and uncertainties about revenue and margin. "
+        text = (boilerplate + " ".join(SENTENCES) + " ") * 20
+        selected, stats = self.check_budget(text, 100)
+        self.assertEqual(selected.count("Forward-looking statements"), 1)
+
+if __name__ == "__main__":
+    unittest.main()
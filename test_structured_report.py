@@ -0,0 +1,76 @@
+import unittest
+import tempfile
+import os
+from docx import Document
+from sec_module import core
+from sec_module import structured_report
+
+# Offline tests of re-rendering a saved structured analysis (reports/<ticker>.json) and of
+# the Word report's analysis section (no Gemini, no network)
+TICKER = "TEST"
+REPORT = structured_report.normalize({
+    "summary": ["Revenue grew 2%.", "Services hit a record.", "Buybacks continued."],
+    "business": "Designs and sells smartphones and services.",
+    "financials": {
+        "commentary": "Margins improved on services mix.",
+        "table": [{"metric": "Revenue", "current": "$391.0B", "previous": "$383.3B", "change": "+2.0%"}],
+    },
+    "shareholder_returns": {"dividends": "$15.2B paid", "buybacks": "$94.9B repurchased"},
+    "guidance": {"summary": "", "changes": []},
+    "risks": [{"title": "Tariffs", "detail": "New tariffs may raise costs."}],
+})
+
+def docx_text(path):
+    doc = Document(path)
+    return [(p.style.name, p.text) for p in doc.paragraphs], doc.tables
+
+class SavedReportTest(unittest.TestCase):
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name) # reports/ is relative to the working directory
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def test_render_saved_report(self):
+        core.save_report_json(TICKER, REPORT)
+        self.assertEqual(core.load_report_json(TICKER), REPORT)
+
+        md_path, docx_path = core.render_saved_report(TICKER)
+        self.assertEqual(md_path, f"reports/{TICKER}.structured.md")
+        self.assertFalse(os.path.exists(f"reports/{TICKER}.docx")) # batch_processor would skip the ticker
+        with open(md_path, encoding="utf-8") as f:
+            self.assertIn(structured_report.to_markdown(REPORT), f.read())
+
+        paragraphs, tables = docx_text(docx_path)
+        self.assertIn(("Heading 2", "Financial Highlights"), paragraphs)
+        self.assertNotIn(("Heading 2", "Guidance (Before vs After)"), paragraphs) # Empty section
+        self.assertIn(("List Bullet", "Tariffs: New tariffs may raise costs."), paragraphs)
+        self.assertEqual(tables[0].rows[1].cells[1].text, "$391.0B")
+
+    def test_nothing_saved(self):
+        self.assertIsNone(core.render_saved_report(TICKER))
+
+    def test_save_to_word_structured(self):
+        path = core.save_to_word(TICKER, REPORT, "2024-11-01", None, None, None)
+        paragraphs, tables = docx_text(path)
+        self.assertIn(("Heading 2", "3-Line Summary"), paragraphs)
+        self.assertEqual(tables[0].rows[0].cells[0].text, "Metric")
+
+    def test_save_to_word_markdown(self):
+        markdown = "## Business\nWe sell **phones** and services.\n- **Risk:** tariffs\n### Outlook\nStable."
+        path = core.save_to_word(TICKER, markdown, "2024-11-01", None, None, None)
+        doc = Document(path)
+        paragraphs = [(p.style.name, p.text) for p in doc.paragraphs]
+        self.assertIn(("Heading 2", "Business"), paragraphs)
+        self.assertIn(("Heading 3", "Outlook"), paragraphs)
+        self.assertIn(("List Bullet", "Risk: tariffs"), paragraphs)
+        self.assertFalse(any("**" in text or "#" in text for _, text in paragraphs))
+        bold = [r.text for p in doc.paragraphs for r in p.runs if r.bold]
+        self.assertIn("phones", bold)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from sec_module import xbrl_facts
+
+# Offline tests of the XBRL Financial Highlights table (companyfacts shape, no network)
+OLD_ACCN = "0000320193-18-000145"
+NEW_ACCN = "0000320193-24-000123"
+
+def fact(start, end, val, accn, filed, form="10-K"):
+    return {"start": start, "end": end, "val": val, "accn": accn, "filed": filed, "form": form}
+
+def company_facts():
+    # Revenue was tagged "Revenues" until 2017, then RevenueFromContractWithCustomer...
+    return {
+        "Revenues": {"USD": [
+            fact("2015-09-27", "2016-09-24", 215_639, OLD_ACCN, "2018-11-05"),
+            fact("2016-09-25", "2017-09-30", 229_234, OLD_ACCN, "2018-11-05"),
+        ]},
+        "RevenueFromContractWithCustomerExcludingAssessedTax": {"USD": [
+            fact("2022-09-25", "2023-09-30", 383_285, NEW_ACCN, "2024-11-01"),
+            fact("2023-10-01", "2024-09-28", 391_035, NEW_ACCN, "2024-11-01"),
+        ]},
+        "NetIncomeLoss": {"USD": [
+            fact("2022-09-25", "2023-09-30", 96_995, NEW_ACCN, "2024-11-01"),
+            fact("2023-10-01", "2024-09-28", 93_736, NEW_ACCN, "2024-11-01"),
+        ]},
+        "OperatingIncomeLoss": {"USD": [
+            # Only an old value: must not be shown as "Current" next to 2024 numbers
+            fact("2016-09-25", "2017-09-30", 61_344, OLD_ACCN, "2018-11-05"),
+        ]},
+    }
+
+class BuildHighlightsTest(unittest.TestCase):
+
+    def check(self, table):
+        self.assertEqual(table.attrs['current_period'], "FY ended 2024-09-28")
+        self.assertEqual(table.attrs['previous_period'], "FY ended 2023-09-30")
+        self.assertEqual(table.loc["Revenue", "Current"], 391_035)
+        self.assertEqual(table.loc["Revenue", "Previous"], 383_285)
+        self.assertEqual(table.loc["Net Income", "Current"], 93_736)
+        self.assertNotIn("Operating Income", table.index)
+
+    def test_switched_concept_with_accession(self):
+        self.check(xbrl_facts.build_highlights(company_facts(), "10-K", NEW_ACCN))
+
+    def test_switched_concept_latest_filing(self):
+        self.check(xbrl_facts.build_highlights(company_facts(), "10-K"))
+
+    def test_no_facts(self):
+        self.assertIsNone(xbrl_facts.build_highlights({}, "10-K"))
+
+if __name__ == "__main__":
+    unittest.main()
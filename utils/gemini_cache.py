@@ -0,0 +1,138 @@
+import sqlite3
+import threading
+import hashlib
+import time
+import os
+
+# --- Configuration ---
+CACHE_DB = os.getenv("GEMINI_CACHE_DB", os.path.join("sec_cache", "gemini_cache.db"))
+MAX_CACHE_BYTES = int(os.getenv("GEMINI_CACHE_MAX_MB", "200")) * 1024 * 1024
+# GEMINI_CACHE_BYPASS=1 (or set_bypass(True) / --no-cache): always call the API, but still store fresh answers
+_bypass = os.getenv("GEMINI_CACHE_BYPASS", "") == "1"
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+def set_bypass(enabled=True):
+    global _bypass
+    _bypass = enabled
+
+def _connect():
+    os.makedirs(os.path.dirname(CACHE_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB, timeout=30)
+    conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER,
+        created REAL, last_used REAL)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON responses (last_used)")
+    conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+    return conn
+
+def _model_name(model):
+    return getattr(model, 'model_name', None) or str(model)
+
+def make_key(model_name, prompt_version, contents):
+    """
+    sha256 over model name, prompt template version and every input part.
+    """
+    if isinstance(contents, str):
+        contents = [contents]
+    h = hashlib.sha256()
+    for part in [model_name, prompt_version] + list(contents):
+        data = str(part).encode('utf-8')
+        h.update(len(data).to_bytes(8, 'big')) # Length prefix: ('ab','c') != ('a','bc')
+        h.update(data)
+    return h.hexdigest()
+
+def get(key):
+    with _lock:
+        conn = _connect()
+        try:
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+def put(key, model_name, response):
+    size = len(response.encode('utf-8'))
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                         (key, model_name, response, size, now, now))
+            conn.commit()
+            _evict(conn)
+        finally:
+            conn.close()
+
+def _evict(conn, max_bytes=MAX_CACHE_BYTES):
+    """
+    Drop least-recently-used responses until the cache fits in max_bytes.
+    """
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= max_bytes:
+        return
+    for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+        if total <= max_bytes:
+            break
+        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        total -= size
+    conn.commit()
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+        conn = _connect()
+        try:
+            conn.execute("INSERT INTO counters VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+            conn.commit()
+        finally:
+            conn.close()
+
+def lookup(model, contents, prompt_version, use_cache=True):
+    """
+    Cached answer for these inputs, or None (counted as a miss: the caller will pay for a call).
+    """
+    return lookup_any([model], contents, prompt_version, use_cache)
+
+def lookup_any(models, contents, prompt_version, use_cache=True):
+    """
+    lookup() for a routed call: an answer from any of the candidate models is reused
+    (one hit or miss is counted, whatever the number of models).
+    """
+    if use_cache and not _bypass:
+        for model in models:
+            cached = get(make_key(_model_name(model), prompt_version, contents))
+            if cached is not None:
+                _count("hits")
+                return cached
+    _count("misses")
+    return None
+
+def store(model, contents, prompt_version, text, use_cache=True):
+    if use_cache and text is not None:
+        model_name = _model_name(model)
+        put(make_key(model_name, prompt_version, contents), model_name, text)
+
+def stats():
+    """
+    Hit/miss counters: this process ('session_*') and all processes since the cache was created.
+    """
+    result = {"session_hits": _stats["hits"], "session_misses": _stats["misses"],
+              "hits": 0, "misses": 0, "entries": 0, "bytes": 0}
+    try:
+        conn = _connect()
+        try:
+            for name, value in conn.execute("SELECT name, value FROM counters"):
+                result[name] = value
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            result["entries"] = entries
+            result["bytes"] = size
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"[GeminiCache] Stats unavailable: {e}")
+    return result
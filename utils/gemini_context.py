@@ -0,0 +1,152 @@
+import google.generativeai as genai
+import datetime
+import asyncio
+import hashlib
+import os
+from utils import gemini_cache
+from utils import gemini_limiter
+from utils import model_router
+
+# --- Configuration ---
+# Gemini context caching: the system instruction every call of a job repeats (and optionally a
+# text they all need) is uploaded once; each call references it by name and sends only its own
+# contents. The cached tokens are still billed on every call, at a discount (see the Gemini
+# pricing page), plus storage per hour, so cache only what every call would send anyway.
+# A context below the model's minimum is not cached and calls go out as usual. Off unless enabled.
+ENABLED = os.getenv("GEMINI_CONTEXT_CACHE", "") == "1"
+CACHE_MODEL = os.getenv("GEMINI_CONTEXT_CACHE_MODEL", "") # Default: the model routed for the job
+TTL_SEC = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SEC", "3600")) # Safety net: close() deletes it sooner
+MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096")) # API minimum (model dependent)
+
+class GenaiCacheClient:
+    """
+    The cached-content API of google.generativeai. FilingContext only needs these three calls,
+    so a local stand-in with the same methods can replace it (no network in tests).
+    """
+
+    def create(self, model_name, system_instruction, contents, ttl_sec, display_name=None):
+        return genai.caching.CachedContent.create(
+            model=model_name, display_name=display_name, system_instruction=system_instruction,
+            contents=contents, ttl=datetime.timedelta(seconds=ttl_sec))
+
+    def model(self, cache):
+        # Bound to the cache's model; generate_content() then sends only the new contents
+        return genai.GenerativeModel.from_cached_content(cached_content=cache)
+
+    def delete(self, cache):
+        cache.delete()
+
+class FilingContext:
+    """
+    One cached context (system instruction + optional text) for the lifetime of a job:
+
+        async with FilingContext(model_name, instruction) as context:
+            answer = await context.generate_async([part_header, chunk])
+
+    active is False when the context is below MIN_TOKENS or the upload failed. generate_async()
+    then sends the instruction (and text) with every call (fallback), as it does when a
+    cached call fails. The cache is deleted on exit (TTL_SEC covers crashes).
+    fallback: async (contents, notify, prompt_version, use_cache) -> text for uncached calls
+              (default: the model routed for bot/task/form, see utils/model_router.py).
+    """
+
+    def __init__(self, model_name, system_instruction, text="", display_name=None, client=None, ttl_sec=TTL_SEC,
+                 fallback=None, bot="stock", task="map", form=None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.text = text
+        self.display_name = display_name
+        self.client = client or GenaiCacheClient()
+        self.ttl_sec = ttl_sec
+        self.fallback = fallback or self._uncached_async
+        self.bot = bot
+        self.task = task
+        self.form = form
+        self.tokens = gemini_limiter.estimate_tokens([system_instruction, text])
+        self.cache = None
+        self.model = None
+        self.digest = hashlib.sha256(f"{model_name}\0{system_instruction}\0{text}".encode('utf-8')).hexdigest()
+        self.stats = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+    @property
+    def active(self):
+        return self.model is not None
+
+    def open(self):
+        """
+        Upload the context. Returns True when calls can reference it.
+        """
+        tokens = self.tokens
+        if tokens < MIN_TOKENS:
+            print(f"[ContextCache] {self.display_name}: ~{tokens:,} tokens, below the {MIN_TOKENS:,} token minimum. Not cached.")
+            return False
+        try:
+            contents = [self.text] if self.text else None
+            self.cache = self.client.create(self.model_name, self.system_instruction, contents, self.ttl_sec, self.display_name)
+            self.model = self.client.model(self.cache)
+        except Exception as e:
+            print(f"[ContextCache] {self.display_name}: could not create cache on {self.model_name}: {e}")
+            self.close()
+            return False
+        print(f"[ContextCache] {self.display_name}: cached ~{tokens:,} tokens on {self.model_name} (TTL {self.ttl_sec}s)")
+        return True
+
+    def close(self):
+        """
+        Delete the cache (idempotent) and log what the calls read from it.
+        """
+        cache, self.cache, self.model = self.cache, None, None
+        if cache is None:
+            return
+        try:
+            self.client.delete(cache)
+        except Exception as e:
+            print(f"[ContextCache] {self.display_name}: delete failed (expires with its TTL): {e}")
+        s = self.stats
+        print(f"[ContextCache] {self.display_name}: {s['calls']} calls, {s['prompt_tokens']:,} prompt tokens "
+              f"({s['cached_tokens']:,} read from the cache). Cache deleted.")
+
+    async def __aenter__(self):
+        await asyncio.to_thread(self.open)
+        return self
+
+    async def __aexit__(self, *exc):
+        await asyncio.to_thread(self.close)
+
+    def _record(self, response):
+        usage = getattr(response, 'usage_metadata', None)
+        self.stats["calls"] += 1
+        if usage is not None:
+            self.stats["prompt_tokens"] += getattr(usage, 'prompt_token_count', 0) or 0
+            self.stats["cached_tokens"] += getattr(usage, 'cached_content_token_count', 0) or 0
+
+    async def _uncached_async(self, contents, notify, prompt_version, use_cache):
+        context = [self.system_instruction, self.text] if self.text else [self.system_instruction]
+        return await model_router.generate_async(
+            context + contents, self.bot, self.task, self.form, prompt_version, use_cache, notify)
+
+    async def generate_async(self, contents, notify=None, prompt_version="", use_cache=True):
+        """
+        Answer contents against the context: through the cache when it is active (the limiter
+        reserves the context tokens too, they are billed on every call), else, or when the
+        cached call fails with anything but a 429, by sending the instruction (and text) itself.
+        Cached answers go to the response cache keyed on the context digest.
+        """
+        if isinstance(contents, str):
+            contents = [contents]
+        contents = list(contents)
+        if self.active:
+            key_contents = [f"context:{self.digest}"] + contents
+            cached = await asyncio.to_thread(gemini_cache.lookup, self.model_name, key_contents, prompt_version, use_cache)
+            if cached is not None:
+                return cached
+            try:
+                response = await gemini_limiter.generate_content_async(self.model, contents, notify=notify, extra_tokens=self.tokens)
+                self._record(response)
+                await asyncio.to_thread(gemini_cache.store, self.model_name, key_contents, prompt_version, response.text, use_cache)
+                return response.text
+            except Exception as e:
+                if gemini_limiter.is_rate_limit_error(e):
+                    raise
+                print(f"[ContextCache] {self.display_name}: cached call failed, sending the text instead: {e}")
+        return await self.fallback(contents, notify, prompt_version, use_cache)
@@ -0,0 +1,238 @@
+from collections import deque
+import threading
+import asyncio
+import time
+import os
+import re
+
+# --- Configuration ---
+# Budgets of the API key's Gemini quota (see AI Studio > Rate limits). One limiter is
+# shared by every Gemini caller in the process (stock, grant, marketing, batch).
+# Quotas are per model: models with their own budget (configure_model(), set by
+# utils/model_router.py from bot_config.json "models") get their own limiter.
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "10"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "250000"))
+WINDOW_SEC = 60.0
+CHARS_PER_TOKEN = 4.0
+MAX_RETRIES = 5
+
+_RETRY_HINTS = [
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE), # "Please retry in 17.3s."
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE), # RetryInfo detail
+]
+
+class RateLimiter:
+    """
+    Sliding-window limiter for requests/minute and tokens/minute.
+    acquire() returns as soon as both budgets allow the request (no fixed sleeps);
+    block_for() pauses every caller after the server says we are over quota.
+    """
+
+    def __init__(self, rpm=GEMINI_RPM, tpm=GEMINI_TPM, window=WINDOW_SEC):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._events = deque() # [timestamp, tokens] of requests inside the window
+        self._used_tokens = 0
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+
+    def _prune(self, now):
+        while self._events and self._events[0][0] <= now - self.window:
+            self._used_tokens -= self._events.popleft()[1]
+
+    def _wait_time(self, tokens, now):
+        wait = self._blocked_until - now
+        if len(self._events) >= self.rpm:
+            wait = max(wait, self._events[len(self._events) - self.rpm][0] + self.window - now)
+        excess = self._used_tokens + tokens - self.tpm
+        if excess > 0:
+            for ts, used in self._events:
+                excess -= used
+                if excess <= 0:
+                    wait = max(wait, ts + self.window - now)
+                    break
+        return wait
+
+    def _try_acquire(self, tokens):
+        """
+        Reserve budget if it is available now. Caller holds the lock. Returns (entry, wait).
+        """
+        now = time.time()
+        self._prune(now)
+        wait = self._wait_time(tokens, now)
+        if wait > 0:
+            return None, wait
+        entry = [now, tokens]
+        self._events.append(entry)
+        self._used_tokens += tokens
+        return entry, 0
+
+    def acquire(self, tokens):
+        """
+        Block until a request of ~tokens fits in both budgets. Returns a handle for record_usage().
+        """
+        tokens = min(int(tokens), self.tpm) # A single oversized request must still be able to run
+        with self._cond:
+            while True:
+                entry, wait = self._try_acquire(tokens)
+                if entry:
+                    return entry
+                self._cond.wait(wait)
+
+    async def acquire_async(self, tokens):
+        """
+        acquire() for coroutines: waits with asyncio.sleep so the event loop keeps running.
+        """
+        tokens = min(int(tokens), self.tpm)
+        while True:
+            with self._cond:
+                entry, wait = self._try_acquire(tokens)
+            if entry:
+                return entry
+            await asyncio.sleep(min(wait, 1.0)) # Re-check: record_usage() may free budget early
+
+    def record_usage(self, entry, actual_tokens):
+        """
+        Replace the estimate with the real token count reported by the API.
+        """
+        with self._cond:
+            if any(e is entry for e in self._events):
+                self._used_tokens += actual_tokens - entry[1]
+            entry[1] = actual_tokens
+            self._cond.notify_all()
+
+    def wait_estimate(self, tokens):
+        """
+        Seconds until a request of ~tokens would be admitted (0 = now). Reserves nothing.
+        """
+        tokens = min(int(tokens), self.tpm)
+        with self._cond:
+            now = time.time()
+            self._prune(now)
+            return max(0.0, self._wait_time(tokens, now))
+
+    def block_for(self, seconds):
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.time() + seconds)
+            self._cond.notify_all()
+
+limiter = RateLimiter()
+_model_limiters = {}
+_model_limiters_lock = threading.Lock()
+
+def model_name(model):
+    """
+    'gemini-flash-latest' for a GenerativeModel (whose model_name is 'models/gemini-flash-latest') or a name.
+    """
+    name = getattr(model, 'model_name', None) or str(model)
+    return name[len("models/"):] if name.startswith("models/") else name
+
+def configure_model(name, rpm=GEMINI_RPM, tpm=GEMINI_TPM):
+    """
+    Give model `name` its own budget. Models never configured share `limiter`.
+    """
+    with _model_limiters_lock:
+        current = _model_limiters.get(name)
+        if current is None or (current.rpm, current.tpm) != (rpm, tpm):
+            _model_limiters[name] = RateLimiter(rpm, tpm)
+        return _model_limiters[name]
+
+def limiter_for(model):
+    return _model_limiters.get(model_name(model), limiter)
+
+def estimate_tokens(contents):
+    if isinstance(contents, str):
+        contents = [contents]
+    return int(sum(len(str(part)) for part in contents) / CHARS_PER_TOKEN) + 1
+
+def is_rate_limit_error(e):
+    if getattr(e, 'code', None) == 429:
+        return True
+    msg = str(e)
+    return "429" in msg or "Quota exceeded" in msg or "RESOURCE_EXHAUSTED" in msg
+
+def retry_after_hint(e):
+    """
+    Seconds the server asked us to wait, or None.
+    """
+    msg = str(e)
+    for pattern in _RETRY_HINTS:
+        match = pattern.search(msg)
+        if match:
+            return float(match.group(1))
+    return None
+
+def _on_rate_limit(e, attempt, notify, model_limiter, retrying=True):
+    wait_time = retry_after_hint(e) or (2 ** attempt) * 10
+    model_limiter.block_for(wait_time)
+    if not retrying:
+        print(f"[Gemini] Rate Limit Hit. Model blocked for {wait_time:.0f}s.")
+        return
+    msg = f"Rate Limit Hit. Waiting {wait_time:.0f}s..."
+    print(f"[Gemini] {msg}")
+    if notify:
+        notify(msg)
+
+def _record_usage(model_limiter, entry, response):
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None and getattr(usage, 'prompt_token_count', None):
+        model_limiter.record_usage(entry, usage.prompt_token_count)
+
+async def generate_content_async(model, contents, notify=None, max_retries=MAX_RETRIES, extra_tokens=0):
+    """
+    model.generate_content_async() paced by the model's limiter (see limiter_for()).
+    On 429 every caller of the model pauses for the server's retry hint (else 10s, 20s, 40s, ...),
+    then retries. Other errors, or a 429 after max_retries, are raised to the caller
+    (max_retries=0: fail fast so the caller can try another model).
+    extra_tokens: input billed on top of contents (a cached context the call references).
+    """
+    model_limiter = limiter_for(model)
+    for attempt in range(max_retries + 1):
+        entry = await model_limiter.acquire_async(estimate_tokens(contents) + extra_tokens)
+        try:
+            response = await model.generate_content_async(contents)
+        except Exception as e:
+            if not is_rate_limit_error(e):
+                raise
+            _on_rate_limit(e, attempt, notify, model_limiter, retrying=attempt < max_retries)
+            if attempt == max_retries:
+                raise
+            continue
+
+        _record_usage(model_limiter, entry, response)
+        return response
+
+# --- Async Engine ---
+# One long-lived event loop runs every coroutine submitted from synchronous code.
+# The genai async client keeps its gRPC channel bound to the loop that first used it,
+# so a fresh asyncio.run() per call would break the second call.
+_loop = None
+_loop_lock = threading.Lock()
+
+def _engine_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="gemini-async", daemon=True).start()
+        return _loop
+
+def submit(coro):
+    """
+    Schedule a coroutine on the engine loop. Returns a concurrent.futures.Future.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _engine_loop())
+
+def run_sync(coro, timeout=None):
+    """
+    Run a coroutine on the engine loop and wait for its result (for the synchronous wrappers).
+    """
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is not None and running is _loop:
+        coro.close()
+        raise RuntimeError("run_sync() called from the Gemini engine loop; await the coroutine instead")
+    return submit(coro).result(timeout)
@@ -1,6 +1,8 @@
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
+from utils import model_router
+from utils import gemini_limiter
 
 # 환경 변수 로드
 load_dotenv('credentials.env')
@@ -10,17 +12,26 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
-def analyze_grant_as_expert(grant_title, grant_description, grant_link):
+# 프롬프트를 수정하면 버전을 올려서 캐시된 응답을 재사용하지 않도록 함
+PROMPT_VERSION = "grant-1"
+
+def analyze_grant_as_expert(grant_title, grant_description, grant_link, use_cache=True):
+    """
+    analyze_grant_as_expert_async()의 동기 래퍼 (공용 Gemini 이벤트 루프에서 실행)
+    """
+    return gemini_limiter.run_sync(analyze_grant_as_expert_async(grant_title, grant_description, grant_link, use_cache))
+
+async def analyze_grant_as_expert_async(grant_title, grant_description, grant_link, use_cache=True):
     """
     지원금 공고를 '정부지원금 전문 컨설턴트'의 관점에서 분석합니다.
     단순 요약이 아니라, 인사이트와 전략을 제공합니다.
+    (같은 공고는 Gemini 응답 캐시에서 바로 반환, use_cache=False면 캐시 무시)
+    여러 공고를 asyncio.gather로 동시에 분석할 수 있습니다 (할당량은 공용 리미터가 조절).
     """
     
     if not GEMINI_API_KEY:
         return "⚠️ Gemini API Key가 설정되지 않았습니다."
 
-    model = genai.GenerativeModel('gemini-2.0-flash-exp')
-
     prompt = f"""
     당신은 20년 경력의 '정부지원금 전문 컨설턴트'이자 '스타트업 전략가'입니다.
     아래의 지원사업 공고(또는 뉴스)를 분석하여, 독자(소상공인, 창업자)를 위한 "돈이 되는 전문 분석 리포트"를 작성해주세요.
@@ -46,12 +57,18 @@ def analyze_grant_as_expert(grant_title, grant_description, grant_link):
     """
 
     try:
-        response = model.generate_content(prompt)
-        return response.text
+        # 짧은 공고 분석은 경량 모델로 라우팅 (bot_config.json "models")
+        return await model_router.generate_async(prompt, "grant", "analysis", prompt_version=PROMPT_VERSION, use_cache=use_cache)
     except Exception as e:
         return f"⚠️ 분석 중 오류 발생: {str(e)}"
 
-def extract_announcements_from_html(html_content, base_url=""):
+def extract_announcements_from_html(html_content, base_url="", use_cache=True):
+    """
+    extract_announcements_from_html_async()의 동기 래퍼
+    """
+    return gemini_limiter.run_sync(extract_announcements_from_html_async(html_content, base_url, use_cache))
+
+async def extract_announcements_from_html_async(html_content, base_url="", use_cache=True):
     """
     HTML 원문을 AI에게 주어 공고 리스트(제목, 링크, 날짜)를 추출합니다.
     (RSS가 없는 사이트용 '만능 스크래퍼')
@@ -59,10 +76,8 @@ def extract_announcements_from_html(html_content, base_url=""):
     if not GEMINI_API_KEY:
         return []
 
-    model = genai.GenerativeModel('gemini-2.0-flash-exp')
-    
     # HTML이 너무 길면 자름 (토큰 비용 절약 및 에러 방지)
-    # 2.0 Flash는 1M 토큰까지 가능하므로 넉넉하게 잡음
+    # Flash 계열은 1M 토큰까지 가능하므로 넉넉하게 잡음
     truncated_html = html_content[:200000] 
 
     prompt = f"""
@@ -84,8 +99,8 @@ def extract_announcements_from_html(html_content, base_url=""):
     """
 
     try:
-        response = model.generate_content(prompt)
-        text = response.text.replace('```json', '').replace('```', '').strip()
+        text = await model_router.generate_async(prompt, "grant", "extract", prompt_version=PROMPT_VERSION, use_cache=use_cache)
+        text = text.replace('```json', '').replace('```', '').strip()
         import json
         items = json.loads(text)
         return items
@@ -0,0 +1,162 @@
+import google.generativeai as genai
+import threading
+import asyncio
+import copy
+import json
+import os
+from utils import gemini_cache
+from utils import gemini_limiter
+
+# --- Configuration ---
+# Which Gemini model serves a call is decided here, from bot_config.json "models":
+#   tiers     {tier: {'model', 'rpm', 'tpm'}}: rpm/tpm give the model its own limiter (quotas
+#             are per model); a tier without them shares the default budget (GEMINI_RPM/TPM)
+#   routes    [{'bot', 'task', 'form', 'min_tokens', 'max_tokens', 'tier'}]: the first route whose
+#             given fields all match wins ('form' is a form or a list of forms, '10-K/A' matches '10-K')
+#   default   tier used when no route matches
+#   fallback  {tier: [tiers]}: tried in order when the routed tier is rate-limited
+# Tasks: stock 'map' / 'reduce', grant 'analysis' / 'extract', marketing 'news'.
+CONFIG_FILE = os.getenv("BOT_CONFIG", "bot_config.json")
+DEFAULT_CONFIG = {
+    "tiers": {
+        "lite": {"model": "gemini-flash-lite-latest"},
+        "flash": {"model": "gemini-flash-latest"},
+        "pro": {"model": "gemini-2.5-pro"},
+    },
+    "routes": [],
+    "default": "flash",
+    "fallback": {"pro": ["flash"], "flash": ["lite"], "lite": ["flash"]},
+}
+# A routed model whose limiter would make the call wait longer than this hands it to a
+# fallback that can take it right away
+FALLBACK_WAIT_SEC = float(os.getenv("MODEL_FALLBACK_WAIT_SEC", "5"))
+
+_lock = threading.Lock()
+_config = None
+_models = {}
+
+def load_config(path=CONFIG_FILE):
+    """
+    Routing config: DEFAULT_CONFIG updated with the "models" section of bot_config.json.
+    Tiers with rpm/tpm are registered with the limiter (gemini_limiter.configure_model).
+    """
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config.update(json.load(f).get("models", {}))
+    except (OSError, ValueError) as e:
+        print(f"[Router] Using default model tiers ({e})")
+
+    for tier, spec in config["tiers"].items():
+        if spec.get("rpm") or spec.get("tpm"):
+            gemini_limiter.configure_model(
+                spec["model"], spec.get("rpm") or gemini_limiter.GEMINI_RPM, spec.get("tpm") or gemini_limiter.GEMINI_TPM)
+    return config
+
+def get_config():
+    global _config
+    with _lock:
+        if _config is None:
+            _config = load_config()
+        return _config
+
+def reload():
+    """
+    Re-read bot_config.json (after the dashboard edits it).
+    """
+    global _config
+    with _lock:
+        _config = load_config()
+    return _config
+
+def get_model(name, generation_config=None):
+    """
+    One GenerativeModel per model name (and generation config, e.g. JSON output), shared by every caller.
+    """
+    key = (name, json.dumps(generation_config, sort_keys=True) if generation_config else None)
+    with _lock:
+        if key not in _models:
+            _models[key] = genai.GenerativeModel(name, generation_config=generation_config)
+        return _models[key]
+
+def _form_matches(wanted, form):
+    if not form:
+        return False
+    wanted = [wanted] if isinstance(wanted, str) else wanted
+    return form in wanted or form.split('/')[0] in wanted
+
+def _matches(rule, bot, task, form, tokens):
+    if "bot" in rule and rule["bot"] != bot:
+        return False
+    if "task" in rule and rule["task"] != task:
+        return False
+    if "form" in rule and not _form_matches(rule["form"], form):
+        return False
+    if "min_tokens" in rule and tokens < rule["min_tokens"]:
+        return False
+    if "max_tokens" in rule and tokens > rule["max_tokens"]:
+        return False
+    return True
+
+def route(bot, task="default", form=None, tokens=0):
+    """
+    Tier for a call: the first matching route, else the default tier.
+    """
+    config = get_config()
+    for rule in config["routes"]:
+        if _matches(rule, bot, task, form, tokens):
+            if rule.get("tier") in config["tiers"]:
+                return rule["tier"]
+            print(f"[Router] Unknown tier {rule.get('tier')!r} in route {rule}, using {config['default']}")
+            break
+    return config["default"]
+
+def candidates(bot, task="default", form=None, tokens=0):
+    """
+    [(tier, model name)] to try, routed tier first, then its fallbacks.
+    When the routed model's limiter is backed up (or blocked after a 429) past
+    FALLBACK_WAIT_SEC, the fallback that can start soonest moves to the front.
+    """
+    config = get_config()
+    tier = route(bot, task, form, tokens)
+    tiers = [tier] + [t for t in config["fallback"].get(tier, []) if t in config["tiers"] and t != tier]
+    order = [(t, config["tiers"][t]["model"]) for t in dict.fromkeys(tiers)]
+
+    if len(order) > 1:
+        waits = [gemini_limiter.limiter_for(name).wait_estimate(tokens) for _, name in order]
+        if waits[0] > FALLBACK_WAIT_SEC:
+            best = min(range(1, len(order)), key=lambda i: waits[i])
+            if waits[best] < waits[0]:
+                print(f"[Router] {order[0][1]} busy ({waits[0]:.0f}s), routing to {order[best][1]}")
+                order.insert(0, order.pop(best))
+    return order
+
+async def generate_async(contents, bot, task="default", form=None, prompt_version="", use_cache=True, notify=None, generation_config=None):
+    """
+    Answer of the routed model, served from / stored in the response cache (utils/gemini_cache.py).
+    generation_config: e.g. {'response_mime_type': 'application/json', 'response_schema': ...};
+    give such calls their own prompt_version (the cache key covers model, prompt and inputs).
+    A 429 from a model with fallbacks left moves the call to the next one at once (the model's
+    limiter stays blocked for the retry hint, so following calls skip it too); the last
+    candidate waits and retries as usual. Other API errors propagate to the caller unchanged.
+    """
+    tokens = gemini_limiter.estimate_tokens(contents)
+    order = candidates(bot, task, form, tokens)
+    models = [get_model(name, generation_config) for _, name in order]
+
+    cached = await asyncio.to_thread(gemini_cache.lookup_any, models, contents, prompt_version, use_cache)
+    if cached is not None:
+        return cached
+
+    for i, model in enumerate(models):
+        last = i == len(models) - 1
+        try:
+            response = await gemini_limiter.generate_content_async(
+                model, contents, notify=notify, max_retries=gemini_limiter.MAX_RETRIES if last else 0)
+        except Exception as e:
+            if last or not gemini_limiter.is_rate_limit_error(e):
+                raise
+            print(f"[Router] {order[i][1]} rate-limited, falling back to {order[i + 1][1]}")
+            continue
+        await asyncio.to_thread(gemini_cache.store, model, contents, prompt_version, response.text, use_cache)
+        return response.text